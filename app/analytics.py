@@ -0,0 +1,117 @@
+import os
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .inventory import STOCK_IN, STOCK_OUT
+
+# Reports read from rollup tables, never from the raw ledgers. A rollup is
+# refreshed incrementally: only the days from the newest rolled-up day onward
+# are recomputed, so a refresh costs about a day of ledger rows however long the
+# history is. The tasks.REFRESH_ROLLUPS periodic job refreshes them every
+# REPORT_REFRESH_SECONDS, serialized on their report_refreshes row; report
+# requests only read, so reports can be up to that old.
+
+REPORT_REFRESH_SECONDS = float(os.getenv("REPORT_REFRESH_SECONDS", "60"))
+
+INVENTORY_USAGE = "inventory_daily_usage"
+
+
+async def _claim_refresh(db: AsyncSession, name: str, force: bool):
+    """Lock the rollup's refresh row; return it if a refresh is due, else ``None``."""
+    state = await db.get(models.ReportRefresh, name, with_for_update=True)
+    if state is None:
+        # Migration 0007 seeds the row; if it is missing, concurrent first
+        # refreshes must not both insert it.
+        insert_ = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        await db.execute(insert_(models.ReportRefresh).values(name=name).on_conflict_do_nothing())
+        state = await db.get(models.ReportRefresh, name, with_for_update=True, populate_existing=True)
+    elif not force and state.refreshed_at is not None \
+            and datetime.utcnow() - state.refreshed_at < timedelta(seconds=REPORT_REFRESH_SECONDS):
+        return None
+    return state
+
+
+async def _reopen_recent_days(db: AsyncSession, rollup, day_column):
+    """Delete the rollup's last two days and return the first of them (``None`` if the rollup is empty).
+
+    Going back a day past the newest one picks up ledger rows that committed
+    after the previous refresh but are stamped before it.
+    """
+    newest = await db.scalar(select(func.max(day_column)))
+    if newest is None:
+        return None
+    since = newest - timedelta(days=1)
+    await db.execute(delete(rollup).filter(day_column >= since))
+    return since
+
+
+async def refresh_inventory_usage(db: AsyncSession, force: bool = False):
+    state = await _claim_refresh(db, INVENTORY_USAGE, force)
+    if state is None:
+        await db.rollback()
+        return
+    usage = models.InventoryDailyUsage
+    since = await _reopen_recent_days(db, usage, usage.day)
+    ledger = models.InventoryTransaction
+    day = func.date(ledger.transaction_date)
+    incoming = ledger.transaction_type == STOCK_IN
+    rollup = select(
+        day, ledger.item_id,
+        func.sum(case((incoming, ledger.quantity), else_=0)),
+        func.sum(case((ledger.transaction_type == STOCK_OUT, ledger.quantity), else_=0)),
+        func.sum(case((incoming & ledger.reference.like("return:%"), ledger.quantity), else_=0)),
+    ).filter(ledger.transaction_date.is_not(None)).group_by(day, ledger.item_id)
+    if since is not None:
+        rollup = rollup.filter(ledger.transaction_date >= datetime.combine(since, time.min))
+    await db.execute(insert(usage).from_select(
+        ["day", "item_id", "quantity_in", "quantity_out", "quantity_returned"], rollup))
+    state.refreshed_at = datetime.utcnow()
+    await db.commit()
+
+
+def _window(days: int):
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+async def item_consumption(db: AsyncSession, days: int, below_minimum: bool = False):
+    """Net consumption (out minus returns) of every item over the last ``days`` days."""
+    usage = models.InventoryDailyUsage
+    item = models.InventoryItem
+    consumed = func.coalesce(func.sum(usage.quantity_out - usage.quantity_returned), 0)
+    query = select(item, consumed) \
+        .outerjoin(usage, (usage.item_id == item.id) & (usage.day >= _window(days))) \
+        .group_by(item.id)
+    if below_minimum:
+        query = query.filter(item.quantity_available < item.minimum_stock)
+    return [_item_report(row, total, days) for row, total in await db.execute(query)]
+
+
+def _item_report(item: models.InventoryItem, consumed: int, days: int):
+    rate = max(consumed, 0) / days
+    return {
+        "item_id": item.id,
+        "name": item.name,
+        "category": item.category,
+        "quantity_available": item.quantity_available,
+        "minimum_stock": item.minimum_stock,
+        "consumed": consumed,
+        "daily_rate": rate,
+        "days_until_stockout": item.quantity_available / rate if rate else None,
+    }
+
+
+async def category_consumption(db: AsyncSession, days: int):
+    usage = models.InventoryDailyUsage
+    item = models.InventoryItem
+    consumed = func.sum(usage.quantity_out - usage.quantity_returned)
+    query = select(item.category, consumed) \
+        .join(usage, usage.item_id == item.id) \
+        .filter(usage.day >= _window(days)) \
+        .group_by(item.category) \
+        .order_by(consumed.desc())
+    return [{"category": category, "consumed": total, "daily_rate": max(total, 0) / days}
+            for category, total in await db.execute(query)]
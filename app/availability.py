@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, exists, literal_column, select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+
+def overlaps(dialect: str, start: datetime, end: datetime):
+    """Bookings that are live and intersect ``[start, end)``.
+
+    On Postgres the predicate is written against the same ``tsrange`` as the
+    ``venue_bookings_no_overlap`` exclusion constraint so its GiST index
+    answers it directly, however much booking history a venue has.
+    """
+    live = models.VenueBooking.status != "cancelled"
+    if dialect == "postgresql":
+        period = literal_column(models.BOOKING_PERIOD)
+        return and_(live, period.op("&&")(func.tsrange(start, end, "[)")))
+    return and_(live, models.VenueBooking.start_time < end, models.VenueBooking.end_time > start)
+
+
+async def lock_venue(db: AsyncSession, venue_id: int) -> bool:
+    """Hold the venue's row until the caller's transaction ends; False if there is no such venue.
+
+    Taken before the conflict check so concurrent bookings of one venue check
+    and insert one at a time. A no-op UPDATE rather than SELECT ... FOR UPDATE
+    because SQLite ignores FOR UPDATE but does take its write lock for this.
+    """
+    result = await db.execute(update(models.Venue).filter(models.Venue.id == venue_id).values(id=models.Venue.id)
+                              .execution_options(synchronize_session=False))
+    return result.rowcount > 0
+
+
+async def find_conflict(db: AsyncSession, venue_id: int, start: datetime, end: datetime):
+    query = select(models.VenueBooking.id).filter(models.VenueBooking.venue_id == venue_id) \
+        .filter(overlaps(db.get_bind().dialect.name, start, end)).limit(1)
+    return await db.scalar(query)
+
+
+async def find_available_venues(db: AsyncSession, start: datetime, end: datetime,
+                                capacity: Optional[int] = None, venue_type: Optional[str] = None):
+    busy = select(models.VenueBooking.id).filter(models.VenueBooking.venue_id == models.Venue.id) \
+        .filter(overlaps(db.get_bind().dialect.name, start, end))
+    query = select(models.Venue).filter(models.Venue.is_active.is_not(False)).filter(~exists(busy))
+    if capacity is not None:
+        query = query.filter(models.Venue.capacity >= capacity)
+    if venue_type is not None:
+        query = query.filter(models.Venue.venue_type == venue_type)
+    return (await db.scalars(query.order_by(models.Venue.capacity, models.Venue.id))).all()
@@ -0,0 +1,43 @@
+from typing import Dict, List
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Batch status changes are one set-based UPDATE ... WHERE id IN (...) RETURNING
+# with the handler's authorization and state checks folded into the WHERE
+# clause. The ids it did not return are explained afterwards with a single
+# SELECT, so a batch costs the same few statements however many ids it has.
+
+NOT_FOUND = "not found"
+
+
+def unique(ids: List[int]):
+    return list(dict.fromkeys(ids))
+
+
+async def set_status(db: AsyncSession, model, ids: List[int], status: str, *conditions, returning=(), **values):
+    """Set ``status`` on the rows in ``ids`` that satisfy ``conditions``; return ``{id: row}`` for those updated."""
+    rows = await db.execute(
+        update(model)
+        .filter(model.id.in_(ids), *conditions)
+        .values(status=status, **values)
+        .returning(model.id, *returning)
+        .execution_options(synchronize_session=False)
+    )
+    return {row.id: row for row in rows}
+
+
+async def explain(db: AsyncSession, model, ids: List[int], *checks) -> Dict[int, str]:
+    """Say why each of ``ids`` was skipped: not found, or the message of its first failed ``(clause, message)`` check."""
+    if not ids:
+        return {}
+    errors = dict.fromkeys(ids, NOT_FOUND)
+    rows = await db.execute(select(model.id, *[clause for clause, _ in checks]).filter(model.id.in_(ids)))
+    for row_id, *passed in rows:
+        errors[row_id] = next((message for ok, (_, message) in zip(passed, checks) if not ok), "conflict")
+    return errors
+
+
+def result(ids: List[int], status: str, done, errors: Dict[int, str]):
+    return {"results": [{"id": row_id, "status": status if row_id in done else None, "error": errors.get(row_id)}
+                        for row_id in ids]}
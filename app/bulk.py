@@ -0,0 +1,189 @@
+import codecs
+import csv
+import io
+import json
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import SessionLocal
+
+# Bulk import/export streams rows through in fixed-size batches so memory stays
+# flat however large the file is: request bodies are parsed line by line, each
+# batch is inserted with one executemany and committed, and exports read from
+# a server-side cursor.
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+CSV = "csv"
+NDJSON = "ndjson"
+MEDIA_TYPES = {CSV: "text/csv", NDJSON: "application/x-ndjson"}
+
+
+def request_format(request: Request):
+    return CSV if request.headers.get("content-type", "").startswith("text/csv") else NDJSON
+
+
+async def _iter_lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_records(request: Request):
+    """Yield ``(line_number, record)`` for each row; ``record`` is an exception for unparsable rows."""
+    fmt = request_format(request)
+    header = None
+    record_line, buffered = 0, ""
+    line_no = 0
+    async for line in _iter_lines(request):
+        line_no += 1
+        if fmt == NDJSON:
+            if line.strip():
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as exc:
+                    yield line_no, exc
+            continue
+        # A quoted CSV field may span lines: keep reading until the quotes balance.
+        if not buffered:
+            record_line = line_no
+        buffered = f"{buffered}\n{line}" if buffered else line
+        if buffered.count('"') % 2:
+            continue
+        text, buffered = buffered, ""
+        if not text.strip():
+            continue
+        row = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [name.strip() for name in row]
+        elif len(row) != len(header):
+            yield record_line, ValueError(f"expected {len(header)} columns, got {len(row)}")
+        else:
+            yield record_line, {name: value for name, value in zip(header, row) if value != ""}
+    if buffered:
+        yield record_line, ValueError("unterminated quoted field")
+
+
+def _describe(exc: Exception):
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in exc.errors())
+    if isinstance(exc, DBAPIError):
+        return str(exc.orig).splitlines()[0]
+    return str(exc)
+
+
+class _Import:
+    def __init__(self, db: AsyncSession, model, prepare, after_insert):
+        self.db = db
+        self.model = model
+        self.prepare = prepare
+        self.after_insert = after_insert
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line_no: int, exc: Exception):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": _describe(exc)})
+
+    async def _insert(self, rows):
+        ids = (await self.db.scalars(insert(self.model).returning(self.model.id, sort_by_parameter_order=True), rows)).all()
+        if self.after_insert is not None:
+            await self.after_insert(self.db, ids, rows)
+
+    async def flush(self, batch):
+        if not batch:
+            return
+        rows = [row for _, row in batch]
+        if self.prepare is not None:
+            rows = await self.prepare(rows)
+        try:
+            async with self.db.begin_nested():
+                await self._insert(rows)
+            self.inserted += len(rows)
+        except DBAPIError:
+            # Something in the batch violated a constraint; retry row by row so
+            # only the offending rows are reported and the rest still land.
+            for (line_no, _), row in zip(batch, rows):
+                try:
+                    async with self.db.begin_nested():
+                        await self._insert([row])
+                    self.inserted += 1
+                except DBAPIError as exc:
+                    self.fail(line_no, exc)
+        await self.db.commit()
+
+
+async def import_rows(db: AsyncSession, request: Request, schema, to_row: Callable[[BaseModel], dict], model,
+                      prepare: Optional[Callable[[list], Awaitable[list]]] = None,
+                      after_insert: Optional[Callable[[AsyncSession, list, list], Awaitable[None]]] = None):
+    """Validate each streamed record with ``schema`` and insert it into ``model`` in batches.
+
+    ``prepare`` may transform a whole batch of rows before insert (e.g. hash
+    passwords concurrently); ``after_insert`` receives the new ids with their
+    rows. Bad rows are reported, not fatal.
+    """
+    job = _Import(db, model, prepare, after_insert)
+    batch = []
+    async for line_no, record in iter_records(request):
+        if isinstance(record, Exception):
+            job.fail(line_no, record)
+            continue
+        try:
+            row = to_row(schema.model_validate(record))
+        except (ValidationError, ValueError) as exc:
+            job.fail(line_no, exc)
+            continue
+        batch.append((line_no, row))
+        if len(batch) >= BATCH_SIZE:
+            await job.flush(batch)
+            batch = []
+    await job.flush(batch)
+    return {"inserted": job.inserted, "failed": job.failed, "errors": job.errors}
+
+
+def export_format(fmt: str):
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(MEDIA_TYPES)}")
+    return MEDIA_TYPES[fmt]
+
+
+async def export_rows(query, schema, fmt: str):
+    """Stream ``query``'s rows serialized with ``schema`` as CSV or NDJSON.
+
+    Opens its own session: the request's session is closed before a streaming
+    response body is sent.
+    """
+    fields = list(schema.model_fields)
+    async with SessionLocal() as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=BATCH_SIZE))
+        if fmt == CSV:
+            out = io.StringIO()
+            writer = csv.writer(out)
+            writer.writerow(fields)
+        async for partition in result.partitions():
+            rows = [schema.model_validate(obj, from_attributes=True).model_dump(mode="json") for obj in partition]
+            if fmt == CSV:
+                writer.writerows([row[name] for name in fields] for row in rows)
+                chunk = out.getvalue()
+                out.seek(0)
+                out.truncate()
+            else:
+                chunk = "".join(json.dumps(row) + "\n" for row in rows)
+            yield chunk
+        if fmt == CSV and out.tell():
+            yield out.getvalue()
@@ -0,0 +1,200 @@
+import hashlib
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from . import metrics
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheBackend:
+    """Storage for ResponseCache.
+
+    Entries are opaque bytes. Invalidation is by tag: every tag has a version
+    that ``invalidate`` bumps, and ResponseCache stores the versions an entry
+    was built against so a bumped tag makes the entry stale without having to
+    find and delete it.
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    async def tag_versions(self, tags) -> List[int]:
+        raise NotImplementedError
+
+    async def invalidate(self, tags):
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU backend; also the stand-in for a shared backend in development."""
+
+    def __init__(self, maxsize: int = 10000):
+        self._entries = TTLCache(maxsize=maxsize)
+        self._versions = {}
+        self._clock = itertools.count(1)
+
+    async def get(self, key):
+        return self._entries.get(key)
+
+    async def set(self, key, value, ttl):
+        self._entries.set(key, value, ttl)
+
+    async def tag_versions(self, tags):
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    async def invalidate(self, tags):
+        for tag in tags:
+            self._versions[tag] = next(self._clock)
+
+
+class RedisBackend(CacheBackend):
+    """Backend shared by all workers, for deployments that run Redis."""
+
+    def __init__(self, url: str, prefix: str = "rc:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_URL is set but the redis package is not installed")
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key):
+        return await self._redis.get(self._prefix + key)
+
+    async def set(self, key, value, ttl):
+        await self._redis.set(self._prefix + key, value, px=int(ttl * 1000))
+
+    async def tag_versions(self, tags):
+        if not tags:
+            return []
+        return [int(v or 0) for v in await self._redis.mget([f"{self._prefix}tag:{tag}" for tag in tags])]
+
+    async def invalidate(self, tags):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{self._prefix}tag:{tag}")
+            await pipe.execute()
+
+
+def _etag(body: bytes):
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header lists ``etag`` (weakly compared) or is ``*``."""
+    if not if_none_match:
+        return False
+    etag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Read-through cache of serialized JSON responses keyed on path and query string."""
+
+    def __init__(self, backend: CacheBackend, ttl: float = 30):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def key(request: Request):
+        return f"{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+
+    async def _lookup(self, key: str):
+        blob = await self.backend.get(key)
+        if blob is None:
+            return None
+        meta, body = blob.split(b"\n", 1)
+        meta = json.loads(meta)
+        tags = list(meta["tags"])
+        if await self.backend.tag_versions(tags) != [meta["tags"][tag] for tag in tags]:
+            return None
+        return meta["etag"], meta["headers"], body
+
+    async def respond(self, request: Request, response: Response, schema, tags: List[str],
+                      load: Callable[[], Awaitable]):
+        """Serve ``request`` from the cache, or call ``load`` and cache its result serialized with ``schema``.
+
+        ``load`` may raise HTTPException (e.g. 404), which is not cached, and may
+        set headers on ``response``; those are cached with the body. A matching
+        ``If-None-Match`` gets a 304 without calling ``load``.
+        """
+        key = self.key(request)
+        entry = await self._lookup(key)
+        if entry is None:
+            # Read the tag versions before loading so a write that lands while
+            # we load leaves this entry already stale.
+            versions = await self.backend.tag_versions(tags)
+            data = await load()
+            with metrics.serializing():
+                adapter = TypeAdapter(schema)
+                body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+            headers = dict(response.headers)
+            entry = (_etag(body), headers, body)
+            meta = json.dumps({"etag": entry[0], "headers": headers, "tags": dict(zip(tags, versions))}).encode()
+            await self.backend.set(key, meta + b"\n" + body, self.ttl)
+        etag, headers, body = entry
+        headers = {**headers, "ETag": etag}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, *tags: str):
+        await self.backend.invalidate(tags)
+
+
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+
+response_cache = ResponseCache(RedisBackend(RESPONSE_CACHE_URL) if RESPONSE_CACHE_URL else MemoryBackend(RESPONSE_CACHE_SIZE),
+                               ttl=RESPONSE_CACHE_TTL)
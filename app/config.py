@@ -0,0 +1,85 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# Deployment settings (database, tokens, mail), read once from the environment
+# and .env. Feature tunables stay next to the code they tune, as module
+# constants read with os.getenv; this module loads .env first so those see it too.
+
+load_dotenv()
+
+
+def _flag(name: str, default: str = "false"):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _database_url():
+    return os.getenv("DATABASE_URL") or (f"postgresql+asyncpg://{os.getenv('user')}:{os.getenv('password')}"
+                                         f"@{os.getenv('host')}:{os.getenv('port')}/{os.getenv('dbname')}")
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: str
+    # Each uvicorn worker has its own pool, so the server sees up to
+    # workers * (db_pool_size + db_max_overflow) connections.
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    db_pool_recycle: int
+    db_pool_pre_ping: bool
+    # Set when connecting through PgBouncer in transaction pooling mode.
+    db_pgbouncer: bool
+
+    secret_key: Optional[str]
+    algorithm: Optional[str]
+    access_token_expire_minutes: Optional[int]
+
+    smtp_host: Optional[str]
+    smtp_port: int
+    smtp_user: Optional[str]
+    smtp_password: Optional[str]
+    smtp_starttls: bool
+    mail_from: str
+    # Without SMTP_HOST mails are only logged; their bodies (reset links
+    # included) only with this set, for local development.
+    mail_log_body: bool
+
+    # How long /health/ready waits for the database before reporting not ready.
+    health_db_timeout: float
+
+    @classmethod
+    def from_env(cls):
+        expire = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
+        return cls(
+            database_url=_database_url(),
+            db_pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            db_pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            db_pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "-1")),
+            db_pool_pre_ping=_flag("DB_POOL_PRE_PING"),
+            db_pgbouncer=_flag("DB_PGBOUNCER"),
+            secret_key=os.getenv("SECRET_KEY"),
+            algorithm=os.getenv("ALGORITHM"),
+            access_token_expire_minutes=int(expire) if expire else None,
+            smtp_host=os.getenv("SMTP_HOST"),
+            smtp_port=int(os.getenv("SMTP_PORT", "587")),
+            smtp_user=os.getenv("SMTP_USER"),
+            smtp_password=os.getenv("SMTP_PASSWORD"),
+            smtp_starttls=_flag("SMTP_STARTTLS", "true"),
+            mail_from=os.getenv("MAIL_FROM", "no-reply@localhost"),
+            mail_log_body=_flag("MAIL_LOG_BODY"),
+            health_db_timeout=float(os.getenv("HEALTH_DB_TIMEOUT", "2")),
+        )
+
+    def check(self):
+        """Raise if settings the API cannot serve without are missing; called at startup, not import."""
+        missing = [name for name in ("SECRET_KEY", "ALGORITHM", "ACCESS_TOKEN_EXPIRE_MINUTES")
+                   if getattr(self, name.lower()) is None]
+        if missing:
+            raise RuntimeError(f"missing required settings: {', '.join(missing)}")
+
+
+settings = Settings.from_env()
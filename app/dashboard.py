@@ -0,0 +1,83 @@
+import os
+
+from sqlalchemy import DateTime, Integer, String, cast, func, literal, null, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .cache import TTLCache
+
+# The home-page dashboard: per-status counts and the most recent rows of each
+# thing a user owns, in one UNION ALL statement instead of loading UserOut's
+# relationship collections. Every branch reads through an index on its owner
+# column. Results are cached per user for DASHBOARD_CACHE_TTL seconds.
+
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "10"))
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "10000"))
+
+# (user_id, recent) -> serialized schemas.Dashboard
+dashboard_cache = TTLCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL)
+
+
+def _sections():
+    """(name, model, owner column, title, date, related id, recency order, joins) for each section."""
+    event, request, booking, permission, registration = (models.Event, models.InventoryRequest, models.VenueBooking,
+                                                         models.Permission, models.Registration)
+    return [
+        ("events_organized", event, event.organizer_id, event.title, event.start_date, event.id,
+         event.created_at, []),
+        ("inventory_requests", request, request.requester_id, models.InventoryItem.name, request.request_date,
+         request.item_id, request.request_date, [(models.InventoryItem, models.InventoryItem.id == request.item_id)]),
+        ("venue_bookings", booking, booking.booker_id, models.Venue.name, booking.start_time, booking.event_id,
+         booking.created_at, [(models.Venue, models.Venue.id == booking.venue_id)]),
+        ("permissions_to_approve", permission, permission.approver_id, event.title, permission.requested_at,
+         permission.event_id, permission.requested_at, [(event, event.id == permission.event_id)]),
+        ("permissions_requested", permission, permission.user_id, event.title, permission.requested_at,
+         permission.event_id, permission.requested_at, [(event, event.id == permission.event_id)]),
+        ("registrations", registration, registration.user_id, event.title, registration.registration_date,
+         registration.event_id, registration.registration_date, [(event, event.id == registration.event_id)]),
+    ]
+
+
+SECTIONS = [section[0] for section in _sections()]
+
+
+def query(user_id: int, recent: int):
+    """One statement returning a count row per (section, status) and up to ``recent`` item rows per section."""
+    no_int, no_text, no_date = cast(null(), Integer), cast(null(), String), cast(null(), DateTime)
+    branches = []
+    for name, model, owner, title, date, related, order, joins in _sections():
+        section = literal(name, String).label("section")
+        branches.append(
+            select(section, model.status.label("status"), func.count().label("count"),
+                   no_int.label("id"), no_text.label("title"), no_date.label("date"), no_int.label("related_id"),
+                   no_date.label("recency"))
+            .filter(owner == user_id)
+            .group_by(model.status)
+        )
+        if recent:
+            items = select(section, model.status.label("status"), no_int.label("count"), model.id.label("id"),
+                           title.label("title"), date.label("date"), related.label("related_id"),
+                           order.label("recency")).filter(owner == user_id)
+            for target, on in joins:
+                items = items.outerjoin(target, on)
+            items = items.order_by(order.desc(), model.id.desc()).limit(recent).subquery()
+            branches.append(select(items))
+    return union_all(*branches)
+
+
+async def load(db: AsyncSession, user_id: int, recent: int):
+    dashboard = {name: {"counts": {}, "total": 0, "recent": []} for name in SECTIONS}
+    for row in await db.execute(query(user_id, recent)):
+        section = dashboard[row.section]
+        if row.count is not None:
+            section["counts"][row.status or "unknown"] = row.count
+            section["total"] += row.count
+        else:
+            section["recent"].append(row)
+    # UNION ALL does not keep each branch's order.
+    for section in dashboard.values():
+        section["recent"] = [{"id": row.id, "title": row.title, "status": row.status, "date": row.date,
+                              "related_id": row.related_id}
+                             for row in sorted(section["recent"], key=lambda row: (row.recency is not None, row.recency, row.id),
+                                               reverse=True)]
+    return dashboard
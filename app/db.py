@@ -1,29 +1,118 @@
-import os
+import time
+from uuid import uuid4
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.orm import declarative_base
 
-load_dotenv()
+from . import metrics
+from .config import settings
 
-user = os.getenv("user")
-password = os.getenv("password")
-host = os.getenv("host")
-port = os.getenv("port")
-dbname = os.getenv("dbname")
 
-SQLALCHEMY_DATABASE_URL = f'postgresql://{user}:{password}@{host}:{port}/{dbname}'
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that reports how long checkouts wait for a connection."""
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            metrics.POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _connect_args():
+    if not settings.db_pgbouncer:
+        return {}
+    # PgBouncer may run consecutive transactions on different server
+    # connections, so asyncpg must not cache prepared statements or reuse
+    # their names.
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+
+_engine = None
+
+
+def get_engine():
+    """The process's engine, created on first use so importing the app neither loads the driver nor connects."""
+    global _engine
+    if _engine is None:
+        _engine = _create_engine()
+    return _engine
+
+
+def __getattr__(name):
+    # Keeps ``from app.db import engine`` working; it creates the engine at that point.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def dispose():
+    """Close the pool's connections, if the engine was ever created."""
+    if _engine is not None:
+        await _engine.dispose()
+
+
+def _create_engine():
+    engine = create_async_engine(
+        settings.database_url,
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=_connect_args(),
+    )
+    metrics.REGISTRY.extend([
+        metrics.Gauge("db_pool_size", "Connections the pool keeps open.", engine.pool.size),
+        metrics.Gauge("db_pool_checked_out", "Connections currently checked out.", engine.pool.checkedout),
+        metrics.Gauge("db_pool_overflow", "Overflow connections beyond db_pool_size (negative while the pool fills).", engine.pool.overflow),
+    ])
+    event.listen(engine.sync_engine, "before_cursor_execute", _start_query_timer)
+    event.listen(engine.sync_engine, "after_cursor_execute", _record_query)
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+# The start time lives on the execution context, which is discarded with the
+# statement: kept on the connection, a statement that raised would leave its
+# entry behind for as long as the pooled connection lives.
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_start_time = time.perf_counter()
+
+
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start_time
+    # For row-returning statements the buffering drivers (asyncpg) report the
+    # number of rows fetched; others report -1.
+    rows = cursor.rowcount if cursor.description is not None and cursor.rowcount > 0 else 0
+    metrics.record_query(statement, elapsed, rows)
+
+
+class _SessionMaker(async_sessionmaker):
+    """Binds to the engine on the first session, creating it then."""
+
+    def __call__(self, **local_kw):
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _SessionMaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
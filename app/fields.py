@@ -0,0 +1,97 @@
+import typing
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+
+from . import metrics
+
+# ?fields= and ?expand= select what a response contains. The same selection
+# builds the Pydantic model that serializes the response and the load_only /
+# selectinload options of the query, so a column or relationship that is not
+# asked for is neither sent nor loaded.
+
+
+def _split(value: Optional[str]):
+    return [name.strip() for name in value.split(",") if name.strip()] if value else []
+
+
+def _nested_schema(annotation):
+    """The model inside ``Optional[X]`` / ``List[X]``."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in typing.get_args(annotation):
+        nested = _nested_schema(arg)
+        if nested is not None:
+            return nested
+    return None
+
+
+def _attributes(mapper, names):
+    return [getattr(mapper.class_, name) for name in dict.fromkeys(names)]
+
+
+def _key_columns(mapper, columns):
+    return [mapper.get_property_by_column(column).key for column in columns]
+
+
+@lru_cache(maxsize=None)
+def _partial(schema, names: tuple):
+    return create_model(f"{schema.__name__}Fields",
+                        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in names})
+
+
+class Projection:
+    """The part of ``schema`` (mapped onto ``model``) that one request asked for.
+
+    ``fields`` picks scalar columns and defaults to all of the schema's
+    columns. ``expand`` picks relationships out of ``relations``, which maps
+    each expandable name to the loader options of its own relationships, and
+    defaults to ``default_expand``. ``required`` columns are loaded but not
+    serialized (e.g. pagination keys).
+    """
+
+    def __init__(self, model, schema, fields: Optional[str] = None, expand: Optional[str] = None,
+                 relations: dict = None, default_expand=(), required=()):
+        mapper = inspect(model)
+        relations = relations or {}
+        columns = [name for name in schema.model_fields if name in mapper.column_attrs]
+        names = _split(fields) or columns
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s) {', '.join(unknown)}; choose from {', '.join(columns)}")
+        expanded = _split(expand) if expand is not None else list(default_expand)
+        unknown = [name for name in expanded if name not in relations]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Cannot expand {', '.join(unknown)}; choose from {', '.join(relations) or 'nothing'}")
+
+        self.schema = _partial(schema, tuple(dict.fromkeys(names + expanded)))
+        load = _key_columns(mapper, mapper.primary_key) + names + [column.key for column in required]
+        self.options = []
+        for name in expanded:
+            relationship = mapper.relationships[name]
+            load += _key_columns(mapper, relationship.local_columns)
+            loader = selectinload(getattr(model, name))
+            nested = _nested_schema(schema.model_fields[name].annotation)
+            target = relationship.mapper
+            if relations[name] or any(field not in target.column_attrs for field in nested.model_fields):
+                loader = loader.options(*relations[name])
+            else:
+                loader = loader.load_only(*_attributes(target, _key_columns(target, target.primary_key)
+                                                       + _key_columns(target, relationship.remote_side)
+                                                       + list(nested.model_fields)))
+            self.options.append(loader)
+        self.options.insert(0, load_only(*_attributes(mapper, load)))
+
+    def list_schema(self):
+        return List[self.schema]
+
+    def render(self, response: Response, data, many: bool = False):
+        """Serialize ``data``, keeping headers already set on the injected ``response``."""
+        with metrics.serializing():
+            adapter = TypeAdapter(self.list_schema() if many else self.schema)
+            body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+        return Response(body, media_type="application/json", headers=dict(response.headers))
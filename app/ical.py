@@ -0,0 +1,173 @@
+import hashlib
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .cache import ResponseCache, etag_matches
+from .db import SessionLocal
+from .pagination import decode_cursor, encode_cursor
+
+# iCalendar feeds for calendar mirrors that poll every few minutes. Before
+# anything is streamed one aggregate query (row count and latest change) gives
+# the feed's ETag, Last-Modified and next sync token, so an unchanged feed is
+# a 304. With ?since= a feed only holds rows changed at or after the token;
+# events that were rejected stay in it as STATUS:CANCELLED so mirrors drop them.
+#
+# A row is stamped when it is written but becomes visible when its transaction
+# commits, so a poll can hand out a token later than a row it could not see
+# yet. ?since= therefore goes back SYNC_LOOKBACK_SECONDS before the token; the
+# overlap is sent again and mirrors replace those events by UID. It has to
+# outlast the longest write transaction on events and bookings.
+
+MEDIA_TYPE = "text/calendar; charset=utf-8"
+SYNC_TOKEN_HEADER = "X-Sync-Token"
+BATCH_SIZE = 500
+SYNC_LOOKBACK_SECONDS = float(os.getenv("SYNC_LOOKBACK_SECONDS", "300"))
+
+STATUSES = {"approved": "CONFIRMED", "rejected": "CANCELLED", "cancelled": "CANCELLED"}
+
+
+def decode_since(since: Optional[str]):
+    return decode_cursor(since, [models.Event.updated_at])[0] if since else None
+
+
+def _changed_since(since: datetime):
+    return since - timedelta(seconds=SYNC_LOOKBACK_SECONDS)
+
+
+def _window(query, starts, ends, start: Optional[date], end: Optional[date]):
+    """Keep rows overlapping ``[start, end]`` (whole days, either side optional)."""
+    if start is not None:
+        query = query.filter(ends > datetime.combine(start, time.min))
+    if end is not None:
+        query = query.filter(starts < datetime.combine(end, time.max))
+    return query
+
+
+def event_feed(start: Optional[date], end: Optional[date], since: Optional[datetime]):
+    query = _window(select(models.Event), models.Event.start_date, models.Event.end_date, start, end)
+    if since is not None:
+        query = query.filter(models.Event.updated_at >= _changed_since(since))
+    return query.order_by(models.Event.start_date, models.Event.id)
+
+
+def venue_feed(venue_id: int, start: Optional[date], end: Optional[date], since: Optional[datetime]):
+    booking = models.VenueBooking
+    query = _window(select(booking, models.Event).outerjoin(models.Event, models.Event.id == booking.event_id)
+                    .filter(booking.venue_id == venue_id), booking.start_time, booking.end_time, start, end)
+    if since is None:
+        query = query.filter(booking.status != "cancelled")
+    else:
+        changed_since = _changed_since(since)
+        query = query.filter(or_(booking.created_at >= changed_since, models.Event.updated_at >= changed_since))
+    return query.order_by(booking.start_time, booking.id)
+
+
+def _escape(text: str):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _fold(line: str):
+    """Split ``line`` into 75-octet lines as RFC 5545 requires."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, limit = [], 75
+    while data:
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data, limit = data[cut:], 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _stamp(value: datetime):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _vevent(uid: str, start: datetime, end: datetime, modified: Optional[datetime], status: str,
+            summary: str, description: Optional[str] = None):
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{_stamp(modified or start)}",
+             f"DTSTART:{_stamp(start)}", f"DTEND:{_stamp(end)}", f"STATUS:{status}", f"SUMMARY:{_escape(summary)}"]
+    if modified is not None:
+        lines.append(f"LAST-MODIFIED:{_stamp(modified)}")
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def event_component(event: models.Event, host: str):
+    return _vevent(f"event-{event.id}@{host}", event.start_date, event.end_date, event.updated_at,
+                   STATUSES.get(event.status, "TENTATIVE"), event.title, event.description)
+
+
+def booking_component(booking: models.VenueBooking, event: Optional[models.Event], host: str):
+    modified = max(filter(None, (booking.created_at, event.updated_at if event else None)), default=None)
+    return _vevent(f"booking-{booking.id}@{host}", booking.start_time, booking.end_time, modified,
+                   STATUSES.get(booking.status, "CONFIRMED"), event.title if event else booking.purpose or "Booked",
+                   booking.purpose)
+
+
+async def _components(query, name: str, render):
+    """Stream the calendar, reading rows from a server-side cursor.
+
+    Opens its own session: the request's session is closed before a streaming
+    response body is sent.
+    """
+    yield "".join(_fold(line) for line in ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Inventory//Calendar//EN",
+                                          "CALSCALE:GREGORIAN", f"X-WR-CALNAME:{_escape(name)}"))
+    async with SessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=BATCH_SIZE))
+        async for partition in result.partitions():
+            yield "".join(render(*row) for row in partition)
+    yield "END:VCALENDAR\r\n"
+
+
+def _validators(key: str, count: int, modified: Optional[datetime]):
+    etag = '"%s"' % hashlib.blake2b(f"{key}|{count}|{modified}".encode(), digest_size=16).hexdigest()
+    last_modified = format_datetime(modified.replace(tzinfo=timezone.utc), usegmt=True) if modified else None
+    return etag, last_modified
+
+
+def _not_modified(request: Request, etag: str, modified: Optional[datetime]):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified is not None:
+        try:
+            return modified.replace(tzinfo=timezone.utc, microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def respond(request: Request, db: AsyncSession, query, changed, name: str, render,
+                  since: Optional[datetime]):
+    """Answer a feed request: 304 if the client's copy is current, else stream ``query`` through ``render``.
+
+    ``changed`` are the timestamp columns whose latest value over ``query``'s
+    rows is the feed's last change.
+    """
+    row = (await db.execute(query.with_only_columns(func.count(), *map(func.max, changed)).order_by(None))).one()
+    count, modified = row[0], max(filter(None, row[1:]), default=None)
+    etag, last_modified = _validators(ResponseCache.key(request), count, modified)
+    # Rows from the look-back can be older than the token; never move it back.
+    token = max(filter(None, (modified, since)), default=None) or datetime.utcnow()
+    headers = {"ETag": etag, SYNC_TOKEN_HEADER: encode_cursor([token])}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if _not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+    return StreamingResponse(_components(query, name, render), media_type=MEDIA_TYPE, headers=headers)
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Every change to InventoryItem.quantity_available goes through this module and
+# is written to the InventoryTransaction ledger in the same transaction, so the
+# ledger is the source of truth and reconcile() can rebuild balances from it.
+
+STOCK_IN = "in"
+STOCK_OUT = "out"
+
+
+def _record(db: AsyncSession, item_id: int, quantity: int, transaction_type: str, reference: str):
+    db.add(models.InventoryTransaction(item_id=item_id, quantity=quantity,
+                                       transaction_type=transaction_type, reference=reference))
+
+
+async def add_stock(db: AsyncSession, item_id: int, quantity: int, reference: str, restock: bool = False):
+    """Increase an item's stock; return the new balance, or ``None`` if the item does not exist."""
+    values = {"quantity_available": models.InventoryItem.quantity_available + quantity}
+    if restock:
+        values["last_restocked"] = datetime.utcnow()
+    balance = await db.scalar(
+        update(models.InventoryItem).filter(models.InventoryItem.id == item_id).values(**values)
+        .returning(models.InventoryItem.quantity_available)
+    )
+    if balance is not None:
+        _record(db, item_id, quantity, STOCK_IN, reference)
+    return balance
+
+
+async def remove_stock(db: AsyncSession, item_id: int, quantity: int, reference: str):
+    """Take stock out of an item; return the new balance, or ``None`` if there is not enough.
+
+    The availability check and the decrement are one conditional UPDATE, so the
+    row lock serializes concurrent callers and stock can never go negative.
+    """
+    balance = await db.scalar(
+        update(models.InventoryItem)
+        .filter(models.InventoryItem.id == item_id)
+        .filter(models.InventoryItem.quantity_available >= quantity)
+        .values(quantity_available=models.InventoryItem.quantity_available - quantity)
+        .returning(models.InventoryItem.quantity_available)
+    )
+    if balance is not None:
+        _record(db, item_id, quantity, STOCK_OUT, reference)
+    return balance
+
+
+async def remove_stock_batch(db: AsyncSession, withdrawals):
+    """Apply many ``(item_id, quantity, reference)`` withdrawals with one UPDATE; return the ids of debited items.
+
+    An item is debited the total of its withdrawals only if it has enough stock
+    for all of them; items that do not are left untouched for the caller to
+    settle one withdrawal at a time.
+    """
+    totals = defaultdict(int)
+    for item_id, quantity, _ in withdrawals:
+        totals[item_id] += quantity
+    if not totals:
+        return set()
+    item = models.InventoryItem
+    total = case(totals, value=item.id)
+    debited = set((await db.scalars(
+        update(item)
+        .filter(item.id.in_(totals))
+        .filter(item.quantity_available >= total)
+        .values(quantity_available=item.quantity_available - total)
+        .returning(item.id)
+        .execution_options(synchronize_session=False)
+    )).all())
+    for item_id, quantity, reference in withdrawals:
+        if item_id in debited:
+            _record(db, item_id, quantity, STOCK_OUT, reference)
+    return debited
+
+
+def ledger_balance(item_id_column):
+    signed = case((models.InventoryTransaction.transaction_type == STOCK_IN, models.InventoryTransaction.quantity),
+                  else_=-models.InventoryTransaction.quantity)
+    return select(func.coalesce(func.sum(signed), 0)) \
+        .filter(models.InventoryTransaction.item_id == item_id_column).scalar_subquery()
+
+
+async def reconcile(db: AsyncSession):
+    """Reset every drifted ``quantity_available`` to its ledger balance and return ``(item_id, balance)`` pairs.
+
+    Item rows are locked first so stock writes wait for the rebuild instead of
+    landing between the ledger read and the update. The caller commits.
+    """
+    await db.execute(select(models.InventoryItem.id).with_for_update())
+    balance = ledger_balance(models.InventoryItem.id)
+    result = await db.execute(
+        update(models.InventoryItem)
+        .filter(models.InventoryItem.quantity_available.is_distinct_from(balance))
+        .values(quantity_available=balance)
+        .returning(models.InventoryItem.id, models.InventoryItem.quantity_available)
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
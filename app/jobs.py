@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+import random
+import traceback
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import metrics, models
+from .db import SessionLocal
+
+# Background jobs live in the jobs table. enqueue() adds a row in the caller's
+# transaction, so the job exists exactly when the change that caused it
+# commits. Workers (in the API process and/or `python -m app.worker`) claim due
+# rows with FOR UPDATE SKIP LOCKED, so any number of them can share the queue
+# without running a job twice. A claim is a lease: a worker that dies leaves
+# the job to be claimed again once locked_until passes. Failures are retried
+# with exponential backoff until max_attempts.
+
+logger = logging.getLogger(__name__)
+
+# Run a worker inside each API process; turn off when dedicated workers run.
+JOB_WORKER_IN_PROCESS = os.getenv("JOB_WORKER_IN_PROCESS", "true").lower() in ("1", "true", "yes")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "10"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "3600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOBS_COMPLETED = metrics.Counter("jobs_completed_total", "Background jobs that ran successfully.")
+JOBS_RETRIED = metrics.Counter("jobs_retried_total", "Background job attempts that failed and were rescheduled.")
+JOBS_FAILED = metrics.Counter("jobs_failed_total", "Background jobs that failed on their last attempt.")
+JOB_QUEUE_SECONDS = metrics.Histogram("jobs_queue_wait_seconds", "Time from a job being due to a worker starting it.")
+JOB_RUN_SECONDS = metrics.Histogram("jobs_run_seconds", "Time spent running background jobs.")
+metrics.REGISTRY += [JOBS_COMPLETED, JOBS_RETRIED, JOBS_FAILED, JOB_QUEUE_SECONDS, JOB_RUN_SECONDS]
+
+# name -> (handler, max_attempts)
+_handlers = {}
+# job name -> interval in seconds
+_schedules = {}
+# Workers running in this process, woken when a job is committed.
+_workers = set()
+
+
+def handler(name: str, max_attempts: int = None):
+    """Register ``func(db, **payload)`` as the handler for jobs called ``name``."""
+    def register(func):
+        _handlers[name] = (func, max_attempts or JOB_MAX_ATTEMPTS)
+        return func
+    return register
+
+
+def every(seconds: float, name: str):
+    """Enqueue the job ``name`` (with no payload) every ``seconds``."""
+    _schedules[name] = seconds
+
+
+def enqueue(db: AsyncSession, name: str, delay: float = 0, **payload):
+    """Queue ``name`` to run with ``payload`` once ``db``'s transaction commits."""
+    if name not in _handlers:
+        raise KeyError(f"no handler for job {name!r}")
+    db.add(models.Job(name=name, payload=payload, max_attempts=_handlers[name][1],
+                      run_at=datetime.utcnow() + timedelta(seconds=delay)))
+    db.info["jobs_enqueued"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers(session):
+    if session.info.pop("jobs_enqueued", False):
+        for worker in _workers:
+            worker.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_enqueued(session):
+    session.info.pop("jobs_enqueued", None)
+
+
+def backoff(attempts: int):
+    """Seconds to wait before retrying a job that has failed ``attempts`` times."""
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+async def claim(db: AsyncSession, limit: int):
+    """Lease up to ``limit`` due jobs to the caller and return them."""
+    job = models.Job
+    now = datetime.utcnow()
+    due = or_(and_(job.status == QUEUED, job.run_at <= now),
+              and_(job.status == RUNNING, job.locked_until < now))
+    ids = (await db.scalars(select(job.id).filter(due).order_by(job.run_at, job.id).limit(limit)
+                            .with_for_update(skip_locked=True))).all()
+    if not ids:
+        await db.rollback()
+        return []
+    claimed = (await db.execute(
+        update(job).filter(job.id.in_(ids))
+        .values(status=RUNNING, attempts=job.attempts + 1, locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS))
+        .returning(job.id, job.name, job.payload, job.attempts, job.max_attempts, job.run_at)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    return sorted(claimed, key=lambda row: (row.run_at, row.id))
+
+
+async def _finish(claimed, error: Optional[str]):
+    job = models.Job
+    now = datetime.utcnow()
+    if error is None:
+        values = dict(status=DONE, finished_at=now, last_error=None)
+        JOBS_COMPLETED.inc()
+    elif claimed.attempts >= claimed.max_attempts:
+        values = dict(status=FAILED, finished_at=now, last_error=error)
+        JOBS_FAILED.inc()
+    else:
+        values = dict(status=QUEUED, run_at=now + timedelta(seconds=backoff(claimed.attempts)), last_error=error)
+        JOBS_RETRIED.inc()
+    async with SessionLocal() as db:
+        # Matching attempts keeps a worker whose lease expired from
+        # overwriting the outcome of the worker that re-claimed the job.
+        await db.execute(update(job).filter(job.id == claimed.id).filter(job.attempts == claimed.attempts)
+                         .values(locked_until=None, **values).execution_options(synchronize_session=False))
+        await db.commit()
+
+
+async def run(claimed):
+    """Run a claimed job in its own session and record the outcome."""
+    JOB_QUEUE_SECONDS.observe(max(0.0, (datetime.utcnow() - claimed.run_at).total_seconds()))
+    start = perf_counter()
+    error = None
+    try:
+        func, _ = _handlers[claimed.name]
+        async with SessionLocal() as db:
+            await func(db, **claimed.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("job %s #%d failed (attempt %d of %d)\n%s", claimed.name, claimed.id,
+                       claimed.attempts, claimed.max_attempts, error)
+    finally:
+        JOB_RUN_SECONDS.observe(perf_counter() - start)
+    await _finish(claimed, error)
+
+
+async def _add_missing_schedules(db: AsyncSession):
+    existing = set((await db.scalars(select(models.JobSchedule.name))).all())
+    db.add_all(models.JobSchedule(name=name, next_run_at=datetime.utcnow())
+               for name in _schedules if name not in existing)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another worker added them first.
+        await db.rollback()
+
+
+async def enqueue_due_schedules(db: AsyncSession):
+    """Enqueue every periodic job that is due and move its schedule forward."""
+    now = datetime.utcnow()
+    due = (await db.scalars(select(models.JobSchedule)
+                            .filter(models.JobSchedule.name.in_(list(_schedules)))
+                            .filter(models.JobSchedule.next_run_at <= now)
+                            .with_for_update(skip_locked=True))).all()
+    for schedule in due:
+        enqueue(db, schedule.name)
+        schedule.next_run_at = now + timedelta(seconds=_schedules[schedule.name])
+    await db.commit()
+
+
+async def prune(db: AsyncSession, older_than: timedelta):
+    """Delete jobs that finished successfully before ``older_than`` ago; failed jobs are kept."""
+    job = models.Job
+    await db.execute(delete(job).filter(job.status == DONE)
+                     .filter(job.finished_at < datetime.utcnow() - older_than))
+    await db.commit()
+
+
+class Worker:
+    """Claims and runs jobs, at most ``concurrency`` at a time, until ``stop()``."""
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, poll: float = JOB_POLL_SECONDS, schedules: bool = True):
+        self.concurrency = concurrency
+        self.poll = poll
+        self.schedules = schedules
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._next_schedule_check = 0.0
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+
+    async def run(self):
+        _workers.add(self)
+        running = set()
+        try:
+            if self.schedules:
+                async with SessionLocal() as db:
+                    await _add_missing_schedules(db)
+            while not self._stopping:
+                self._wakeup.clear()
+                try:
+                    claimed = await self._tick(self.concurrency - len(running))
+                except Exception:
+                    logger.exception("job worker failed to poll the queue")
+                    claimed = []
+                for job in claimed:
+                    task = asyncio.create_task(run(job))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    task.add_done_callback(lambda _: self.wake())
+                # A full batch may mean more is due; otherwise sleep until a
+                # commit or a finished job wakes us, or the poll interval.
+                if claimed and len(running) < self.concurrency:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll)
+                except asyncio.TimeoutError:
+                    pass
+            if running:
+                await asyncio.wait(running)
+        finally:
+            _workers.discard(self)
+
+    async def _tick(self, free: int):
+        async with SessionLocal() as db:
+            if self.schedules and _schedules and perf_counter() >= self._next_schedule_check:
+                self._next_schedule_check = perf_counter() + self.poll
+                await enqueue_due_schedules(db)
+            return await claim(db, free) if free > 0 else []
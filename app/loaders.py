@@ -0,0 +1,78 @@
+from sqlalchemy.orm import selectinload
+
+from . import models
+
+# Loader option trees mirroring the response schemas in schemas.py. Each tree
+# eagerly loads exactly the relationships its schema serializes, one SELECT
+# per relationship level, so the statement count of an endpoint does not
+# depend on how many child rows it returns. Keep them in step with schemas.py:
+# anything a schema reads that is not listed here raises under AsyncSession.
+
+EVENT = (
+    selectinload(models.Event.organizer),
+)
+
+REGISTRATION = (
+    selectinload(models.Registration.event).options(*EVENT),
+    selectinload(models.Registration.user),
+)
+
+INVENTORY_REQUEST = (
+    selectinload(models.InventoryRequest.item),
+    selectinload(models.InventoryRequest.event).options(*EVENT),
+    selectinload(models.InventoryRequest.requester),
+)
+
+EVENT_OUT = EVENT + (
+    selectinload(models.Event.venue_bookings),
+    selectinload(models.Event.permissions),
+    selectinload(models.Event.registrations).options(*REGISTRATION),
+)
+
+PERMISSION_OUT = (
+    selectinload(models.Permission.requestor),
+    selectinload(models.Permission.event).options(*EVENT),
+    selectinload(models.Permission.approver),
+)
+
+VENUE_OUT = (
+    selectinload(models.Venue.bookings),
+)
+
+VENUE_BOOKING_OUT = (
+    selectinload(models.VenueBooking.venue),
+    selectinload(models.VenueBooking.event).options(*EVENT),
+    selectinload(models.VenueBooking.booker),
+)
+
+USER_OUT = (
+    selectinload(models.User.events_organized).options(*EVENT),
+    selectinload(models.User.inventory_requests).options(*INVENTORY_REQUEST),
+    selectinload(models.User.venue_bookings),
+    selectinload(models.User.permissions_to_approve),
+    selectinload(models.User.permissions_requested),
+    selectinload(models.User.registrations).options(*REGISTRATION),
+)
+
+# Relationships that ?expand= may ask for, with the loader options of each
+# one's own relationships (see fields.Projection).
+
+EVENT_SUMMARY_RELATIONS = {
+    "organizer": (),
+}
+
+EVENT_OUT_RELATIONS = {
+    "organizer": (),
+    "venue_bookings": (),
+    "permissions": (),
+    "registrations": REGISTRATION,
+}
+
+USER_OUT_RELATIONS = {
+    "events_organized": EVENT,
+    "inventory_requests": INVENTORY_REQUEST,
+    "venue_bookings": (),
+    "permissions_to_approve": (),
+    "permissions_requested": (),
+    "registrations": REGISTRATION,
+}
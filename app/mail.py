@@ -0,0 +1,36 @@
+import asyncio
+import logging
+import smtplib
+from email.message import EmailMessage
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _send(message: EmailMessage):
+    with smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=30) as smtp:
+        if settings.smtp_starttls:
+            smtp.starttls()
+        if settings.smtp_user:
+            smtp.login(settings.smtp_user, settings.smtp_password)
+        smtp.send_message(message)
+
+
+async def send(to: str, subject: str, body: str):
+    """Send a plain-text mail; without SMTP_HOST it is only logged (development).
+
+    The body can carry secrets such as reset links, so it is logged only with MAIL_LOG_BODY.
+    """
+    message = EmailMessage()
+    message["From"] = settings.mail_from
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    if not settings.smtp_host:
+        if settings.mail_log_body:
+            logger.info("mail to %s (SMTP_HOST not set): %s\n%s", to, subject, body)
+        else:
+            logger.info("mail to %s (SMTP_HOST not set): %s", to, subject)
+        return
+    await asyncio.to_thread(_send, message)
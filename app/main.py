@@ -1,19 +1,70 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import text
 from starlette.middleware.cors import CORSMiddleware
 
-from . import models
-from .db import engine
-from .routers import users, venues, events, permissions, auth, items
+from . import db, metrics, jobs, ratelimit, realtime, tasks  # noqa: F401  (tasks registers the job handlers)
+from .config import settings
+from .pagination import NEXT_CURSOR_HEADER
+from .ical import SYNC_TOKEN_HEADER
+from .routers import users, venues, events, permissions, auth, items, reports, realtime as realtime_router
+
+logger = logging.getLogger(__name__)
+
+# Importing the app does no I/O: the engine is created on first use and the
+# schema is managed by the Alembic migrations (alembic upgrade head), run as a
+# deploy step. Startup opens the first connection so the first request does not
+# pay for it, and /health/ready only passes once startup has finished and the
+# database answers.
+
+
+async def _ping_database():
+    async with db.get_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings.check()
+    try:
+        await asyncio.wait_for(_ping_database(), settings.health_db_timeout)
+    except Exception:
+        logger.exception("database not reachable at startup; /health/ready fails until it is")
+    worker = jobs.Worker() if jobs.JOB_WORKER_IN_PROCESS else None
+    running = asyncio.create_task(worker.run()) if worker else None
+    stop_listening = asyncio.Event()
+    listening = asyncio.create_task(realtime.listen(stop_listening)) if realtime.NOTIFY else None
+    app.state.started = True
+    yield
+    app.state.started = False
+    if worker:
+        worker.stop()
+        await running
+    if listening:
+        stop_listening.set()
+        await listening
+    await db.dispose()
+
 
 origins = ["*"]
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.state.started = False
+app.router.route_class = metrics.TimedRoute
+# Added first so it runs innermost: 429s still get CORS headers and are counted.
+app.add_middleware(ratelimit.RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, SYNC_TOKEN_HEADER, "Server-Timing", "ETag", "Last-Modified"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 @app.get("/")
@@ -25,11 +76,35 @@ async def root():
 async def say_hello(name: str):
     return {"message": f"Hello {name}"}
 
-models.Base.metadata.create_all(bind=engine)
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    """The process is serving requests; says nothing about its dependencies."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness():
+    """Startup has finished and the database answers within HEALTH_DB_TIMEOUT seconds."""
+    if not app.state.started:
+        raise HTTPException(status_code=503, detail="Starting")
+    try:
+        await asyncio.wait_for(_ping_database(), settings.health_db_timeout)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok"}
+
 
 app.include_router(users.router)
 app.include_router(venues.router)
 app.include_router(events.router)
 app.include_router(permissions.router)
 app.include_router(auth.router)
-app.include_router(items.router)
\ No newline at end of file
+app.include_router(items.router)
+app.include_router(reports.router)
+app.include_router(realtime_router.router)
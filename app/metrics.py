@@ -0,0 +1,304 @@
+import asyncio
+import bisect
+import functools
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from fastapi.routing import APIRoute
+
+# Per-request timings. MetricsMiddleware opens a RequestStats for every HTTP
+# request; the engine hooks in db.py add each statement to it, TimedRoute
+# and serializing() add serialization time, and when the response is sent the
+# totals go to the Prometheus registry below (served at /metrics) and to the
+# Server-Timing header.
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _number(value):
+    # repr keeps every digit; :g would round counters past 1e6 to 6 significant figures.
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _header(name: str, help: str, kind: str):
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {kind}"
+
+
+def _buckets(name: str, names, labels, buckets, counts, count: int, total: float):
+    cumulative = 0
+    for bound, n in zip(buckets, counts):
+        cumulative += n
+        yield f"{name}_bucket{_labels(names + ('le',), labels + (_number(bound),))} {cumulative}"
+    yield f"{name}_bucket{_labels(names + ('le',), labels + ('+Inf',))} {count}"
+    yield f"{name}_sum{_labels(names, labels)} {_number(total)}"
+    yield f"{name}_count{_labels(names, labels)} {count}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        bucket = bisect.bisect_left(self.buckets, value)
+        if bucket < len(self.buckets):
+            self.counts[bucket] += 1
+        self.count += 1
+        self.total += value
+
+    def render(self):
+        yield from _header(self.name, self.help, "histogram")
+        yield from _buckets(self.name, (), (), self.buckets, self.counts, self.count, self.total)
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def render(self):
+        yield from _header(self.name, self.help, "counter")
+        yield f"{self.name} {_number(self.value)}"
+
+
+class Gauge:
+    """Gauge whose value is read from ``read()`` at scrape time."""
+
+    def __init__(self, name: str, help: str, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self):
+        yield from _header(self.name, self.help, "gauge")
+        yield f"{self.name} {_number(self.read())}"
+
+
+class RequestMetrics:
+    """Per-route request totals, kept as one row per (method, route, status).
+
+    Recording a request is a single dict lookup and a few additions; the
+    Prometheus families are only assembled when /metrics is scraped.
+    """
+
+    LABELS = ("method", "route", "status")
+    COUNTERS = (
+        # (name, help, row index)
+        ("http_request_db_seconds_total", "Time spent executing SQL during requests.", 2),
+        ("http_request_db_statements_total", "SQL statements executed during requests.", 3),
+        ("http_request_db_rows_total", "Rows fetched by SQL statements during requests.", 4),
+        ("http_request_serialization_seconds_total", "Time spent serializing response bodies.", 5),
+    )
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._rows = {}
+
+    def observe(self, key, elapsed: float, db: float, statements: int, rows: int, serialize: float):
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = [0, 0.0, 0.0, 0, 0, 0.0, [0] * len(self.buckets)]
+        row[0] += 1
+        row[1] += elapsed
+        row[2] += db
+        row[3] += statements
+        row[4] += rows
+        row[5] += serialize
+        bucket = bisect.bisect_left(self.buckets, elapsed)
+        if bucket < len(self.buckets):
+            row[6][bucket] += 1
+
+    def render(self):
+        rows = [(tuple(map(str, key)), row) for key, row in list(self._rows.items())]
+        yield from _header("http_requests_total", "HTTP requests served.", "counter")
+        for labels, row in rows:
+            yield f"http_requests_total{_labels(self.LABELS, labels)} {row[0]}"
+        name = "http_request_duration_seconds"
+        yield from _header(name, "Wall time from request to last response byte.", "histogram")
+        for labels, row in rows:
+            yield from _buckets(name, self.LABELS, labels, self.buckets, row[6], row[0], row[1])
+        for name, help, index in self.COUNTERS:
+            yield from _header(name, help, "counter")
+            for labels, row in rows:
+                yield f"{name}{_labels(self.LABELS, labels)} {_number(row[index])}"
+
+
+REQUESTS = RequestMetrics()
+QUERY_SECONDS = Histogram("db_query_duration_seconds", "Duration of individual SQL statements.")
+POOL_WAIT_SECONDS = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool.",
+                              buckets=(.0005, .001, .005, .01, .05, .1, .5, 1, 5, 10, 30))
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after pool_timeout.")
+# Event streams stay open for as long as the client listens, so they are kept
+# out of the request histogram and the slow-request log.
+STREAM_SECONDS = Histogram("http_stream_duration_seconds", "How long event-stream responses stayed open.",
+                           buckets=(1, 10, 60, 300, 900, 1800, 3600, 7200, 14400, 28800))
+
+# db.py appends the pool gauges once the engine exists.
+REGISTRY = [REQUESTS, QUERY_SECONDS, POOL_WAIT_SECONDS, POOL_TIMEOUTS, STREAM_SECONDS]
+
+
+def render():
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+class RequestStats:
+    __slots__ = ("start", "db", "statements", "rows", "serialize", "endpoint_done", "queries")
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.db = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.serialize = 0.0
+        self.endpoint_done = None
+        self.queries = []
+
+    def server_timing(self):
+        return b"app;dur=%.1f, db;dur=%.1f, ser;dur=%.1f" % (
+            (perf_counter() - self.start) * 1000, self.db * 1000, self.serialize * 1000)
+
+
+current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def record_query(statement: str, elapsed: float, rows: int):
+    """Called by the engine hooks in db.py for every statement."""
+    QUERY_SECONDS.observe(elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("slow query (%.1fms): %s", elapsed * 1000, statement)
+    stats = current.get()
+    if stats is not None:
+        stats.db += elapsed
+        stats.statements += 1
+        stats.rows += rows
+        stats.queries.append((statement, elapsed))
+
+
+@contextmanager
+def serializing():
+    """Count the enclosed block as serialization time for the current request."""
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        stats = current.get()
+        if stats is not None:
+            stats.serialize += perf_counter() - start
+
+
+def _timed_endpoint(endpoint):
+    # include_router builds each route again from the already wrapped endpoint.
+    if not asyncio.iscoroutinefunction(endpoint) or getattr(endpoint, "_timed", False):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            stats = current.get()
+            if stats is not None:
+                stats.endpoint_done = perf_counter()
+    timed._timed = True
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """Route that counts the time FastAPI spends serializing the endpoint's return value."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            stats = current.get()
+            if stats is not None and stats.endpoint_done is not None:
+                stats.serialize += perf_counter() - stats.endpoint_done
+            return response
+        return timed_handler
+
+
+def _log_slow_request(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    by_statement = {}
+    for statement, duration in stats.queries:
+        count, total = by_statement.get(statement, (0, 0.0))
+        by_statement[statement] = (count + 1, total + duration)
+    queries = sorted(by_statement.items(), key=lambda item: item[1][1], reverse=True)
+    logger.warning(
+        "slow request %s %s -> %d (%.1fms; db %.1fms in %d statements, %d rows; serialization %.1fms)%s",
+        method, route, status, elapsed * 1000, stats.db * 1000, stats.statements, stats.rows, stats.serialize * 1000,
+        "".join(f"\n  {total * 1000:.1f}ms x{count}: {statement}" for statement, (count, total) in queries),
+    )
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times each HTTP request and adds a Server-Timing header.
+
+    Responses with a ``text/event-stream`` content type are timed as connections
+    in STREAM_SECONDS instead.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = current.set(stats)
+        status = 500
+        streaming = False
+
+        async def send_with_timing(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                for name, value in message.get("headers", ()))
+                message = {**message, "headers": [*message.get("headers", ()),
+                                                  (b"server-timing", stats.server_timing())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current.reset(token)
+            elapsed = perf_counter() - stats.start
+            if streaming:
+                STREAM_SECONDS.observe(elapsed)
+            else:
+                # Label by route template, not raw path, to keep the series bounded.
+                route = scope.get("route")
+                route = route.path if route is not None else "unmatched"
+                REQUESTS.observe((scope["method"], route, status), elapsed,
+                                 stats.db, stats.statements, stats.rows, stats.serialize)
+                if elapsed * 1000 >= SLOW_REQUEST_MS:
+                    _log_slow_request(scope["method"], route, status, elapsed, stats)
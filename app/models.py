@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Enum, Text, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Boolean, Enum, Text, Float, JSON, DDL, Index, CheckConstraint, UniqueConstraint, event, text, false
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 import enum
+from datetime import datetime
 
 Base = declarative_base()
 
@@ -49,19 +51,33 @@ class Venue(Base):
     bookings = relationship("VenueBooking", back_populates="venue")
 
 
+BOOKING_PERIOD = "tsrange(start_time, end_time, '[)')"
+
+
 class VenueBooking(Base):
     __tablename__ = 'venue_bookings'
+    __table_args__ = (
+        Index('ix_venue_bookings_venue_id_start_time_end_time', 'venue_id', 'start_time', 'end_time'),
+        CheckConstraint('start_time < end_time', name='ck_venue_bookings_time_order'),
+        # A venue cannot hold two live bookings whose [start_time, end_time) overlap.
+        ExcludeConstraint(('venue_id', '='), (text(BOOKING_PERIOD), '&&'),
+                          name='venue_bookings_no_overlap', using='gist',
+                          where=text("status <> 'cancelled'")).ddl_if(dialect='postgresql'),
+        # Bookings utilization.backfill still has to fold into venue_hourly_usage.
+        Index('ix_venue_bookings_not_rolled_up', 'id', postgresql_where=text('NOT rolled_up'), sqlite_where=text('NOT rolled_up')),
+    )
 
     id = Column(Integer, primary_key=True)
     venue_id = Column(Integer, ForeignKey('venues.id'))
-    event_id = Column(Integer, ForeignKey('events.id'))
-    permission_id = Column(Integer, ForeignKey('permissions.id'))
-    booker_id = Column(Integer, ForeignKey('users.id'))  # Added missing foreign key
+    event_id = Column(Integer, ForeignKey('events.id'), index=True)
+    permission_id = Column(Integer, ForeignKey('permissions.id'), index=True)
+    booker_id = Column(Integer, ForeignKey('users.id'), index=True)  # Added missing foreign key
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=False)
     purpose = Column(Text)
     status = Column(String(50), default='approved')
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())  # also a calendar sync token
+    rolled_up = Column(Boolean, nullable=False, server_default=false())
 
     # Relationships
     venue = relationship("Venue", back_populates="bookings")
@@ -69,19 +85,32 @@ class VenueBooking(Base):
     booker = relationship("User", back_populates="venue_bookings")  # Added relationship
 
 
+event.listen(VenueBooking.__table__, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql"))
+
+
 class Event(Base):
     __tablename__ = 'events'
+    __table_args__ = (
+        Index('ix_events_start_date_id', 'start_date', 'id'),
+        Index('ix_events_status_start_date', 'status', 'start_date'),
+        CheckConstraint('registered_count >= 0', name='ck_events_registered_count'),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String(255), nullable=False)
     description = Column(Text)
-    organizer_id = Column(Integer, ForeignKey('users.id'))
+    organizer_id = Column(Integer, ForeignKey('users.id'), index=True)
     start_date = Column(DateTime, nullable=False)
     end_date = Column(DateTime, nullable=False)
     status = Column(String(50), default='draft')
-    expected_attendance = Column(Integer)
+    expected_attendance = Column(Integer)  # capacity for registrations; NULL is unlimited
+    registered_count = Column(Integer, nullable=False, default=0, server_default='0')
+    waitlist_enabled = Column(Boolean, nullable=False, default=False, server_default=false())
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, onupdate=func.now())
+    # Calendar sync token. Stamped by the app rather than now(): the time of the
+    # write, not the transaction start, at the same precision since= binds at.
+    updated_at = Column(DateTime, default=datetime.utcnow, server_default=func.now(), onupdate=datetime.utcnow, index=True)
     type = Column(String(50))
     logo = Column(String(255))
 
@@ -93,8 +122,27 @@ class Event(Base):
     registrations = relationship("Registration", back_populates="event")
 
 
+# Full-text document for event search. Index and queries must use this exact
+# expression (config as a literal, no bound parameters) for Postgres to match
+# the expression index.
+EVENT_SEARCH_DOCUMENT = (
+    "to_tsvector('english', coalesce(title, '') || ' ' || "
+    "coalesce(description, '') || ' ' || coalesce(type, ''))"
+)
+
+event.listen(Event.__table__, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+event.listen(Event.__table__, "after_create",
+             DDL(f"CREATE INDEX ix_events_search ON events USING gin ({EVENT_SEARCH_DOCUMENT})").execute_if(dialect="postgresql"))
+event.listen(Event.__table__, "after_create",
+             DDL("CREATE INDEX ix_events_title_trgm ON events USING gin (lower(title) gin_trgm_ops)").execute_if(dialect="postgresql"))
+
+
 class InventoryItem(Base):
     __tablename__ = 'inventory_items'
+    __table_args__ = (
+        CheckConstraint('quantity_available >= 0', name='ck_inventory_items_quantity_available'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -112,11 +160,14 @@ class InventoryItem(Base):
 
 class InventoryRequest(Base):
     __tablename__ = 'inventory_requests'
+    __table_args__ = (
+        Index('ix_inventory_requests_item_id_status', 'item_id', 'status'),
+    )
 
     id = Column(Integer, primary_key=True)
-    requester_id = Column(Integer, ForeignKey('users.id'))
+    requester_id = Column(Integer, ForeignKey('users.id'), index=True)
     item_id = Column(Integer, ForeignKey('inventory_items.id'))
-    event_id = Column(Integer, ForeignKey('events.id'))
+    event_id = Column(Integer, ForeignKey('events.id'), index=True)
     quantity_requested = Column(Integer, nullable=False)
     status = Column(String(50), default='pending')
     request_date = Column(DateTime, server_default=func.now())
@@ -130,6 +181,10 @@ class InventoryRequest(Base):
 
 class InventoryTransaction(Base):
     __tablename__ = 'inventory_transactions'
+    __table_args__ = (
+        Index('ix_inventory_transactions_item_id_transaction_date', 'item_id', 'transaction_date'),
+        Index('ix_inventory_transactions_transaction_date', 'transaction_date'),
+    )
 
     id = Column(Integer, primary_key=True)
     item_id = Column(Integer, ForeignKey('inventory_items.id'))
@@ -142,12 +197,46 @@ class InventoryTransaction(Base):
     item = relationship("InventoryItem", back_populates="transactions")
 
 
+class InventoryDailyUsage(Base):
+    """Per-item, per-day totals of inventory_transactions, maintained by analytics.refresh_inventory_usage."""
+    __tablename__ = 'inventory_daily_usage'
+
+    day = Column(Date, primary_key=True)
+    item_id = Column(Integer, ForeignKey('inventory_items.id'), primary_key=True)
+    quantity_in = Column(Integer, nullable=False, default=0)
+    quantity_out = Column(Integer, nullable=False, default=0)
+    quantity_returned = Column(Integer, nullable=False, default=0)
+
+
+class ReportRefresh(Base):
+    """When each rollup table was last refreshed; its row is also the lock refreshes take."""
+    __tablename__ = 'report_refreshes'
+
+    name = Column(String(50), primary_key=True)
+    refreshed_at = Column(DateTime)
+
+
+class VenueHourlyUsage(Base):
+    """Per-venue, per-hour booked time, maintained by the utilization module."""
+    __tablename__ = 'venue_hourly_usage'
+
+    venue_id = Column(Integer, ForeignKey('venues.id'), primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    booked_minutes = Column(Integer, nullable=False, default=0)
+    seat_minutes = Column(Integer, nullable=False, default=0)  # expected attendance x booked minutes
+    bookings = Column(Integer, nullable=False, default=0)
+
+
 class Permission(Base):
     __tablename__ = 'permissions'
+    __table_args__ = (
+        # Approver inbox: filter by approver and status, keyset on (requested_at, id).
+        Index('ix_permissions_inbox', 'approver_id', 'status', 'requested_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
-    event_id = Column(Integer, ForeignKey('events.id'))
-    user_id = Column(Integer, ForeignKey('users.id'))
+    event_id = Column(Integer, ForeignKey('events.id'), index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     approver_id = Column(Integer, ForeignKey('users.id'))
     permission_type = Column(String(50))  # venue, budget, equipment
     status = Column(String(50), default='pending')
@@ -166,12 +255,46 @@ class Permission(Base):
 
 class Registration(Base):
     __tablename__ = 'registrations'
+    __table_args__ = (
+        UniqueConstraint('event_id', 'user_id', name='uq_registrations_event_id_user_id'),
+        Index('ix_registrations_event_id_status_registration_date', 'event_id', 'status', 'registration_date'),
+    )
 
     id = Column(Integer, primary_key=True)
     event_id = Column(Integer, ForeignKey('events.id'))
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     registration_date = Column(DateTime, server_default=func.now())
+    status = Column(String(20), nullable=False, default='registered', server_default='registered')  # registered, waitlisted, cancelled
+    idempotency_key = Column(String(255))
 
     # Relationships
     event = relationship("Event", back_populates="registrations")
     user = relationship("User", back_populates="registrations")
+
+
+class Job(Base):
+    """A queued unit of background work, run by jobs.Worker."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String(20), nullable=False, default='queued', server_default='queued')  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime)  # lease of the worker running it; an expired lease is claimed again
+    last_error = Column(Text)
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime)
+
+
+class JobSchedule(Base):
+    """When each periodic job is next due; workers claim due rows to enqueue them."""
+    __tablename__ = 'job_schedules'
+
+    name = Column(String(100), primary_key=True)
+    next_run_at = Column(DateTime, nullable=False)
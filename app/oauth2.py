@@ -1,62 +1,142 @@
 import os
+import time
 import jwt
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from . import models, db
-from sqlalchemy.orm import Session
-from dotenv import load_dotenv
+from . import models, db, schemas
+from .cache import TTLCache
+from .config import settings
+from sqlalchemy import inspect, select, event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.ext.asyncio import AsyncSession
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-load_dotenv()
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
 
+# users.id -> schemas.User snapshot, evicted when the row is committed with changes
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(ACCESS_TOKEN_EXPIRE_MINUTES)
+# users.id -> time.time() of the last commit changing their role or active flag,
+# or deleting them. Tokens issued before that carry stale claims, so their users
+# are looked up instead; entries are kept for a token's lifetime. This is per
+# process: other workers trust the old claims until the token expires, so keep
+# ACCESS_TOKEN_EXPIRE_MINUTES short.
+stale_claims = TTLCache(maxsize=USER_CACHE_SIZE, ttl=60 * (settings.access_token_expire_minutes or 24 * 60))
 
 
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    now = datetime.utcnow()
+    to_encode.update({"exp": now + timedelta(minutes=settings.access_token_expire_minutes), "iat": now})
+    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
     return encoded_jwt
 
 
+def create_user_token(user: models.User):
+    return create_access_token(data={"user_id": user.id, "role": user.role, "is_active": user.is_active})
+
+
 def verify_token(token: str, credentials_exception):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         user_id: int = payload.get("user_id")
         if user_id is None:
             raise credentials_exception
-        token_data = {"id": user_id}
+        token_data = schemas.TokenData(id=user_id, role=payload.get("role"), is_active=payload.get("is_active", True),
+                                      issued_at=payload.get("iat"))
         return token_data
     except Exception as er:
         raise credentials_exception
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(db.get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid credentials",
         headers={"WWW-Authenticate": "Bearer"}
     )
+
+
+async def _load_user(user_id: int, db: AsyncSession):
+    user = user_cache.get(user_id)
+    if user is None:
+        db_user = await db.scalar(select(models.User).filter(models.User.id == user_id))
+        if db_user is None:
+            return None
+        user = schemas.User.model_validate(db_user, from_attributes=True)
+        user_cache.set(user_id, user)
+    return user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(db.get_db)):
+    credentials_exception = _credentials_exception()
     token = verify_token(token, credentials_exception)
-    user = db.query(models.User).filter(models.User.id == token["id"]).first()
+    user = await _load_user(token.id, db)
     if not user:
         raise credentials_exception
     else:
         return user
 
 
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(db.get_db)):
+    """Authenticate from the token claims alone.
+
+    Tokens issued without claims, or before their user's role or active flag
+    changed in this process (see stale_claims), fall back to the user lookup.
+    """
+    credentials_exception = _credentials_exception()
+    principal = verify_token(token, credentials_exception)
+    changed = stale_claims.get(principal.id)
+    stale = changed is not None and (principal.issued_at is None or principal.issued_at <= changed)
+    if principal.role is None or stale:
+        user = await _load_user(principal.id, db)
+        if not user:
+            raise credentials_exception
+        principal = schemas.TokenData(id=user.id, role=user.role, is_active=user.is_active)
+    if not principal.is_active:
+        raise credentials_exception
+    return principal
+
+
+@event.listens_for(models.User, "after_update")
+def _mark_user_changed(mapper, connection, target):
+    info = object_session(target).info
+    info.setdefault("changed_users", set()).add(target.id)
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+        info.setdefault("changed_claims", set()).add(target.id)
+
+
+@event.listens_for(models.User, "after_delete")
+def _mark_user_deleted(mapper, connection, target):
+    info = object_session(target).info
+    info.setdefault("changed_users", set()).add(target.id)
+    info.setdefault("changed_claims", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        user_cache.pop(user_id)
+    now = time.time()
+    for user_id in session.info.pop("changed_claims", ()):
+        stale_claims.set(user_id, now)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_users", None)
+    session.info.pop("changed_claims", None)
+
+
 def create_reset_token(email: str, expires_delta: int):
     to_encode = {"email": email}
     expire = datetime.utcnow() + timedelta(minutes=expires_delta)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
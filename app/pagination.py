@@ -0,0 +1,62 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Upper bound for ``limit`` on the list endpoints.
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values) -> str:
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(v) if isinstance(key.type, DateTime) else v for key, v in zip(keys, values)]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _key_value(row, key):
+    return getattr(row, key.key)
+
+
+async def paginate(db: AsyncSession, stmt, keys, limit: int, cursor: str = None, skip: int = 0):
+    """Run ``stmt`` ordered by ``keys`` and return ``(rows, next_cursor)``.
+
+    With a cursor the page starts strictly after the encoded key, so deep pages
+    cost the same as the first one; without one ``skip`` is applied as an
+    offset for older clients. ``keys`` must end in a unique column.
+    """
+    if limit < 1:
+        return [], None
+    stmt = stmt.order_by(*keys)
+    if cursor is not None:
+        values = decode_cursor(cursor, keys)
+        if len(keys) == 1:
+            stmt = stmt.filter(keys[0] > values[0])
+        else:
+            stmt = stmt.filter(tuple_(*keys) > tuple_(*values))
+    elif skip:
+        stmt = stmt.offset(skip)
+    rows = (await db.scalars(stmt.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([_key_value(rows[-1], key) for key in keys])
+    return rows, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: str):
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,277 @@
+import json
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import jwt
+
+from . import metrics, utils
+from .cache import TTLCache
+from .config import settings
+
+# Admission control in front of the routers. Writes take a token from the
+# caller's bucket (keyed by the user_id of a valid bearer token), requests to
+# the routes in ROUTES from that route's own buckets, and, with RATE_LIMIT_IP
+# set, every request from its client IP's bucket; a request is admitted only if every bucket has a token, otherwise
+# none is spent and it gets a 429 with Retry-After. Expensive routes also have
+# a cap on requests in flight: beyond it requests are shed at once instead of
+# queueing behind the others, so one noisy client cannot drag everyone's p99.
+# Health checks and metrics scrapes are never limited.
+# Buckets live in memory per worker, or in Redis (RATE_LIMIT_REDIS_URL) to be
+# shared; concurrency caps are always per worker.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_BUCKETS = int(os.getenv("RATE_LIMIT_BUCKETS", "100000"))
+RATE_LIMIT_TOKEN_CACHE = int(os.getenv("RATE_LIMIT_TOKEN_CACHE", "10000"))
+# Only behind a proxy that sets it: otherwise clients pick their own key. Left
+# off behind a proxy, every client shares the proxy's address, and the per-IP
+# limits below (login above all) become limits for the whole site.
+RATE_LIMIT_TRUST_FORWARDED_FOR = os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() in ("1", "true", "yes")
+
+RATE_LIMITED = metrics.Counter("rate_limited_total", "Requests refused with 429 because a token bucket was empty.")
+LOAD_SHED = metrics.Counter("load_shed_total", "Requests refused with 429 because their route was at its concurrency cap.")
+metrics.REGISTRY += [RATE_LIMITED, LOAD_SHED]
+
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+EXEMPT_PATHS = frozenset(("/health/live", "/health/ready", "/metrics"))
+
+
+class Rate:
+    """``count`` tokens every ``seconds``, holding at most ``burst``.
+
+    Parsed from ``"count/seconds"`` or ``"count/seconds:burst"``; burst defaults to count.
+    """
+
+    __slots__ = ("per_second", "burst")
+
+    def __init__(self, spec: str):
+        rate, _, burst = spec.partition(":")
+        count, _, seconds = rate.partition("/")
+        self.per_second = float(count) / float(seconds or 1)
+        self.burst = float(burst or count)
+
+
+def _rate(name: str, default: str):
+    return Rate(os.getenv(name, default))
+
+
+# Off unless RATE_LIMIT_IP is set: a NAT or an untrusted proxy puts many
+# clients behind one address, and a site-wide limit per address would throttle
+# them all together. Turning it on behind a proxy needs
+# RATE_LIMIT_TRUST_FORWARDED_FOR.
+PER_IP = Rate(os.environ["RATE_LIMIT_IP"]) if os.getenv("RATE_LIMIT_IP") else None
+PER_USER_WRITES = _rate("RATE_LIMIT_USER_WRITES", "10/1:50")
+
+
+class Route:
+    """Limits for one method and path template: rates keyed by IP and/or user, and a concurrency cap."""
+
+    def __init__(self, method: str, path: str, per_ip: Rate = None, per_user: Rate = None, concurrency: int = None):
+        self.method = method
+        self.name = f"{method} {path}"
+        self.pattern = re.compile("^" + re.sub(r"\{[^/]+\}", "[^/]+", path.rstrip("/")) + "/?$")
+        self.per_ip = per_ip
+        self.per_user = per_user
+        self.concurrency = concurrency
+        self.in_flight = 0
+
+
+# Login, sign-up and password reset run bcrypt or send mail, so they are limited
+# per IP; the user-facing burst targets are limited per user. Login and sign-up
+# are capped at what the bcrypt pool admits before callers start queueing, which
+# is what protects the server; the per-IP rates only slow password guessing, so
+# they leave room for a lab or dorm NAT logging in at once during onboarding.
+_HASH_CAPACITY = str(utils.HASH_WORKERS + utils.HASH_QUEUE_SIZE)
+ROUTES = [
+    Route("POST", "/login", per_ip=_rate("RATE_LIMIT_LOGIN", "60/60:60"),
+          concurrency=int(os.getenv("RATE_LIMIT_LOGIN_CONCURRENCY", _HASH_CAPACITY))),
+    Route("POST", "/users", per_ip=_rate("RATE_LIMIT_SIGNUP", "30/60:30"),
+          concurrency=int(os.getenv("RATE_LIMIT_SIGNUP_CONCURRENCY", _HASH_CAPACITY))),
+    Route("POST", "/password-reset", per_ip=_rate("RATE_LIMIT_PASSWORD_RESET", "5/300:5")),
+    Route("POST", "/events/{event_id}/register", per_user=_rate("RATE_LIMIT_REGISTER", "2/1:5"),
+          concurrency=int(os.getenv("RATE_LIMIT_REGISTER_CONCURRENCY", "64"))),
+    Route("POST", "/items/{item_id}/request", per_user=_rate("RATE_LIMIT_ITEM_REQUEST", "2/1:5"),
+          concurrency=int(os.getenv("RATE_LIMIT_ITEM_REQUEST_CONCURRENCY", "64"))),
+]
+
+_routes_by_method = {}
+for _route in ROUTES:
+    _routes_by_method.setdefault(_route.method, []).append(_route)
+
+
+def match(method: str, path: str) -> Optional[Route]:
+    for route in _routes_by_method.get(method, ()):
+        if route.pattern.match(path):
+            return route
+    return None
+
+
+class MemoryBackend:
+    """Buckets in this process; the least recently used are dropped past ``maxsize`` (a dropped bucket is a full one)."""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_BUCKETS):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+
+    async def take(self, checks: List[Tuple[str, Rate]], now: float = None) -> float:
+        """Spend a token from every ``(key, rate)`` bucket and return 0, or spend none and return the seconds to wait."""
+        now = time.monotonic() if now is None else now
+        buckets = self._buckets
+        levels = []
+        wait = 0.0
+        for key, rate in checks:
+            bucket = buckets.get(key)
+            tokens = rate.burst if bucket is None else min(rate.burst, bucket[0] + (now - bucket[1]) * rate.per_second)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate.per_second)
+            levels.append(tokens)
+        if wait:
+            return wait
+        for (key, _), tokens in zip(checks, levels):
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [tokens - 1, now]
+                if len(buckets) > self.maxsize:
+                    buckets.popitem(last=False)
+            else:
+                bucket[0] = tokens - 1
+                bucket[1] = now
+                buckets.move_to_end(key)
+        return 0.0
+
+
+# KEYS are bucket keys; ARGV holds a (tokens per second, burst) pair per key.
+# Uses the Redis clock so app servers with skewed clocks share buckets fairly.
+_TAKE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+  local rate, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+  local bucket = redis.call('HMGET', key, 'tokens', 'at')
+  local tokens = burst
+  if bucket[1] then
+    tokens = math.min(burst, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+  end
+  if tokens < 1 then wait = math.max(wait, (1 - tokens) / rate) end
+  levels[i] = tokens
+end
+if wait > 0 then return tostring(wait) end
+for i, key in ipairs(KEYS) do
+  local rate, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+  redis.call('HSET', key, 'tokens', levels[i] - 1, 'at', now)
+  redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+return '0'
+"""
+
+
+class RedisBackend:
+    """Buckets shared by all workers; one script call per request checks and spends every bucket atomically."""
+
+    def __init__(self, url: str, prefix: str = "rl:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the redis package is not installed")
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._prefix = prefix
+
+    async def take(self, checks: List[Tuple[str, Rate]], now: float = None) -> float:
+        args = [value for _, rate in checks for value in (rate.per_second, rate.burst)]
+        return float(await self._take(keys=[self._prefix + key for key, _ in checks], args=args))
+
+
+def _client_ip(scope):
+    if RATE_LIMIT_TRUST_FORWARDED_FOR:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.split(b",", 1)[0].strip().decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _bearer(scope):
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.partition(b" ")
+            return token.decode("latin-1") if scheme.lower() == b"bearer" and token else None
+    return None
+
+
+# Verifying a token costs far more than the bucket check, so the user each
+# recent token verified as is remembered ("" for a token that did not).
+_token_users = TTLCache(maxsize=RATE_LIMIT_TOKEN_CACHE, ttl=60)
+
+
+def _user(scope):
+    """The ``user_id`` claim of the request's bearer token, or ``None`` if there is no valid one."""
+    token = _bearer(scope)
+    if token is None:
+        return None
+    user = _token_users.get(token)
+    if user is None:
+        try:
+            user_id = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm]).get("user_id")
+        except jwt.PyJWTError:
+            user_id = None
+        user = "" if user_id is None else str(user_id)
+        _token_users.set(token, user)
+    return user or None
+
+
+async def _refuse(send, retry_after: float):
+    body = json.dumps({"detail": "Too many requests"}).encode()
+    await send({"type": "http.response.start", "status": 429, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying the token buckets and concurrency caps described above."""
+
+    def __init__(self, app, backend=None):
+        self.app = app
+        self.backend = backend or (RedisBackend(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryBackend())
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not RATE_LIMIT_ENABLED or scope["method"] == "OPTIONS"
+                or scope["path"] in EXEMPT_PATHS):
+            return await self.app(scope, receive, send)
+        method, path = scope["method"], scope["path"]
+        ip = _client_ip(scope)
+        # Keyed by the verified user id: every token a user holds shares one
+        # bucket, and a caller cannot mint fresh buckets with made-up tokens.
+        user = _user(scope)
+        checks = [] if PER_IP is None else [("ip:" + ip, PER_IP)]
+        if user is not None and method in WRITE_METHODS:
+            checks.append(("user:" + user, PER_USER_WRITES))
+        route = match(method, path)
+        if route is not None:
+            if route.per_ip is not None:
+                checks.append((f"{route.name}|ip:{ip}", route.per_ip))
+            if route.per_user is not None:
+                checks.append((f"{route.name}|user:{user}" if user else f"{route.name}|ip:{ip}", route.per_user))
+        wait = await self.backend.take(checks) if checks else 0
+        if wait:
+            RATE_LIMITED.inc()
+            return await _refuse(send, wait)
+        if route is None or route.concurrency is None:
+            return await self.app(scope, receive, send)
+        if route.in_flight >= route.concurrency:
+            LOAD_SHED.inc()
+            return await _refuse(send, 1)
+        route.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route.in_flight -= 1
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+
+from sqlalchemy import Text, bindparam, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .config import settings
+from .db import get_engine
+
+# Status changes pushed to the users they concern, over SSE or WebSocket, so
+# clients stop polling. Handlers call publish() inside their transaction. On
+# Postgres each message is sent with pg_notify, which is transactional (it is
+# only delivered if the transaction commits), and every worker relays the
+# notifications it LISTENs to to its own subscribers. Without Postgres, or
+# behind PgBouncer where LISTEN is unavailable, messages only reach this
+# process's subscribers, after commit.
+#
+# Memory per connection is bounded: a subscriber holds at most REALTIME_BUFFER
+# messages, and one that falls further behind gets a single "resync" message
+# telling it to refetch instead of an ever-growing backlog.
+
+logger = logging.getLogger(__name__)
+
+REALTIME_MAX_CONNECTIONS = int(os.getenv("REALTIME_MAX_CONNECTIONS", "10000"))
+REALTIME_BUFFER = int(os.getenv("REALTIME_BUFFER", "32"))
+REALTIME_HEARTBEAT_SECONDS = float(os.getenv("REALTIME_HEARTBEAT_SECONDS", "25"))
+
+CHANNEL = "realtime"
+NOTIFY = make_url(settings.database_url).get_backend_name() == "postgresql" and not settings.db_pgbouncer
+
+PING = json.dumps({"type": "ping"})
+RESYNC = json.dumps({"type": "resync"})
+
+
+class Subscription:
+    __slots__ = ("user_id", "_messages", "_ready")
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._messages = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, message: str):
+        if len(self._messages) >= REALTIME_BUFFER:
+            self._messages.clear()
+            message = RESYNC
+        self._messages.append(message)
+        self._ready.set()
+
+    async def get(self, timeout: float):
+        """The next message, or ``None`` if none arrived within ``timeout``."""
+        if not self._messages:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._messages.popleft()
+
+
+class Broker:
+    """This process's subscriptions, by user id."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self.connections = 0
+
+    @property
+    def full(self):
+        return self.connections >= REALTIME_MAX_CONNECTIONS
+
+    def subscribe(self, user_id: int):
+        subscription = Subscription(user_id)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+        self.connections -= 1
+
+    def deliver(self, user_id: int, message: str):
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.push(message)
+
+    def resync(self):
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.push(RESYNC)
+
+
+broker = Broker()
+
+metrics.REGISTRY.append(metrics.Gauge("realtime_connections", "Open SSE and WebSocket subscriptions.",
+                                      lambda: broker.connections))
+
+
+def message(user_id, type: str, **data):
+    """A message for ``user_id``, to pass to publish()."""
+    return user_id, json.dumps({"type": type, **data}, default=str)
+
+
+_notify = text("SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload") \
+    .bindparams(bindparam("payloads", type_=ARRAY(Text)))
+
+
+async def publish(db: AsyncSession, *messages):
+    """Send ``messages`` (from message()) when ``db``'s transaction commits."""
+    messages = [(user_id, body) for user_id, body in messages if user_id is not None]
+    if not messages:
+        return
+    if NOTIFY:
+        await db.execute(_notify, {"channel": CHANNEL, "payloads": [f"{user_id}:{body}" for user_id, body in messages]})
+    else:
+        db.info.setdefault("realtime", []).extend(messages)
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_published(session):
+    for user_id, body in session.info.pop("realtime", ()):
+        broker.deliver(user_id, body)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_published(session):
+    session.info.pop("realtime", None)
+
+
+def _on_notify(connection, pid, channel, payload):
+    user_id, body = payload.split(":", 1)
+    broker.deliver(int(user_id), body)
+
+
+async def listen(stop: asyncio.Event):
+    """Relay notifications to this process's subscribers until ``stop`` is set.
+
+    Holds one connection for LISTEN. When it is lost, messages sent meanwhile
+    are gone, so every subscriber is told to resync once it is back.
+    """
+    retry = 1
+    while not stop.is_set():
+        try:
+            async with get_engine().connect() as conn:
+                listener = (await conn.get_raw_connection()).driver_connection
+                await listener.add_listener(CHANNEL, _on_notify)
+                broker.resync()
+                retry = 1
+                while not stop.is_set() and not listener.is_closed():
+                    try:
+                        await asyncio.wait_for(stop.wait(), 5)
+                    except asyncio.TimeoutError:
+                        pass
+                if not listener.is_closed():
+                    await listener.remove_listener(CHANNEL, _on_notify)
+        except Exception:
+            logger.exception("realtime listener lost its connection; retrying in %ds", retry)
+            try:
+                await asyncio.wait_for(stop.wait(), retry)
+            except asyncio.TimeoutError:
+                pass
+            retry = min(retry * 2, 30)
@@ -0,0 +1,96 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Seats are counted in Event.registered_count and only ever change through a
+# conditional UPDATE on the event row, so the capacity check and the increment
+# are one statement: concurrent signups queue on the row lock and the counter
+# can never pass expected_attendance. Registrations are cancelled rather than
+# deleted so the (event_id, user_id) unique constraint and the idempotency key
+# of a past attempt survive an unregister.
+
+REGISTERED = "registered"
+WAITLISTED = "waitlisted"
+CANCELLED = "cancelled"
+
+
+async def _claim_seat(db: AsyncSession, event_id: int):
+    event = models.Event
+    claimed = await db.scalar(
+        update(event)
+        .filter(event.id == event_id)
+        .filter(or_(event.expected_attendance.is_(None), event.registered_count < event.expected_attendance))
+        .values(registered_count=event.registered_count + 1)
+        .returning(event.id)
+        .execution_options(synchronize_session=False)
+    )
+    return claimed is not None
+
+
+async def _release_seat(db: AsyncSession, event_id: int):
+    await db.execute(
+        update(models.Event)
+        .filter(models.Event.id == event_id)
+        .filter(models.Event.registered_count > 0)
+        .values(registered_count=models.Event.registered_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def find(db: AsyncSession, event_id: int, user_id: int):
+    return await db.scalar(select(models.Registration)
+                           .filter(models.Registration.event_id == event_id)
+                           .filter(models.Registration.user_id == user_id))
+
+
+async def register(db: AsyncSession, event: models.Event, user_id: int, idempotency_key: Optional[str] = None,
+                   existing: Optional[models.Registration] = None):
+    """Take a seat for ``user_id``, or a waitlist place if the event is full and has a waitlist.
+
+    Returns the registration, or ``None`` if the event is full. ``existing`` is
+    the user's cancelled registration for the event, which is reused. The
+    caller commits; a concurrent signup by the same user surfaces as an
+    IntegrityError from the unique constraint.
+    """
+    if await _claim_seat(db, event.id):
+        status = REGISTERED
+    elif event.waitlist_enabled:
+        status = WAITLISTED
+    else:
+        return None
+    registration = existing or models.Registration(event_id=event.id, user_id=user_id)
+    registration.status = status
+    registration.idempotency_key = idempotency_key
+    registration.registration_date = datetime.utcnow()
+    db.add(registration)
+    await db.flush()
+    return registration
+
+
+async def cancel(db: AsyncSession, registration: models.Registration):
+    """Cancel ``registration`` and, if it held a seat, give the seat to the longest-waiting user.
+
+    Returns the promoted registration, if any. The caller commits.
+    """
+    held_seat = registration.status == REGISTERED
+    registration.status = CANCELLED
+    if not held_seat:
+        return None
+    await _release_seat(db, registration.event_id)
+    # SKIP LOCKED lets concurrent cancellations each promote a different user.
+    promoted = await db.scalar(
+        select(models.Registration)
+        .filter(models.Registration.event_id == registration.event_id)
+        .filter(models.Registration.status == WAITLISTED)
+        .order_by(models.Registration.registration_date, models.Registration.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if promoted is None or not await _claim_seat(db, registration.event_id):
+        return None
+    promoted.status = REGISTERED
+    return promoted
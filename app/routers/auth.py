@@ -1,23 +1,38 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..db import get_db
-from .. import models, utils, oauth2, schemas
+from .. import models, utils, oauth2, schemas, metrics, jobs, tasks
 
 
 router = APIRouter(
-    tags=["Authentication"]
+    tags=["Authentication"],
+    route_class=metrics.TimedRoute,
 )
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_cred: schemas.UserLogin, db: Session = Depends(get_db)):
-    user_query = db.query(models.User).filter(models.User.email == user_cred.email).first()
+async def login(user_cred: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
+    user_query = await db.scalar(select(models.User).filter(models.User.email == user_cred.email))
     if not user_query:
+        await utils.dummy_verify_password()
         raise HTTPException(status_code=404, detail="Invalid credentials")
     else:
-        if not utils.verify_password(user_cred.password, user_query.password):
+        valid, new_hash = await utils.verify_and_update_password(user_cred.password, user_query.password)
+        if not valid:
             raise HTTPException(status_code=404, detail="Invalid credentials")
         else:
-            access_token = oauth2.create_access_token(data={"user_id": user_query.id})
+            if new_hash is not None:
+                user_query.password = new_hash
+                await db.commit()
+            access_token = oauth2.create_user_token(user_query)
             return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/password-reset", status_code=202)
+async def request_password_reset(reset: schemas.PasswordResetRequest, db: AsyncSession = Depends(get_db)):
+    # The mail job checks the address, so the response never reveals whether an account exists.
+    jobs.enqueue(db, tasks.SEND_PASSWORD_RESET, email=reset.email)
+    await db.commit()
+    return {"detail": "If the address has an account, a reset link is on its way"}
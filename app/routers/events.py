@@ -1,100 +1,194 @@
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from datetime import date, datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..db import get_db
-from .. import schemas, models, oauth2
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from .. import schemas, models, oauth2, loaders, registrations, search as event_search, metrics, batch, ical, realtime
+from ..cache import response_cache
+from ..fields import Projection
+from ..pagination import MAX_PAGE_SIZE, paginate, set_next_cursor
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from typing import List, Optional
 
 
 router = APIRouter(
     prefix="/events",
     tags=["events"],
+    route_class=metrics.TimedRoute,
 )
 
 
 @router.post("/", response_model=schemas.EventCreate)
-async def create_event(event: schemas.EventCreate, db: Session = Depends(get_db), current_user: schemas.User = Depends(oauth2.get_current_user)):
+async def create_event(event: schemas.EventCreate, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(oauth2.get_current_principal)):
     if current_user.role == "student":
         raise HTTPException(status_code=401, detail="Not authorized")
-    db_event = models.Event(title=event.title, description=event.description, start_date=event.start_date, end_date=event.end_date, expected_attendance=event.expected_attendance)
+    db_event = models.Event(organizer_id=current_user.id, title=event.title, description=event.description, start_date=event.start_date, end_date=event.end_date, expected_attendance=event.expected_attendance, waitlist_enabled=event.waitlist_enabled)
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    await db.commit()
+    await db.refresh(db_event)
+    await response_cache.invalidate("events:list")
     return db_event
 
 
 
 
-@router.get("/", response_model=List[schemas.Event])
-async def read_events(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), search: str = None):
-    if search is not None:
-        events = db.query(models.Event).filter(func.lower(models.Event.title).contains(search.lower())).filter(models.Event.status == "approved").offset(skip).limit(limit).all()
-    else:
-        events = db.query(models.Event).offset(skip).limit(limit).all()
-    return events
+@router.get("/", response_model=List[schemas.EventSummary])
+async def read_events(request: Request, response: Response, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, db: AsyncSession = Depends(get_db), search: str = None,
+                      fields: Optional[str] = None, expand: Optional[str] = None):
+    projection = Projection(models.Event, schemas.EventSummary, fields, expand, loaders.EVENT_SUMMARY_RELATIONS,
+                            required=[models.Event.start_date])
+
+    async def load():
+        query = select(models.Event).options(*projection.options)
+        if search is not None:
+            terms = event_search.search_terms(search)
+            if terms:
+                query = query.filter(event_search.match_clause(db.get_bind().dialect.name, terms))
+            query = query.filter(models.Event.status == "approved")
+        events, next_cursor = await paginate(db, query, [models.Event.start_date, models.Event.id], limit, cursor, skip)
+        set_next_cursor(response, next_cursor)
+        return events
+    return await response_cache.respond(request, response, projection.list_schema(), ["events:list"], load)
+
+
+@router.get("/search", response_model=List[schemas.EventSummary])
+async def search_events(q: str, response: Response, status: Optional[str] = "approved", date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                        skip: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_db), fields: Optional[str] = None, expand: Optional[str] = None):
+    projection = Projection(models.Event, schemas.EventSummary, fields, expand, loaders.EVENT_SUMMARY_RELATIONS)
+    events = await event_search.search_events(db, q, status, date_from, date_to, skip, limit, projection.options)
+    return projection.render(response, events, many=True)
+
+
+@router.get("/calendar.ics", response_class=Response, responses={200: {"content": {ical.MEDIA_TYPE: {}}}})
+async def events_calendar(request: Request, start: Optional[date] = None, end: Optional[date] = None,
+                          since: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """Events as an iCalendar feed; pass the last X-Sync-Token as ``since`` to get only what changed."""
+    since = ical.decode_since(since)
+    host = request.url.hostname
+    return await ical.respond(request, db, ical.event_feed(start, end, since), [models.Event.updated_at], "Events",
+                              lambda event: ical.event_component(event, host), since)
 
 
 @router.get("/{event_id}", response_model=schemas.EventOut)
-async def read_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if event is None:
-        raise HTTPException(status_code=404, detail="Event not found")
-    return event
+async def read_event(event_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db),
+                     fields: Optional[str] = None, expand: Optional[str] = None):
+    projection = Projection(models.Event, schemas.EventOut, fields, expand, loaders.EVENT_OUT_RELATIONS,
+                            default_expand=loaders.EVENT_OUT_RELATIONS)
+
+    async def load():
+        event = await db.scalar(select(models.Event).options(*projection.options).filter(models.Event.id == event_id))
+        if event is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return event
+    return await response_cache.respond(request, response, projection.schema, [f"events:{event_id}"], load)
+
+
+async def _set_events_status(db: AsyncSession, ids: List[int], status: str):
+    ids = batch.unique(ids)
+    done = await batch.set_status(db, models.Event, ids, status, returning=[models.Event.organizer_id])
+    errors = await batch.explain(db, models.Event, [event_id for event_id in ids if event_id not in done])
+    await realtime.publish(db, *(realtime.message(row.organizer_id, "event", id=row.id, status=status) for row in done.values()))
+    await db.commit()
+    await response_cache.invalidate("events:list", *(f"events:{event_id}" for event_id in done))
+    return batch.result(ids, status, done, errors)
+
+
+@router.post("/approve", response_model=schemas.BatchResult)
+async def approve_events(events: schemas.BatchIds, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(oauth2.get_current_principal)):
+    if current_user.role in ("student", "organization"):
+        raise HTTPException(status_code=401, detail="Not authorized")
+    return await _set_events_status(db, events.ids, "approved")
+
+
+@router.post("/reject", response_model=schemas.BatchResult)
+async def reject_events(events: schemas.BatchIds, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(oauth2.get_current_principal)):
+    if current_user.role in ("student", "organization"):
+        raise HTTPException(status_code=401, detail="Not authorized")
+    return await _set_events_status(db, events.ids, "rejected")
 
 
 @router.post("/{event_id}/approve", response_model=schemas.EventOut)
-async def approve_event(event_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(oauth2.get_current_user)):
+async def approve_event(event_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(oauth2.get_current_principal)):
     if current_user.role == "student":
         raise HTTPException(status_code=401, detail="Not authorized")
     if current_user.role == "organization":
         raise HTTPException(status_code=401, detail="Not authorized")
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+    event = await db.scalar(select(models.Event).options(*loaders.EVENT_OUT).filter(models.Event.id == event_id))
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     event.status = "approved"
-    db.commit()
-    db.refresh(event)
+    await realtime.publish(db, realtime.message(event.organizer_id, "event", id=event.id, status=event.status))
+    await db.commit()
+    await response_cache.invalidate(f"events:{event_id}", "events:list")
     return event
 
 
 @router.post("/{event_id}/reject", response_model=schemas.EventOut)
-async def reject_event(event_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(oauth2.get_current_user)):
+async def reject_event(event_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(oauth2.get_current_principal)):
     if current_user.role == "student":
         raise HTTPException(status_code=401, detail="Not authorized")
     if current_user.role == "organization":
         raise HTTPException(status_code=401, detail="Not authorized")
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+    event = await db.scalar(select(models.Event).options(*loaders.EVENT_OUT).filter(models.Event.id == event_id))
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     event.status = "rejected"
-    db.commit()
-    db.refresh(event)
+    await realtime.publish(db, realtime.message(event.organizer_id, "event", id=event.id, status=event.status))
+    await db.commit()
+    await response_cache.invalidate(f"events:{event_id}", "events:list")
     return event
 
 
+async def _load_registration(db: AsyncSession, registration_id: int):
+    return await db.scalar(select(models.Registration).options(*loaders.REGISTRATION).filter(models.Registration.id == registration_id))
+
+
+def _replayed(registration: Optional[models.Registration], idempotency_key: Optional[str]):
+    return registration is not None and idempotency_key is not None and registration.idempotency_key == idempotency_key
+
+
 @router.post("/{event_id}/register", response_model=schemas.Registration)
-async def register_event(event_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(oauth2.get_current_user)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+async def register_event(event_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(oauth2.get_current_principal),
+                         idempotency_key: Optional[str] = Header(None, max_length=255)):
+    event = await db.scalar(select(models.Event).filter(models.Event.id == event_id))
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
-    db_registeration = models.Registeration(user_id=current_user.id, event_id=event_id)
-    db.add(db_registeration)
-    db.commit()
-    db.refresh(db_registeration)
-    return db_registeration
+    # A retry carrying the Idempotency-Key of an earlier attempt gets that
+    # attempt's registration back instead of an error.
+    existing = await registrations.find(db, event_id, current_user.id)
+    if _replayed(existing, idempotency_key):
+        return await _load_registration(db, existing.id)
+    if existing is not None and existing.status != registrations.CANCELLED:
+        raise HTTPException(status_code=409, detail="User already registered for event")
+    try:
+        db_registration = await registrations.register(db, event, current_user.id, idempotency_key, existing)
+        if db_registration is None:
+            raise HTTPException(status_code=409, detail="Event is full")
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request by the same user registered first.
+        await db.rollback()
+        existing = await registrations.find(db, event_id, current_user.id)
+        if _replayed(existing, idempotency_key):
+            return await _load_registration(db, existing.id)
+        raise HTTPException(status_code=409, detail="User already registered for event")
+    await response_cache.invalidate(f"events:{event_id}")
+    return await _load_registration(db, db_registration.id)
 
 
 @router.delete("/{event_id}/register", response_model=schemas.Registration)
-async def unregister_event(event_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(oauth2.get_current_user)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if event is None:
-        raise HTTPException(status_code=404, detail="Event not found")
-    db_registeration = db.query(models.Registeration).filter(models.Registeration.user_id == current_user.id).filter(models.Registeration.event_id == event_id).first()
-    if db_registeration is None:
+async def unregister_event(event_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(oauth2.get_current_principal)):
+    db_registration = await registrations.find(db, event_id, current_user.id)
+    if db_registration is None or db_registration.status == registrations.CANCELLED:
         raise HTTPException(status_code=404, detail="User not registered for event")
-    db.delete(db_registeration)
-    db.commit()
-    return db_registeration
+    promoted = await registrations.cancel(db, db_registration)
+    if promoted is not None:
+        await realtime.publish(db, realtime.message(promoted.user_id, "registration", id=promoted.id,
+                                                    status=promoted.status, event_id=event_id))
+    await db.commit()
+    await response_cache.invalidate(f"events:{event_id}")
+    return await _load_registration(db, db_registration.id)
 
 
 
@@ -1,93 +1,226 @@
-from sqlalchemy.orm import Session
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..db import get_db
-from .. import schemas, models
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from .. import schemas, models, loaders, inventory, bulk, metrics, batch, realtime
+from ..cache import response_cache
+from ..pagination import MAX_PAGE_SIZE, paginate, set_next_cursor
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
-from app.oauth2 import get_current_user
-from app.utils import get_password_hash
+from app.oauth2 import get_current_principal
 
 router = APIRouter(
     prefix="/items",
     tags=["items"],
+    route_class=metrics.TimedRoute,
 )
 
 
 @router.post("/", response_model=schemas.InventoryItem)
-async def create_item(item: schemas.InventoryItemCreate, db: Session = Depends(get_db)):
-    db_item = models.InventoryItem(**item.dict())
+async def create_item(item: schemas.InventoryItemCreate, db: AsyncSession = Depends(get_db)):
+    if item.quantity_available < 0:
+        raise HTTPException(status_code=400, detail="Quantity cannot be negative")
+    db_item = models.InventoryItem(**item.model_dump())
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await db.flush()
+    if item.quantity_available:
+        db.add(models.InventoryTransaction(item_id=db_item.id, quantity=item.quantity_available,
+                                           transaction_type=inventory.STOCK_IN, reference="opening balance"))
+    await db.commit()
+    await db.refresh(db_item)
+    await response_cache.invalidate("items:list")
     return db_item
 
 
 @router.get("/", response_model=List[schemas.InventoryItem])
-async def read_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    items = db.query(models.InventoryItem).offset(skip).limit(limit).all()
-    return items
+async def read_items(request: Request, response: Response, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    async def load():
+        items, next_cursor = await paginate(db, select(models.InventoryItem), [models.InventoryItem.id], limit, cursor, skip)
+        set_next_cursor(response, next_cursor)
+        return items
+    return await response_cache.respond(request, response, List[schemas.InventoryItem], ["items:list"], load)
+
+
+async def _stock_changed(*item_ids: int):
+    await response_cache.invalidate("items:list", *(f"items:{item_id}" for item_id in item_ids))
+
+
+async def _record_opening_balances(db: AsyncSession, ids, rows):
+    db.add_all(models.InventoryTransaction(item_id=item_id, quantity=row["quantity_available"],
+                                           transaction_type=inventory.STOCK_IN, reference="opening balance")
+               for item_id, row in zip(ids, rows) if row["quantity_available"])
+
+
+def _item_row(item: schemas.InventoryItemCreate):
+    if item.quantity_available < 0:
+        raise ValueError("quantity_available: cannot be negative")
+    return item.model_dump()
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+async def import_items(request: Request, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    result = await bulk.import_rows(db, request, schemas.InventoryItemCreate, _item_row, models.InventoryItem,
+                                    after_insert=_record_opening_balances)
+    await response_cache.invalidate("items:list")
+    return result
+
+
+@router.get("/export")
+async def export_items(format: str = bulk.NDJSON, current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    media_type = bulk.export_format(format)
+    query = select(models.InventoryItem).order_by(models.InventoryItem.id)
+    return StreamingResponse(bulk.export_rows(query, schemas.InventoryItem, format), media_type=media_type)
+
+
+@router.post("/reconcile", response_model=List[schemas.InventoryBalance])
+async def reconcile_stock(db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    balances = await inventory.reconcile(db)
+    await db.commit()
+    await _stock_changed(*(item_id for item_id, _ in balances))
+    return [{"item_id": item_id, "quantity_available": quantity} for item_id, quantity in balances]
 
 
 @router.get("/{item_id}", response_model=schemas.InventoryItem)
-async def read_item(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(models.InventoryItem).filter(models.InventoryItem.id == item_id).first()
-    if item is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    return item
+async def read_item(item_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    async def load():
+        item = await db.scalar(select(models.InventoryItem).filter(models.InventoryItem.id == item_id))
+        if item is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return item
+    return await response_cache.respond(request, response, schemas.InventoryItem, [f"items:{item_id}"], load)
 
 
 @router.post("/{item_id}/request", response_model=schemas.InventoryRequest)
-async def request_item(item_id: int, request: schemas.InventoryRequestCreate, db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
-    db_item = db.query(models.InventoryItem).filter(models.InventoryItem.id == item_id).first()
+async def request_item(item_id: int, request: schemas.InventoryRequestCreate, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    if request.quantity_requested <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+    db_item = await db.scalar(select(models.InventoryItem).filter(models.InventoryItem.id == item_id))
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    if db_item.quantity_ <= request.quantity_requested:
+    if db_item.quantity_available < request.quantity_requested:
         raise HTTPException(status_code=400, detail="Item is out of stock")
-    db_request = models.InventoryRequest(**request.dict(), item_id=item_id, requester_id=current_user.id)
+    db_request = models.InventoryRequest(**request.model_dump(), item_id=item_id, requester_id=current_user.id)
     db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
+    await db.commit()
+    db_request = await db.scalar(select(models.InventoryRequest).options(*loaders.INVENTORY_REQUEST).filter(models.InventoryRequest.id == db_request.id))
     return db_request
 
 
 @router.get("/{item_id}/requests", response_model=List[schemas.InventoryRequest])
-async def read_requests(item_id: int, db: Session = Depends(get_db)):
-    requests = db.query(models.InventoryRequest).filter(models.InventoryRequest.item_id == item_id).all()
+async def read_requests(item_id: int, db: AsyncSession = Depends(get_db)):
+    requests = (await db.scalars(select(models.InventoryRequest).options(*loaders.INVENTORY_REQUEST).filter(models.InventoryRequest.item_id == item_id))).all()
 
     return requests
 
 
 @router.post("/{item_id}/restock", response_model=schemas.InventoryItem)
-async def restock_item(item_id: int, quantity: int, db: Session = Depends(get_db)):
-    db_item = db.query(models.InventoryItem).filter(models.InventoryItem.id == item_id).first()
-    if db_item is None:
+async def restock_item(item_id: int, quantity: int, db: AsyncSession = Depends(get_db)):
+    if quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+    if await inventory.add_stock(db, item_id, quantity, "restock", restock=True) is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    db_item.quantity_ += quantity
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    await _stock_changed(item_id)
+    db_item = await db.scalar(select(models.InventoryItem).filter(models.InventoryItem.id == item_id))
     return db_item
 
 
-@router.post("/{item_id}/{request_id}/approve", response_model=schemas.InventoryRequest)
-async def approve_request(item_id: int, request_id: int, db: Session = Depends(get_db)):
-    db_request = db.query(models.InventoryRequest).filter(models.InventoryRequest.id == request_id).first()
-    if db_request is None:
+@router.post("/requests/approve", response_model=schemas.BatchResult)
+async def approve_requests(requests: schemas.BatchIds, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    ids = batch.unique(requests.ids)
+    request = models.InventoryRequest
+    pending = request.status == "pending"
+    done = await batch.set_status(db, request, ids, "approved", pending,
+                                  returning=[request.item_id, request.quantity_requested, request.requester_id])
+    debited = await inventory.remove_stock_batch(db, [(row.item_id, row.quantity_requested, f"request:{row.id}") for row in done.values()])
+    # Items without stock for all of their requests approve them oldest first
+    # while stock lasts; the rest go back to pending.
+    short = [row for row in done.values() if row.item_id not in debited]
+    out_of_stock = []
+    for row in sorted(short, key=lambda row: row.id):
+        if await inventory.remove_stock(db, row.item_id, row.quantity_requested, f"request:{row.id}") is None:
+            out_of_stock.append(row.id)
+    if out_of_stock:
+        await batch.set_status(db, request, out_of_stock, "pending")
+    errors = await batch.explain(db, request, [request_id for request_id in ids if request_id not in done], (pending, "not pending"))
+    errors.update(dict.fromkeys(out_of_stock, "out of stock"))
+    approved = done.keys() - set(out_of_stock)
+    await realtime.publish(db, *(_status_message(done[request_id], "approved") for request_id in sorted(approved)))
+    await db.commit()
+    await _stock_changed(*{row.item_id for row in done.values()})
+    return batch.result(ids, "approved", approved, errors)
+
+
+@router.post("/requests/reject", response_model=schemas.BatchResult)
+async def reject_requests(requests: schemas.BatchIds, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    ids = batch.unique(requests.ids)
+    pending = models.InventoryRequest.status == "pending"
+    done = await batch.set_status(db, models.InventoryRequest, ids, "rejected", pending,
+                                  returning=[models.InventoryRequest.item_id, models.InventoryRequest.requester_id])
+    errors = await batch.explain(db, models.InventoryRequest, [request_id for request_id in ids if request_id not in done],
+                                 (pending, "not pending"))
+    await realtime.publish(db, *(_status_message(row, "rejected") for row in done.values()))
+    await db.commit()
+    return batch.result(ids, "rejected", done, errors)
+
+
+def _status_message(request, status: str):
+    return realtime.message(request.requester_id, "inventory_request", id=request.id, status=status, item_id=request.item_id)
+
+
+async def _transition_request(db: AsyncSession, item_id: int, request_id: int, from_status: str, to_status: str, **values):
+    """Move a request between statuses, failing if another call already moved it, and tell its requester."""
+    db_request = await db.scalar(select(models.InventoryRequest).options(*loaders.INVENTORY_REQUEST).filter(models.InventoryRequest.id == request_id))
+    if db_request is None or db_request.item_id != item_id:
         raise HTTPException(status_code=404, detail="Request not found")
-    db_request.status = 'approved'
-    db.commit()
-    db.refresh(db_request)
+    claimed = await db.scalar(
+        update(models.InventoryRequest)
+        .filter(models.InventoryRequest.id == request_id)
+        .filter(models.InventoryRequest.status == from_status)
+        .values(status=to_status, **values)
+        .returning(models.InventoryRequest.id)
+    )
+    if claimed is None:
+        raise HTTPException(status_code=409, detail=f"Request is not {from_status}")
+    await realtime.publish(db, _status_message(db_request, to_status))
     return db_request
 
 
-@router.post("/{item_id}/{request_id}/reject", response_model=schemas.InventoryRequest)
-async def reject_request(item_id: int, request_id: int, db: Session = Depends(get_db)):
-    db_request = db.query(models.InventoryRequest).filter(models.InventoryRequest.id == request_id).first()
-    if db_request is None:
-        raise HTTPException(status_code=404, detail="Request not found")
-    db_request.status = 'rejected'
-    db.commit()
-    db.refresh(db_request)
+@router.post("/{item_id}/{request_id}/approve", response_model=schemas.InventoryRequest)
+async def approve_request(item_id: int, request_id: int, db: AsyncSession = Depends(get_db)):
+    db_request = await _transition_request(db, item_id, request_id, "pending", "approved")
+    if await inventory.remove_stock(db, item_id, db_request.quantity_requested, f"request:{request_id}") is None:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Item is out of stock")
+    await db.commit()
+    await _stock_changed(item_id)
     return db_request
 
 
+@router.post("/{item_id}/{request_id}/reject", response_model=schemas.InventoryRequest)
+async def reject_request(item_id: int, request_id: int, db: AsyncSession = Depends(get_db)):
+    db_request = await _transition_request(db, item_id, request_id, "pending", "rejected")
+    await db.commit()
+    return db_request
 
+
+@router.post("/{item_id}/{request_id}/return", response_model=schemas.InventoryRequest)
+async def return_request(item_id: int, request_id: int, db: AsyncSession = Depends(get_db)):
+    db_request = await _transition_request(db, item_id, request_id, "approved", "returned", return_date=datetime.utcnow())
+    await inventory.add_stock(db, item_id, db_request.quantity_requested, f"return:{request_id}")
+    await db.commit()
+    await _stock_changed(item_id)
+    return db_request
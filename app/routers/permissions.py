@@ -1,67 +1,122 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..db import get_db
-from .. import schemas, models
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from .. import schemas, models, loaders, metrics, batch, jobs, tasks, realtime
+from ..pagination import MAX_PAGE_SIZE, paginate, set_next_cursor
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
 
-from ..oauth2 import get_current_user
+from ..cache import response_cache
+from ..oauth2 import get_current_principal
 
 router = APIRouter(
     prefix="/permissions",
     tags=["permissions"],
+    route_class=metrics.TimedRoute,
 )
 
 
 @router.post("/", response_model=schemas.Permission)
-async def create_permission(permission: schemas.PermissionCreate, db: Session = Depends(get_db),
-                            current_user: schemas.User = Depends(get_current_user)):
+async def create_permission(permission: schemas.PermissionCreate, db: AsyncSession = Depends(get_db),
+                            current_user: schemas.TokenData = Depends(get_current_principal)):
     db_permission = models.Permission(user_id=current_user.id, event_id=permission.event_id,
                                       approver_id=permission.approver_id, permission_type=permission.permission_type,
                                       description=permission.description)
     db.add(db_permission)
-    db.commit()
-    db.refresh(db_permission)
+    await db.flush()
+    jobs.enqueue(db, tasks.NOTIFY_APPROVER, permission_id=db_permission.id)
+    await db.commit()
+    await db.refresh(db_permission)
+    await response_cache.invalidate(f"events:{db_permission.event_id}")
     return db_permission
 
 
 @router.get("/", response_model=List[schemas.Permission])
-async def read_permissions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    permissions = db.query(models.Permission).offset(skip).limit(limit).all()
+async def read_permissions(response: Response, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    permissions, next_cursor = await paginate(db, select(models.Permission), [models.Permission.id], limit, cursor, skip)
+    set_next_cursor(response, next_cursor)
     return permissions
 
 
+@router.get("/inbox", response_model=schemas.PermissionInbox)
+async def read_inbox(response: Response, status: str = Query("pending", pattern="^(pending|approved|rejected)$"), limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                     db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    mine = models.Permission.approver_id == current_user.id
+    counts = await db.execute(select(models.Permission.status, func.count()).filter(mine).group_by(models.Permission.status))
+    # Many-to-one joins, so the page comes back with its events and requesters in one query.
+    query = select(models.Permission).filter(mine).filter(models.Permission.status == status) \
+        .options(joinedload(models.Permission.event), joinedload(models.Permission.requestor))
+    items, next_cursor = await paginate(db, query, [models.Permission.requested_at, models.Permission.id], limit, cursor)
+    set_next_cursor(response, next_cursor)
+    return {"counts": dict(counts.all()), "items": items}
+
+
+async def _set_permissions_status(db: AsyncSession, ids: List[int], status: str, approver_id: int):
+    ids = batch.unique(ids)
+    mine = models.Permission.approver_id == approver_id
+    done = await batch.set_status(db, models.Permission, ids, status, mine,
+                                  returning=[models.Permission.event_id, models.Permission.user_id])
+    errors = await batch.explain(db, models.Permission, [permission_id for permission_id in ids if permission_id not in done],
+                                 (mine, "unauthorized"))
+    await realtime.publish(db, *(realtime.message(row.user_id, "permission", id=row.id, status=status, event_id=row.event_id)
+                                 for row in done.values()))
+    await db.commit()
+    await response_cache.invalidate(*{f"events:{row.event_id}" for row in done.values()})
+    return batch.result(ids, status, done, errors)
+
+
+@router.post("/approve", response_model=schemas.BatchResult)
+async def approve_permissions(permissions: schemas.BatchIds, db: AsyncSession = Depends(get_db),
+                              current_user: schemas.TokenData = Depends(get_current_principal)):
+    return await _set_permissions_status(db, permissions.ids, "approved", current_user.id)
+
+
+@router.post("/reject", response_model=schemas.BatchResult)
+async def reject_permissions(permissions: schemas.BatchIds, db: AsyncSession = Depends(get_db),
+                             current_user: schemas.TokenData = Depends(get_current_principal)):
+    return await _set_permissions_status(db, permissions.ids, "rejected", current_user.id)
+
+
+def _status_message(permission: models.Permission):
+    return realtime.message(permission.user_id, "permission", id=permission.id, status=permission.status,
+                            event_id=permission.event_id)
+
+
 @router.get("/{permission_id}", response_model=schemas.PermissionOut)
-async def read_permission(permission_id: int, db: Session = Depends(get_db)):
-    permission = db.query(models.Permission).filter(models.Permission.id == permission_id).first()
+async def read_permission(permission_id: int, db: AsyncSession = Depends(get_db)):
+    permission = await db.scalar(select(models.Permission).options(*loaders.PERMISSION_OUT).filter(models.Permission.id == permission_id))
     if permission is None:
         raise HTTPException(status_code=404, detail="Permission not found")
     return permission
 
 
 @router.post("/{permission_id}/approve", response_model=schemas.PermissionOut)
-async def approve_permission(permission_id: int, db: Session = Depends(get_db),
-                             current_user: schemas.User = Depends(get_current_user)):
-    permission = db.query(models.Permission).filter(models.Permission.id == permission_id).first()
+async def approve_permission(permission_id: int, db: AsyncSession = Depends(get_db),
+                             current_user: schemas.TokenData = Depends(get_current_principal)):
+    permission = await db.scalar(select(models.Permission).options(*loaders.PERMISSION_OUT).filter(models.Permission.id == permission_id))
     if permission is None:
         raise HTTPException(status_code=404, detail="Permission not found")
     if current_user.id != permission.approver_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
     permission.status = "approved"
-    db.commit()
-    db.refresh(permission)
+    await realtime.publish(db, _status_message(permission))
+    await db.commit()
+    await response_cache.invalidate(f"events:{permission.event_id}")
     return permission
 
 
 @router.post("/{permission_id}/reject", response_model=schemas.PermissionOut)
-async def reject_permission(permission_id: int, db: Session = Depends(get_db),
-                            current_user: schemas.User = Depends(get_current_user)):
-    permission = db.query(models.Permission).filter(models.Permission.id == permission_id).first()
+async def reject_permission(permission_id: int, db: AsyncSession = Depends(get_db),
+                            current_user: schemas.TokenData = Depends(get_current_principal)):
+    permission = await db.scalar(select(models.Permission).options(*loaders.PERMISSION_OUT).filter(models.Permission.id == permission_id))
     if permission is None:
         raise HTTPException(status_code=404, detail="Permission not found")
     if current_user.id != permission.approver_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
     permission.status = "rejected"
-    db.commit()
-    db.refresh(permission)
+    await realtime.publish(db, _status_message(permission))
+    await db.commit()
+    await response_cache.invalidate(f"events:{permission.event_id}")
     return permission
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from .. import metrics, oauth2, realtime
+from ..db import SessionLocal
+from ..realtime import broker
+
+router = APIRouter(
+    prefix="/realtime",
+    tags=["realtime"],
+    route_class=metrics.TimedRoute,
+)
+
+
+async def _authenticate(headers, token: Optional[str]):
+    """The principal for a bearer header or ``?token=`` (browsers cannot set headers on EventSource/WebSocket).
+
+    Uses its own short session: a connection held for the life of the stream
+    would take a pool slot per subscriber.
+    """
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    token = credentials if scheme.lower() == "bearer" and credentials else token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    async with SessionLocal() as db:
+        return await oauth2.get_current_principal(token, db)
+
+
+async def _event_stream(user_id: int):
+    subscription = broker.subscribe(user_id)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            message = await subscription.get(realtime.REALTIME_HEARTBEAT_SECONDS)
+            yield f"data: {message}\n\n" if message is not None else ": ping\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def stream_events(request: Request, token: Optional[str] = None):
+    """Server-sent events with the caller's permission, request, registration and event status changes."""
+    principal = await _authenticate(request.headers, token)
+    if broker.full:
+        raise HTTPException(status_code=503, detail="Too many realtime connections", headers={"Retry-After": "30"})
+    return StreamingResponse(_event_stream(principal.id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/ws")
+async def websocket_events(websocket: WebSocket, token: Optional[str] = None):
+    """The same messages as /realtime/events over a WebSocket; anything the client sends is ignored."""
+    try:
+        principal = await _authenticate(websocket.headers, token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    if broker.full:
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    subscription = broker.subscribe(principal.id)
+    receiving = asyncio.ensure_future(websocket.receive())
+    sending = None
+    try:
+        while True:
+            sending = asyncio.ensure_future(subscription.get(realtime.REALTIME_HEARTBEAT_SECONDS))
+            done, _ = await asyncio.wait({receiving, sending}, return_when=asyncio.FIRST_COMPLETED)
+            if sending in done:
+                message = sending.result()
+                await websocket.send_text(message if message is not None else realtime.PING)
+            else:
+                sending.cancel()
+            if receiving in done:
+                if receiving.result()["type"] == "websocket.disconnect":
+                    return
+                receiving = asyncio.ensure_future(websocket.receive())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiving.cancel()
+        if sending is not None:
+            sending.cancel()
+        broker.unsubscribe(subscription)
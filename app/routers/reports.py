@@ -0,0 +1,71 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import get_db
+from .. import schemas, analytics, metrics, utilization
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["reports"],
+    route_class=metrics.TimedRoute,
+)
+
+Days = Query(30, ge=1, le=365)
+
+
+@router.get("/inventory/low-stock", response_model=List[schemas.ItemStockReport])
+async def low_stock(days: int = Days, db: AsyncSession = Depends(get_db)):
+    report = await analytics.item_consumption(db, days, below_minimum=True)
+    return sorted(report, key=lambda row: row["quantity_available"] - row["minimum_stock"])
+
+
+@router.get("/inventory/consumption", response_model=List[schemas.ItemStockReport])
+async def item_consumption(days: int = Days, db: AsyncSession = Depends(get_db)):
+    report = await analytics.item_consumption(db, days)
+    return sorted(report, key=lambda row: row["daily_rate"], reverse=True)
+
+
+@router.get("/inventory/consumption/categories", response_model=List[schemas.CategoryConsumption])
+async def category_consumption(days: int = Days, db: AsyncSession = Depends(get_db)):
+    return await analytics.category_consumption(db, days)
+
+
+@router.get("/inventory/stockout", response_model=List[schemas.ItemStockReport])
+async def stockout_forecast(days: int = Days, within: float = Query(None, gt=0), db: AsyncSession = Depends(get_db)):
+    """Items that are being consumed, soonest projected stockout first."""
+    report = [row for row in await analytics.item_consumption(db, days) if row["days_until_stockout"] is not None]
+    if within is not None:
+        report = [row for row in report if row["days_until_stockout"] <= within]
+    return sorted(report, key=lambda row: row["days_until_stockout"])
+
+
+def _date_range(start: Optional[date], end: Optional[date]):
+    """Default to the 30 days up to today; both ends are inclusive."""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+
+@router.get("/venues/utilization", response_model=schemas.VenueUtilization)
+async def venue_utilization(start: Optional[date] = None, end: Optional[date] = None,
+                            interval: str = Query("day", pattern="^(day|week)$"), venue_id: Optional[int] = None,
+                            db: AsyncSession = Depends(get_db)):
+    start, end = _date_range(start, end)
+    return await utilization.utilization_series(db, start, end, interval, venue_id)
+
+
+@router.get("/venues/peak-hours", response_model=schemas.VenuePeakHours)
+async def venue_peak_hours(start: Optional[date] = None, end: Optional[date] = None, venue_id: Optional[int] = None,
+                           db: AsyncSession = Depends(get_db)):
+    start, end = _date_range(start, end)
+    return await utilization.peak_hours(db, start, end, venue_id)
+
+
+@router.get("/venues/occupancy", response_model=schemas.VenueOccupancy)
+async def venue_occupancy(start: Optional[date] = None, end: Optional[date] = None, db: AsyncSession = Depends(get_db)):
+    start, end = _date_range(start, end)
+    return await utilization.venue_occupancy(db, start, end)
@@ -1,43 +1,92 @@
-from sqlalchemy.orm import Session
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..db import get_db
-from .. import schemas, models
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from .. import schemas, models, loaders, bulk, metrics, dashboard
+from ..fields import Projection
+from ..pagination import MAX_PAGE_SIZE, paginate, set_next_cursor
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
-from app.oauth2 import get_current_user
-from app.utils import get_password_hash
+from app.oauth2 import get_current_user, get_current_principal
+from app.utils import hash_password
 
 router = APIRouter(
     prefix="/users",
     tags=["users"],
+    route_class=metrics.TimedRoute,
 )
 
 
 @router.post("/", response_model=schemas.UserOut)
-async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    hashed_password = get_password_hash(user.password)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    hashed_password = await hash_password(user.password)
     db_user = models.User(email=user.email, full_name=user.full_name, role=user.role, password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    db_user = await db.scalar(select(models.User).options(*loaders.USER_OUT).filter(models.User.id == db_user.id))
     return db_user
 
 
-@router.get("/", response_model=List[schemas.User])
-async def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(models.User).offset(skip).limit(limit).all()
-    return users
+@router.get("/", response_model=List[schemas.UserSummary])
+async def read_users(response: Response, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, db: AsyncSession = Depends(get_db),
+                     fields: Optional[str] = None):
+    projection = Projection(models.User, schemas.UserSummary, fields)
+    users, next_cursor = await paginate(db, select(models.User).options(*projection.options), [models.User.id], limit, cursor, skip)
+    set_next_cursor(response, next_cursor)
+    return projection.render(response, users, many=True)
 
 
-@router.get("/{user_id}", response_model=schemas.UserOut)
-async def read_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+async def _hash_passwords(rows):
+    hashes = await asyncio.gather(*(hash_password(row["password"]) for row in rows))
+    return [{**row, "password": hashed} for row, hashed in zip(rows, hashes)]
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+async def import_users(request: Request, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return await bulk.import_rows(db, request, schemas.UserCreate, lambda user: user.model_dump(), models.User,
+                                  prepare=_hash_passwords)
+
 
+@router.get("/export")
+async def export_users(format: str = bulk.NDJSON, current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    media_type = bulk.export_format(format)
+    query = select(models.User).order_by(models.User.id)
+    return StreamingResponse(bulk.export_rows(query, schemas.User, format), media_type=media_type)
 
+
+# /me routes must come before /{user_id}, which would otherwise match "me".
 @router.get("/me", response_model=schemas.User)
 async def read_users_me(current_user: schemas.User = Depends(get_current_user)):
     return current_user
 
+
+@router.get("/me/dashboard", response_model=schemas.Dashboard)
+async def read_dashboard(recent: int = Query(5, ge=0, le=50), db: AsyncSession = Depends(get_db),
+                         current_user: schemas.User = Depends(get_current_user)):
+    """Per-status counts and the ``recent`` newest rows of everything the caller owns, in one query."""
+    key = (current_user.id, recent)
+    body = dashboard.dashboard_cache.get(key)
+    if body is None:
+        data = {"user": current_user, **await dashboard.load(db, current_user.id, recent)}
+        with metrics.serializing():
+            body = schemas.Dashboard.model_validate(data).model_dump_json().encode()
+        dashboard.dashboard_cache.set(key, body)
+    return Response(body, media_type="application/json")
+
+
+@router.get("/{user_id}", response_model=schemas.UserOut)
+async def read_user(user_id: int, response: Response, db: AsyncSession = Depends(get_db),
+                    fields: Optional[str] = None, expand: Optional[str] = None):
+    projection = Projection(models.User, schemas.UserOut, fields, expand, loaders.USER_OUT_RELATIONS,
+                            default_expand=loaders.USER_OUT_RELATIONS)
+    user = await db.scalar(select(models.User).options(*projection.options).filter(models.User.id == user_id))
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return projection.render(response, user)
@@ -1,56 +1,122 @@
-from sqlalchemy.orm import Session
+from datetime import date, datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..db import get_db
-from .. import schemas, models
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from .. import schemas, models, loaders, availability, bulk, metrics, utilization, ical
+from ..pagination import MAX_PAGE_SIZE, paginate, set_next_cursor
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
-from ..oauth2 import get_current_user
+from ..cache import response_cache
+from ..oauth2 import get_current_principal
 
 router = APIRouter(
     prefix="/venues",
     tags=["venues"],
+    route_class=metrics.TimedRoute,
 )
 
 
 @router.post("/", response_model=schemas.VenueCreate)
-async def create_venue(venue: schemas.VenueCreate, db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
+async def create_venue(venue: schemas.VenueCreate, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
     if current_user.role != "admin":
         raise HTTPException(status_code=401, detail="Unauthorized")
     try:
         db_venue = models.Venue(name=venue.name, location=venue.location, capacity=venue.capacity, venue_type=venue.venue_type)
         db.add(db_venue)
-        db.commit()
-        db.refresh(db_venue)
+        await db.commit()
+        await db.refresh(db_venue)
+        await response_cache.invalidate("venues:list")
         return db_venue
     except:
         raise HTTPException(status_code=400, detail="Error creating venue")
 
 
 @router.get("/", response_model=List[schemas.Venue])
-async def read_venues(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    venues = db.query(models.Venue).offset(skip).limit(limit).all()
-    return venues
+async def read_venues(request: Request, response: Response, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    async def load():
+        venues, next_cursor = await paginate(db, select(models.Venue), [models.Venue.id], limit, cursor, skip)
+        set_next_cursor(response, next_cursor)
+        return venues
+    return await response_cache.respond(request, response, List[schemas.Venue], ["venues:list"], load)
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+async def import_venues(request: Request, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    result = await bulk.import_rows(db, request, schemas.VenueCreate, lambda venue: venue.model_dump(), models.Venue)
+    await response_cache.invalidate("venues:list")
+    return result
+
+
+@router.get("/export")
+async def export_venues(format: str = bulk.NDJSON, current_user: schemas.TokenData = Depends(get_current_principal)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    media_type = bulk.export_format(format)
+    query = select(models.Venue).order_by(models.Venue.id)
+    return StreamingResponse(bulk.export_rows(query, schemas.Venue, format), media_type=media_type)
+
+
+@router.get("/available", response_model=List[schemas.Venue])
+async def read_available_venues(start: datetime, end: datetime, capacity: Optional[int] = None, venue_type: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return await availability.find_available_venues(db, start, end, capacity, venue_type)
 
 
 @router.get("/{venue_id}", response_model=schemas.VenueOut)
-async def read_venue(venue_id: int, db: Session = Depends(get_db)):
-    venue = db.query(models.Venue).filter(models.Venue.id == venue_id).first()
-    if venue is None:
+async def read_venue(venue_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    async def load():
+        venue = await db.scalar(select(models.Venue).options(*loaders.VENUE_OUT).filter(models.Venue.id == venue_id))
+        if venue is None:
+            raise HTTPException(status_code=404, detail="Venue not found")
+        return venue
+    return await response_cache.respond(request, response, schemas.VenueOut, [f"venues:{venue_id}"], load)
+
+
+@router.get("/{venue_id}/calendar.ics", response_class=Response, responses={200: {"content": {ical.MEDIA_TYPE: {}}}})
+async def venue_calendar(venue_id: int, request: Request, start: Optional[date] = None, end: Optional[date] = None,
+                         since: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """The venue's bookings as an iCalendar feed; pass the last X-Sync-Token as ``since`` to get only what changed."""
+    since = ical.decode_since(since)
+    name = await db.scalar(select(models.Venue.name).filter(models.Venue.id == venue_id))
+    if name is None:
         raise HTTPException(status_code=404, detail="Venue not found")
-    return venue
+    host = request.url.hostname
+    return await ical.respond(request, db, ical.venue_feed(venue_id, start, end, since),
+                              [models.VenueBooking.created_at, models.Event.updated_at], name,
+                              lambda booking, event: ical.booking_component(booking, event, host), since)
 
 
 @router.post("/{venue_id}/book", response_model=schemas.VenueBookingOut)
-async def book_venue(venue_id: int, venue_booking: schemas.VenueBookingCreate, db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
-    permission = db.query(models.Permission).filter(models.Permission.id == venue_booking.permission_id).first()
+async def book_venue(venue_id: int, venue_booking: schemas.VenueBookingCreate, db: AsyncSession = Depends(get_db), current_user: schemas.TokenData = Depends(get_current_principal)):
+    permission = await db.scalar(select(models.Permission).filter(models.Permission.id == venue_booking.permission_id))
     if permission is None:
         raise HTTPException(status_code=404, detail="Permission not found")
     if permission.status != "approved":
         raise HTTPException(status_code=400, detail="Permission not approved")
     if permission.permission_type != "venue":
         raise HTTPException(status_code=400, detail="Invalid permission")
+    if venue_booking.start_time >= venue_booking.end_time:
+        raise HTTPException(status_code=400, detail="start_time must be before end_time")
+    if not await availability.lock_venue(db, venue_id):
+        raise HTTPException(status_code=404, detail="Venue not found")
+    if await availability.find_conflict(db, venue_id, venue_booking.start_time, venue_booking.end_time) is not None:
+        raise HTTPException(status_code=409, detail="Venue already booked for this time")
     db_venue_booking = models.VenueBooking(venue_id=venue_id, event_id=venue_booking.event_id, start_time=venue_booking.start_time, end_time=venue_booking.end_time, purpose=venue_booking.purpose, booker_id=current_user.id, permission_id=permission.id)
     db.add(db_venue_booking)
-    db.commit()
-    db.refresh(db_venue_booking)
+    try:
+        await utilization.record_booking(db, db_venue_booking)
+        await db.commit()
+    except IntegrityError:
+        # A concurrent booking won the race; the exclusion constraint rejected this one.
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Venue already booked for this time")
+    await response_cache.invalidate(f"venues:{venue_id}", f"events:{venue_booking.event_id}")
+    db_venue_booking = await db.scalar(select(models.VenueBooking).options(*loaders.VENUE_BOOKING_OUT).filter(models.VenueBooking.id == db_venue_booking.id))
     return db_venue_booking
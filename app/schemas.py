@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import Dict, Optional, List
 
 
 class UserBase(BaseModel):
@@ -23,11 +23,23 @@ class User(UserBase):
     is_active: bool
 
 
+class UserSummary(BaseModel):
+    id: int
+    email: str
+    full_name: str
+    role: str
+    department: Optional[str] = None
+
+
 class UserLogin(BaseModel):
     email: str
     password: str
 
 
+class PasswordResetRequest(BaseModel):
+    email: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -36,6 +48,8 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     id: Optional[int] = None
     role: Optional[str] = None
+    is_active: bool = True
+    issued_at: Optional[int] = None
 
 
 class VenueBase(BaseModel):
@@ -84,31 +98,95 @@ class EventBase(BaseModel):
 
 class EventCreate(EventBase):
     expected_attendance: Optional[int] = None
-    pass
+    waitlist_enabled: bool = False
 
 
 class Event(EventBase):
     id: int
-    organizer: User
+    organizer: Optional[User] = None
+
+
+class EventBrief(BaseModel):
+    id: int
+    title: str
+    start_date: datetime
+    end_date: datetime
+    status: Optional[str] = None
+    type: Optional[str] = None
+    logo: Optional[str] = None
+    organizer_id: Optional[int] = None
+
+
+class EventSummary(EventBrief):
+    organizer: Optional[UserSummary] = None
 
 
 class InventoryItemBase(BaseModel):
     name: str
-    quantity: int
     unit: str
     description: Optional[str] = None
+    category: Optional[str] = None
+    minimum_stock: int = 0
 
 
 class InventoryItemCreate(InventoryItemBase):
-    pass
+    quantity_available: int = 0
 
 
 class InventoryItem(InventoryItemBase):
     id: int
-    is_active: bool
-    created_at: datetime
+    quantity_available: int
+    last_restocked: Optional[datetime] = None
+
+
+class InventoryBalance(BaseModel):
+    item_id: int
+    quantity_available: int
+
+
+
+class ItemStockReport(BaseModel):
+    item_id: int
+    name: str
+    category: Optional[str] = None
+    quantity_available: int
+    minimum_stock: int
+    consumed: int
+    daily_rate: float
+    days_until_stockout: Optional[float] = None
+
+
+class CategoryConsumption(BaseModel):
+    category: Optional[str] = None
+    consumed: int
+    daily_rate: float
 
 
+class VenueUtilization(BaseModel):
+    """Parallel columns, one entry per (venue, period)."""
+    venue_id: List[int]
+    period: List[date]
+    booked_hours: List[float]
+    utilization: List[float]
+    occupancy: List[Optional[float]]
+
+
+class VenuePeakHours(BaseModel):
+    """Parallel columns, one entry per (weekday, hour) with bookings; weekday 0 is Sunday."""
+    weekday: List[int]
+    hour: List[int]
+    booked_hours: List[float]
+    bookings: List[int]
+
+
+class VenueOccupancy(BaseModel):
+    """Parallel columns, one entry per booked venue."""
+    venue_id: List[int]
+    name: List[str]
+    capacity: List[Optional[int]]
+    booked_hours: List[float]
+    average_attendance: List[Optional[float]]
+    occupancy: List[Optional[float]]
 
 
 class InventoryRequestBase(BaseModel):
@@ -120,12 +198,37 @@ class InventoryRequestCreate(InventoryRequestBase):
 class InventoryRequest(InventoryRequestBase):
     id: int
     item: InventoryItem
-    event: Event
-    requestor: User
+    event: Optional[Event] = None
+    requester: User
     status: str
     request_date: datetime
 
 
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError] = []
+
+
+class BatchIds(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=1000)
+
+
+class BatchOutcome(BaseModel):
+    id: int
+    status: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    results: List[BatchOutcome]
+
+
 class PermissionBase(BaseModel):
     event_id: int
     approver_id: int
@@ -141,6 +244,19 @@ class Permission(PermissionBase):
     id: int
     status: str
     created_at: Optional[datetime] = None
+    requested_at: Optional[datetime] = None
+
+
+class PermissionInboxItem(Permission):
+    # permissions.event_id and user_id are nullable
+    event_id: Optional[int] = None
+    event: Optional[EventBrief] = None
+    requestor: Optional[UserSummary] = None
+
+
+class PermissionInbox(BaseModel):
+    counts: Dict[str, int]
+    items: List[PermissionInboxItem]
 
 
 class Registration(BaseModel):
@@ -148,9 +264,13 @@ class Registration(BaseModel):
     event: Event
     user: User
     registration_date: datetime
+    status: str
 
 
 class EventOut(Event):
+    expected_attendance: Optional[int] = None
+    waitlist_enabled: bool = False
+    registered_count: int = 0
     venue_bookings: List[VenueBooking] = []
     permissions: List[Permission] = []
     registrations: List[Registration] = []
@@ -178,4 +298,28 @@ class UserOut(User):
     venue_bookings: List[VenueBooking] = []
     permissions_to_approve: List[Permission] = []
     permissions_requested: List[Permission] = []
-    registration: List[Registration] = []
+    registrations: List[Registration] = []
+
+
+class DashboardItem(BaseModel):
+    id: int
+    title: Optional[str] = None
+    status: Optional[str] = None
+    date: Optional[datetime] = None
+    related_id: Optional[int] = None
+
+
+class DashboardSection(BaseModel):
+    counts: Dict[str, int]
+    total: int
+    recent: List[DashboardItem]
+
+
+class Dashboard(BaseModel):
+    user: User
+    events_organized: DashboardSection
+    inventory_requests: DashboardSection
+    venue_bookings: DashboardSection
+    permissions_to_approve: DashboardSection
+    permissions_requested: DashboardSection
+    registrations: DashboardSection
@@ -0,0 +1,63 @@
+import re
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, case, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, loaders
+
+MAX_TERMS = 8
+
+_document = literal_column(models.EVENT_SEARCH_DOCUMENT)
+
+
+def search_terms(q: str):
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+
+def _prefix_tsquery(terms):
+    # Every term must match, the last one as a prefix so results narrow as the user types.
+    return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+
+
+def match_clause(dialect: str, terms):
+    """Filter events whose title, description or type match every term.
+
+    On Postgres this is served by the ``ix_events_search`` GIN index, with a
+    trigram-indexed substring match on the title so partial words inside a
+    title still hit. Other backends (SQLite in development) fall back to
+    substring matching on the same columns.
+    """
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery(literal_column("'english'"), _prefix_tsquery(terms))
+        title = func.lower(models.Event.title)
+        return or_(_document.op("@@")(tsquery), and_(*[title.contains(term) for term in terms]))
+    text = func.lower(func.coalesce(models.Event.title, "") + " " + func.coalesce(models.Event.description, "") + " " + func.coalesce(models.Event.type, ""))
+    return and_(*[text.contains(term) for term in terms])
+
+
+def rank(dialect: str, terms):
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery(literal_column("'english'"), _prefix_tsquery(terms))
+        return func.ts_rank_cd(_document, tsquery) + func.similarity(models.Event.title, " ".join(terms))
+    title = func.lower(models.Event.title)
+    return sum(case((title.contains(term), 1), else_=0) for term in terms)
+
+
+async def search_events(db: AsyncSession, q: str, status: Optional[str] = "approved",
+                        date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                        skip: int = 0, limit: int = 20, options=loaders.EVENT):
+    terms = search_terms(q)
+    if not terms:
+        return []
+    dialect = db.get_bind().dialect.name
+    query = select(models.Event).options(*options).filter(match_clause(dialect, terms))
+    if status is not None:
+        query = query.filter(models.Event.status == status)
+    if date_from is not None:
+        query = query.filter(models.Event.end_date >= date_from)
+    if date_to is not None:
+        query = query.filter(models.Event.start_date <= date_to)
+    query = query.order_by(rank(dialect, terms).desc(), models.Event.start_date, models.Event.id)
+    return (await db.scalars(query.offset(skip).limit(limit))).all()
@@ -0,0 +1,71 @@
+import os
+from datetime import timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from . import analytics, inventory, jobs, mail, models, oauth2, utilization
+from .cache import response_cache
+
+# Job handlers and periodic jobs. Request handlers enqueue these with
+# jobs.enqueue(db, tasks.NAME, ...) before committing.
+
+NOTIFY_APPROVER = "notify_approver"
+SEND_PASSWORD_RESET = "send_password_reset"
+RECONCILE_STOCK = "reconcile_stock"
+REFRESH_ROLLUPS = "refresh_rollups"
+PRUNE_JOBS = "prune_jobs"
+
+RESET_TOKEN_EXPIRE_MINUTES = int(os.getenv("RESET_TOKEN_EXPIRE_MINUTES", "30"))
+PASSWORD_RESET_URL = os.getenv("PASSWORD_RESET_URL", "")
+RECONCILE_STOCK_SECONDS = float(os.getenv("RECONCILE_STOCK_SECONDS", str(24 * 3600)))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+
+@jobs.handler(NOTIFY_APPROVER)
+async def notify_approver(db: AsyncSession, permission_id: int):
+    permission = await db.scalar(select(models.Permission)
+                                 .options(joinedload(models.Permission.event), joinedload(models.Permission.requestor),
+                                          joinedload(models.Permission.approver))
+                                 .filter(models.Permission.id == permission_id))
+    if permission is None or permission.status != "pending" or permission.approver is None or permission.event is None:
+        return
+    requestor = permission.requestor.full_name if permission.requestor else "Someone"
+    await mail.send(permission.approver.email, f"Approval requested: {permission.event.title}",
+                    f"{requestor} requested {permission.permission_type} permission for "
+                    f"\"{permission.event.title}\".\n\n{permission.description or ''}")
+
+
+@jobs.handler(SEND_PASSWORD_RESET)
+async def send_password_reset(db: AsyncSession, email: str):
+    if await db.scalar(select(models.User.id).filter(models.User.email == email)) is None:
+        return
+    token = oauth2.create_reset_token(email, RESET_TOKEN_EXPIRE_MINUTES)
+    await mail.send(email, "Reset your password",
+                    f"Use this link within {RESET_TOKEN_EXPIRE_MINUTES} minutes to reset your password:\n\n"
+                    f"{PASSWORD_RESET_URL}{token}")
+
+
+@jobs.handler(RECONCILE_STOCK, max_attempts=1)
+async def reconcile_stock(db: AsyncSession):
+    balances = await inventory.reconcile(db)
+    await db.commit()
+    if balances:
+        await response_cache.invalidate("items:list", *(f"items:{item_id}" for item_id, _ in balances))
+
+
+@jobs.handler(REFRESH_ROLLUPS, max_attempts=1)
+async def refresh_rollups(db: AsyncSession):
+    await analytics.refresh_inventory_usage(db, force=True)
+    await utilization.backfill(db)
+
+
+@jobs.handler(PRUNE_JOBS, max_attempts=1)
+async def prune_jobs(db: AsyncSession):
+    await jobs.prune(db, timedelta(days=JOB_RETENTION_DAYS))
+
+
+jobs.every(RECONCILE_STOCK_SECONDS, RECONCILE_STOCK)
+jobs.every(analytics.REPORT_REFRESH_SECONDS, REFRESH_ROLLUPS)
+jobs.every(3600, PRUNE_JOBS)
@@ -0,0 +1,163 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Date, Float, Integer, cast, func, literal_column, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Venue analytics read venue_hourly_usage: one row per venue and clock hour
+# with the booked minutes in that hour and the expected attendance weighted by
+# those minutes. book_venue adds each new booking's buckets in the booking's
+# own transaction; bookings that predate the rollup (rolled_up is false) are
+# folded in by backfill(). Every series below is a single aggregate query.
+
+BACKFILL_BATCH_SIZE = 1000
+
+HOUR = timedelta(hours=1)
+
+
+def hourly_buckets(start: datetime, end: datetime):
+    """Yield ``(hour, minutes)`` for each clock hour that ``[start, end)`` overlaps."""
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    while hour < end:
+        overlap = min(end, hour + HOUR) - max(start, hour)
+        yield hour, overlap.total_seconds() / 60
+        hour += HOUR
+
+
+def _insert(dialect: str):
+    return postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+
+async def _add_bookings(db: AsyncSession, bookings):
+    """Add ``(venue_id, start_time, end_time, expected_attendance)`` bookings to the hourly buckets."""
+    buckets = defaultdict(lambda: [0, 0, 0])
+    for venue_id, start, end, attendance in bookings:
+        for hour, minutes in hourly_buckets(start, end):
+            bucket = buckets[venue_id, hour]
+            bucket[0] += round(minutes)
+            bucket[1] += round(minutes * (attendance or 0))
+            bucket[2] += 1
+    if not buckets:
+        return
+    usage = models.VenueHourlyUsage
+    # One row per key: Postgres cannot upsert the same row twice in one statement.
+    stmt = _insert(db.get_bind().dialect.name)(usage).values([
+        {"venue_id": venue_id, "hour": hour, "booked_minutes": booked, "seat_minutes": seats, "bookings": count}
+        for (venue_id, hour), (booked, seats, count) in buckets.items()
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[usage.venue_id, usage.hour],
+        set_={
+            "booked_minutes": usage.booked_minutes + stmt.excluded.booked_minutes,
+            "seat_minutes": usage.seat_minutes + stmt.excluded.seat_minutes,
+            "bookings": usage.bookings + stmt.excluded.bookings,
+        },
+    ))
+
+
+async def record_booking(db: AsyncSession, booking: models.VenueBooking):
+    """Add a new booking to the rollup in the caller's transaction, so both commit or neither does."""
+    booking.rolled_up = True
+    attendance = await db.scalar(select(models.Event.expected_attendance).filter(models.Event.id == booking.event_id))
+    await _add_bookings(db, [(booking.venue_id, booking.start_time, booking.end_time, attendance)])
+
+
+async def backfill(db: AsyncSession):
+    """Fold live bookings that are not in the rollup yet into it, a batch per transaction."""
+    booking = models.VenueBooking
+    while True:
+        rows = (await db.execute(
+            select(booking.id, booking.venue_id, booking.start_time, booking.end_time, models.Event.expected_attendance)
+            .outerjoin(models.Event, models.Event.id == booking.event_id)
+            .filter(booking.rolled_up.is_(False))
+            .filter(booking.status != "cancelled")
+            .order_by(booking.id)
+            .limit(BACKFILL_BATCH_SIZE)
+            .with_for_update(of=booking, skip_locked=True)
+        )).all()
+        if not rows:
+            return
+        await _add_bookings(db, [row[1:] for row in rows])
+        await db.execute(update(booking).filter(booking.id.in_([row.id for row in rows]))
+                         .values(rolled_up=True).execution_options(synchronize_session=False))
+        await db.commit()
+
+
+def _period(dialect: str, interval: str):
+    hour = models.VenueHourlyUsage.hour
+    if dialect == "postgresql":
+        return cast(func.date_trunc(interval, hour), Date)
+    if interval == "week":
+        # Monday of the hour's week, matching date_trunc('week', ...).
+        return func.date(hour, "weekday 0", "-6 days")
+    return func.date(hour)
+
+
+def _in_range(query, start: date, end: date, venue_id: Optional[int]):
+    usage = models.VenueHourlyUsage
+    query = query.filter(usage.hour >= datetime.combine(start, datetime.min.time())) \
+        .filter(usage.hour < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    if venue_id is not None:
+        query = query.filter(usage.venue_id == venue_id)
+    return query
+
+
+def _columns(result, names):
+    """Turn result rows into one list per column."""
+    rows = result.all()
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return {name: list(column) for name, column in zip(names, columns)}
+
+
+async def utilization_series(db: AsyncSession, start: date, end: date, interval: str, venue_id: Optional[int] = None):
+    """Booked hours per venue per day or week, as parallel columns.
+
+    ``utilization`` is booked time over the period's wall-clock hours;
+    ``occupancy`` is expected attendance over capacity while booked.
+    """
+    usage = models.VenueHourlyUsage
+    period = _period(db.get_bind().dialect.name, interval)
+    period_hours = 24 * (7 if interval == "week" else 1)
+    booked_hours = func.sum(usage.booked_minutes) / literal_column("60.0")
+    occupancy = cast(func.sum(usage.seat_minutes), Float) \
+        / func.nullif(models.Venue.capacity * func.sum(usage.booked_minutes), 0)
+    query = select(usage.venue_id, period, booked_hours, booked_hours / period_hours, occupancy) \
+        .join(models.Venue, models.Venue.id == usage.venue_id) \
+        .group_by(usage.venue_id, period, models.Venue.capacity) \
+        .order_by(usage.venue_id, period)
+    result = await db.execute(_in_range(query, start, end, venue_id))
+    return _columns(result, ["venue_id", "period", "booked_hours", "utilization", "occupancy"])
+
+
+async def peak_hours(db: AsyncSession, start: date, end: date, venue_id: Optional[int] = None):
+    """Booked hours by weekday (0 = Sunday) and hour of day, as parallel columns."""
+    usage = models.VenueHourlyUsage
+    if db.get_bind().dialect.name == "postgresql":
+        weekday, hour = func.extract("dow", usage.hour), func.extract("hour", usage.hour)
+    else:
+        weekday, hour = func.strftime("%w", usage.hour), func.strftime("%H", usage.hour)
+    weekday, hour = cast(weekday, Integer), cast(hour, Integer)
+    query = select(weekday, hour, func.sum(usage.booked_minutes) / literal_column("60.0"), func.sum(usage.bookings)) \
+        .group_by(weekday, hour) \
+        .order_by(weekday, hour)
+    result = await db.execute(_in_range(query, start, end, venue_id))
+    return _columns(result, ["weekday", "hour", "booked_hours", "bookings"])
+
+
+async def venue_occupancy(db: AsyncSession, start: date, end: date):
+    """Per-venue totals over the range: booked hours and expected attendance against capacity."""
+    usage = models.VenueHourlyUsage
+    venue = models.Venue
+    booked = func.sum(usage.booked_minutes)
+    attendance = cast(func.sum(usage.seat_minutes), Float) / func.nullif(booked, 0)
+    query = select(venue.id, venue.name, venue.capacity, booked / literal_column("60.0"), attendance,
+                   attendance / func.nullif(venue.capacity, 0)) \
+        .join(usage, usage.venue_id == venue.id) \
+        .group_by(venue.id, venue.name, venue.capacity) \
+        .order_by(venue.id)
+    result = await db.execute(_in_range(query, start, end, None))
+    return _columns(result, ["venue_id", "name", "capacity", "booked_hours", "average_attendance", "occupancy"])
@@ -1,6 +1,25 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes="bcrypt", deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "64"))
+
+# Pinning min/max to the configured cost makes needs_update() flag any stored
+# hash made with a different cost, so logins rehash it transparently.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__default_rounds=BCRYPT_ROUNDS,
+                           bcrypt__min_rounds=BCRYPT_ROUNDS,
+                           bcrypt__max_rounds=BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so a small thread pool gives real parallelism. The
+# semaphore bounds running plus queued jobs; callers beyond that wait here
+# instead of piling unbounded work onto the executor.
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
 
 
 def get_password_hash(password):
@@ -9,3 +28,22 @@ def get_password_hash(password):
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
+
+
+async def _run_in_hash_pool(func, *args):
+    async with _hash_slots:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, func, *args)
+
+
+async def hash_password(password):
+    return await _run_in_hash_pool(pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash should be replaced."""
+    return await _run_in_hash_pool(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+async def dummy_verify_password():
+    """Spend the time of a real verify, so a login for an unknown email takes as long as one with a wrong password."""
+    await _run_in_hash_pool(pwd_context.dummy_verify)
@@ -0,0 +1,53 @@
+"""Run background job workers outside the API process.
+
+    python -m app.worker [--processes N] [--concurrency M]
+
+Each process claims jobs independently (FOR UPDATE SKIP LOCKED), so workers
+can run on any number of hosts at once. Set JOB_WORKER_IN_PROCESS=false on the
+API servers to leave all jobs to these workers.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+
+from . import db, jobs, tasks  # noqa: F401  (tasks registers the handlers)
+
+
+async def _serve(concurrency: int):
+    worker = jobs.Worker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await db.dispose()
+
+
+def serve(concurrency: int):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_serve(concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=jobs.JOB_CONCURRENCY, help="jobs run at once per process")
+    args = parser.parse_args()
+    if args.processes == 1:
+        return serve(args.concurrency)
+    # Each child builds its own engine: connections must not cross a fork.
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=serve, args=(args.concurrency,), name=f"worker-{n}")
+                 for n in range(args.processes)]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
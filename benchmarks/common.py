@@ -0,0 +1,106 @@
+"""Setup shared by the benchmarks.
+
+Run a benchmark from the repository root as a module, e.g.
+``python -m benchmarks.throughput``; each takes ``--help``. They need the dev
+requirements. Set BENCH_DATABASE_URL to a database the benchmark may wipe (a
+scratch Postgres gives the numbers that matter); otherwise they use a
+throwaway SQLite file, which serializes writers and has no network round trip.
+
+This module sets the app's environment, so import it before anything from ``app``.
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="inventory-bench-")
+os.environ.update(
+    DATABASE_URL=os.getenv("BENCH_DATABASE_URL") or f"sqlite+aiosqlite:///{_tmp}/bench.db",
+    SECRET_KEY=os.getenv("SECRET_KEY") or "benchmark-secret-key-that-is-long-enough-for-hs256",
+    ALGORITHM=os.getenv("ALGORITHM") or "HS256",
+    ACCESS_TOKEN_EXPIRE_MINUTES=os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES") or "30",
+    JOB_WORKER_IN_PROCESS="false",
+    RATE_LIMIT_ENABLED=os.getenv("RATE_LIMIT_ENABLED", "false"),
+    # Measure the database path, not cache hits, and keep requests and queries
+    # that are slow only because of the load off the output.
+    RESPONSE_CACHE_TTL=os.getenv("RESPONSE_CACHE_TTL", "0"),
+    SLOW_QUERY_MS=os.getenv("SLOW_QUERY_MS", "inf"),
+    SLOW_REQUEST_MS=os.getenv("SLOW_REQUEST_MS", "inf"),
+)
+
+import httpx  # noqa: E402
+
+from app import db, models, oauth2  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+async def reset_schema():
+    """Drop and recreate every table."""
+    async with db.get_engine().begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+
+
+async def add_users(count: int, role: str = "student", password: str = "x"):
+    """Insert ``count`` users and return their ids."""
+    rows = [{"email": f"user{n}@example.com", "password": password, "full_name": f"User {n}", "role": role}
+            for n in range(count)]
+    async with db.SessionLocal() as session:
+        ids = (await session.scalars(models.User.__table__.insert().returning(models.User.id), rows)).all()
+        await session.commit()
+    return list(ids)
+
+
+def auth(user_id: int, role: str = "admin"):
+    token = oauth2.create_access_token({"user_id": user_id, "role": role, "is_active": True})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def client(asgi=app):
+    """An HTTP client calling ``asgi`` in this process, so only the app and the database are measured.
+
+    Unhandled errors come back as 500s to be counted, as they would over the network.
+    """
+    transport = httpx.ASGITransport(app=asgi, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None)
+
+
+class Result:
+    """Latencies and status codes of a batch of calls, and the wall time the batch took."""
+
+    def __init__(self, latencies, statuses, elapsed: float):
+        self.latencies = sorted(latencies)
+        self.statuses = statuses
+        self.elapsed = elapsed
+
+    @property
+    def rate(self):
+        return len(self.latencies) / self.elapsed
+
+    def percentile(self, p: float):
+        return self.latencies[min(len(self.latencies) - 1, int(p / 100 * len(self.latencies)))]
+
+    def row(self, label: str):
+        codes = " ".join(f"{code}x{count}" for code, count in sorted(self.statuses.items()))
+        return (f"{label:<28} {self.rate:9.0f}/s  p50 {self.percentile(50) * 1e3:8.1f}ms  "
+                f"p99 {self.percentile(99) * 1e3:8.1f}ms  max {self.latencies[-1] * 1e3:8.1f}ms  [{codes}]")
+
+
+async def run(calls: int, concurrency: int, call):
+    """Await ``call(n)`` for n in ``range(calls)``, at most ``concurrency`` at a time.
+
+    ``call`` returns an HTTP status code (or anything else to tally).
+    """
+    slots = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def timed(n):
+        async with slots:
+            start = time.perf_counter()
+            status = await call(n)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(n) for n in range(calls)))
+    return Result(latencies, statuses, time.perf_counter() - start)
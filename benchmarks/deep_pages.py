@@ -0,0 +1,92 @@
+"""Latency of deep pages on the list endpoints: ?skip= offsets against ?cursor= keysets.
+
+Seeds --rows events and permissions (1M by default; seeding takes a while),
+then times GET /events/ and GET /permissions/ at increasing page numbers,
+reaching each page both by offset and by the cursor of the page before it.
+Offset pages get slower with depth as the database reads and discards every
+skipped row; keyset pages should stay flat.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from benchmarks import common
+from app import db, models
+from app.pagination import encode_cursor
+
+CHUNK = 10000
+ENDPOINTS = [
+    ("/events/", [models.Event.start_date, models.Event.id]),
+    ("/permissions/", [models.Permission.id]),
+]
+
+
+async def seed(rows: int):
+    await common.reset_schema()
+    organizer = (await common.add_users(1, role="admin"))[0]
+    start = datetime(2030, 1, 1)
+    async with db.SessionLocal() as session:
+        for first in range(0, rows, CHUNK):
+            numbers = range(first, min(first + CHUNK, rows))
+            # Start dates out of id order, so the events keyset is not the primary key.
+            await session.execute(insert(models.Event), [
+                {"title": f"Event {n}", "organizer_id": organizer, "status": "approved",
+                 "start_date": start + timedelta(minutes=n * 7919 % rows), "end_date": start + timedelta(days=1)}
+                for n in numbers])
+            await session.execute(insert(models.Permission), [
+                {"event_id": n + 1, "user_id": organizer, "approver_id": organizer, "permission_type": "venue",
+                 "status": "pending"} for n in numbers])
+            await session.commit()
+
+
+async def cursor_for(keys, page: int, limit: int):
+    """The cursor a client holds after reading pages 1 to ``page - 1``."""
+    if page == 1:
+        return None
+    async with db.SessionLocal() as session:
+        last = (await session.execute(select(*keys).order_by(*keys).offset((page - 1) * limit - 1).limit(1))).one()
+    return encode_cursor(list(last))
+
+
+async def timed(client, path: str, params, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path, params=params)
+        times.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return statistics.median(times)
+
+
+async def main(args):
+    try:
+        started = time.perf_counter()
+        await seed(args.rows)
+        print(f"seeded {args.rows} events and permissions in {time.perf_counter() - started:.0f}s")
+        pages = [page for page in args.pages if (page - 1) * args.limit < args.rows]
+        async with common.client() as client:
+            for path, keys in ENDPOINTS:
+                print(f"GET {path}?limit={args.limit}, median of {args.repeat}")
+                print(f"  {'page':>6} {'offset':>10} {'cursor':>10}")
+                for page in pages:
+                    skip = (page - 1) * args.limit
+                    offset = await timed(client, path, {"limit": args.limit, "skip": skip}, args.repeat)
+                    cursor = await cursor_for(keys, page, args.limit)
+                    keyset = await timed(client, path, {"limit": args.limit, **({"cursor": cursor} if cursor else {})},
+                                         args.repeat)
+                    print(f"  {page:>6} {offset * 1e3:8.1f}ms {keyset * 1e3:8.1f}ms")
+    finally:
+        await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="events and permissions to seed")
+    parser.add_argument("--limit", type=int, default=100, help="page size")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 5000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="requests per measurement")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,78 @@
+"""Background job queue throughput and enqueue-to-start latency.
+
+Throughput: --jobs jobs are enqueued in one commit and --workers in-process
+workers (each running --concurrency jobs at a time, schedules off) drain the
+queue. Latency: jobs are enqueued one commit at a time and the time from the
+commit to the handler starting is recorded; with the worker in the same
+process a commit wakes it, so this is the claim path, not the poll interval.
+Handlers sleep --handler-ms to stand in for real work.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks import common
+from app import db, jobs
+
+NAME = "benchmark.noop"
+started = {}
+
+
+@jobs.handler(NAME, max_attempts=1)
+async def _noop(session, n: int, sleep: float):
+    started[n] = time.perf_counter()
+    if sleep:
+        await asyncio.sleep(sleep)
+
+
+async def enqueue(first: int, count: int, sleep: float):
+    async with db.SessionLocal() as session:
+        for n in range(first, first + count):
+            jobs.enqueue(session, NAME, n=n, sleep=sleep)
+        committed = time.perf_counter()
+        await session.commit()
+    return committed
+
+
+async def wait_for(n: int):
+    while n not in started:
+        await asyncio.sleep(0.0005)
+
+
+async def main(args):
+    sleep = args.handler_ms / 1000
+    workers = [jobs.Worker(concurrency=args.concurrency, schedules=False) for _ in range(args.workers)]
+    running = []
+    try:
+        await common.reset_schema()
+        running = [asyncio.create_task(worker.run()) for worker in workers]
+        completed = jobs.JOBS_COMPLETED.value
+        start = await enqueue(0, args.jobs, sleep)
+        while jobs.JOBS_COMPLETED.value - completed < args.jobs:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        print(f"{args.jobs} jobs, {args.workers} workers x {args.concurrency}: {args.jobs / elapsed:.0f} jobs/s")
+
+        latencies = []
+        for n in range(args.jobs, args.jobs + args.samples):
+            committed = await enqueue(n, 1, sleep)
+            await wait_for(n)
+            latencies.append(started[n] - committed)
+        latencies.sort()
+        print("enqueue to start: " + "  ".join(f"p{p} {latencies[int(p / 100 * len(latencies))] * 1e3:.1f}ms"
+                                               for p in (50, 95, 99)) + f"  max {latencies[-1] * 1e3:.1f}ms")
+    finally:
+        for worker in workers:
+            worker.stop()
+        await asyncio.gather(*running)
+        await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=5000, help="jobs enqueued for the throughput run")
+    parser.add_argument("--workers", type=int, default=1, help="workers sharing the queue")
+    parser.add_argument("--concurrency", type=int, default=jobs.JOB_CONCURRENCY, help="jobs each worker runs at once")
+    parser.add_argument("--samples", type=int, default=200, help="single jobs timed for latency")
+    parser.add_argument("--handler-ms", type=float, default=0, help="time each job spends in its handler")
+    asyncio.run(main(parser.parse_args()))
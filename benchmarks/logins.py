@@ -0,0 +1,93 @@
+"""Login throughput and event-loop lag while sign-ups hash passwords.
+
+Drives POST /login, alone and alongside a stream of POST /users/ sign-ups,
+with bcrypt running in the hash pool (utils.HASH_WORKERS threads) and, for
+comparison, inline on the event loop as it used to. A probe task sleeping in
+short steps records how late the loop wakes it: that lag is what every other
+request on the worker waits. Cost comes from BCRYPT_ROUNDS (12 by default).
+"""
+import argparse
+import asyncio
+import time
+from contextlib import contextmanager, nullcontext
+
+from benchmarks import common
+from app import db, utils
+
+PASSWORD = "correct horse battery staple"
+PROBE_INTERVAL = 0.005
+
+
+@contextmanager
+def inline_hashing():
+    """Run bcrypt on the event loop, as the handlers did before the hash pool."""
+    pooled = utils._run_in_hash_pool
+
+    async def inline(func, *args):
+        return func(*args)
+    utils._run_in_hash_pool = inline
+    try:
+        yield
+    finally:
+        utils._run_in_hash_pool = pooled
+
+
+async def probe(lags, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def measure(client, users: int, logins: int, signups: int, concurrency: int, first_signup: int):
+    async def login(n):
+        response = await client.post("/login", json={"email": f"user{n % users}@example.com", "password": PASSWORD})
+        return response.status_code
+
+    async def signup(n):
+        response = await client.post("/users/", json={"email": f"new{first_signup + n}@example.com", "password": PASSWORD,
+                                                      "full_name": "New User", "role": "student"})
+        return response.status_code
+
+    lags, stop = [], asyncio.Event()
+    probing = asyncio.create_task(probe(lags, stop))
+    runs = [common.run(logins, concurrency, login)]
+    if signups:
+        runs.append(common.run(signups, concurrency, signup))
+    results = await asyncio.gather(*runs)
+    stop.set()
+    await probing
+    lags.sort()
+    return results, lags
+
+
+async def main(args):
+    try:
+        await common.reset_schema()
+        hashed = utils.get_password_hash(PASSWORD)
+        await common.add_users(args.users, password=hashed)
+        print(f"bcrypt rounds {utils.BCRYPT_ROUNDS}, hash workers {utils.HASH_WORKERS}, concurrency {args.concurrency}")
+        first_signup = 0
+        async with common.client() as client:
+            for mode, hashing in (("pool", nullcontext), ("inline", inline_hashing)):
+                for signups in (0, args.signups):
+                    with hashing():
+                        results, lags = await measure(client, args.users, args.logins, signups, args.concurrency,
+                                                      first_signup)
+                    first_signup += signups
+                    label = f"{mode}, {'with' if signups else 'no'} sign-ups"
+                    print(f"{label}: loop lag p99 {lags[int(0.99 * len(lags))] * 1e3:.1f}ms max {lags[-1] * 1e3:.1f}ms")
+                    print("  " + results[0].row("logins"))
+                    if signups:
+                        print("  " + results[1].row("sign-ups"))
+    finally:
+        await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200, help="existing accounts to log in as")
+    parser.add_argument("--logins", type=int, default=200, help="logins per run")
+    parser.add_argument("--signups", type=int, default=50, help="sign-ups alongside the logins")
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""Throughput as worker processes and per-worker pool size grow.
+
+For each combination of --workers and --pool-sizes, starts that many worker
+processes (each the app with its own pool of DB_POOL_SIZE connections and no
+overflow, like a uvicorn worker) and has each keep --concurrency requests to
+GET /events/{event_id} in flight for --seconds. Reports the combined request
+rate, latency, the mean wait for a pooled connection and pool timeouts. Past
+the database's capacity more connections only add checkout wait.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+from sqlalchemy.util import await_only
+
+from benchmarks import common
+from app import db, metrics, models
+from app.config import settings
+
+
+async def seed(events: int):
+    await common.reset_schema()
+    organizer = (await common.add_users(1, role="admin"))[0]
+    start = datetime(2030, 1, 1, 9)
+    async with db.SessionLocal() as session:
+        await session.execute(insert(models.Event), [
+            {"title": f"Event {n}", "organizer_id": organizer, "status": "approved",
+             "start_date": start + timedelta(hours=n), "end_date": start + timedelta(hours=n + 2)}
+            for n in range(events)])
+        await session.commit()
+
+
+async def worker(args):
+    """One worker process: hammer the app until the deadline and print what it saw as JSON."""
+    if args.rtt_ms:
+        event.listen(db.get_engine().sync_engine, "before_cursor_execute",
+                     lambda *_: await_only(asyncio.sleep(args.rtt_ms / 1000)))
+    latencies, statuses = [], {}
+    try:
+        async with common.client() as client:
+            async def loop(deadline):
+                while time.time() < deadline:
+                    start = time.perf_counter()
+                    response = await client.get(f"/events/{random.randint(1, args.events)}")
+                    if time.time() < deadline:
+                        latencies.append(time.perf_counter() - start)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            await asyncio.sleep(max(0.0, args.start_at - time.time()))
+            await asyncio.gather(*(loop(args.start_at + args.seconds) for _ in range(args.concurrency)))
+    finally:
+        await db.dispose()
+    wait = metrics.POOL_WAIT_SECONDS
+    print(json.dumps({"latencies": latencies, "statuses": statuses, "pool_wait": wait.total / max(1, wait.count),
+                      "pool_timeouts": metrics.POOL_TIMEOUTS.value}))
+
+
+def run_workers(args, workers: int, pool_size: int):
+    env = {**os.environ, "BENCH_DATABASE_URL": settings.database_url,
+           "DB_POOL_SIZE": str(pool_size), "DB_MAX_OVERFLOW": "0", "DB_POOL_TIMEOUT": str(args.pool_timeout)}
+    start_at = time.time() + args.startup
+    command = [sys.executable, "-W", "ignore", "-m", "benchmarks.pool_saturation", "--worker",
+               "--start-at", str(start_at), "--seconds", str(args.seconds), "--events", str(args.events),
+               "--concurrency", str(args.concurrency), "--rtt-ms", str(args.rtt_ms)]
+    processes = [subprocess.Popen(command, env=env, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    reports = [json.loads(process.communicate()[0].splitlines()[-1]) for process in processes]
+    latencies = [latency for report in reports for latency in report["latencies"]]
+    statuses = {}
+    for report in reports:
+        for status, count in report["statuses"].items():
+            statuses[int(status)] = statuses.get(int(status), 0) + count
+    result = common.Result(latencies, statuses, args.seconds)
+    pool_wait = sum(report["pool_wait"] for report in reports) / workers
+    timeouts = sum(report["pool_timeouts"] for report in reports)
+    return result.row(f"{workers} workers x {pool_size} conns") + f"  wait {pool_wait * 1e3:.1f}ms  timeouts {timeouts:.0f}"
+
+
+async def main(args):
+    try:
+        await seed(args.events)
+    finally:
+        await db.dispose()
+    for workers in args.workers:
+        for pool_size in args.pool_sizes:
+            print(run_workers(args, workers, pool_size), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[2, 5, 10])
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight per worker")
+    parser.add_argument("--seconds", type=float, default=5, help="measured run length per combination")
+    parser.add_argument("--events", type=int, default=1000, help="events to seed")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="simulated round trip added to every statement")
+    parser.add_argument("--pool-timeout", type=float, default=30, help="DB_POOL_TIMEOUT for the workers")
+    parser.add_argument("--startup", type=float, default=3, help="seconds the workers get to start")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    asyncio.run(worker(args) if args.worker else main(args))
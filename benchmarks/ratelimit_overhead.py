@@ -0,0 +1,71 @@
+"""Per-request cost of the rate limiter, in microseconds.
+
+Times finding the user that keys the user buckets (verifying a new bearer
+token, or remembering a recent one), MemoryBackend.take() for the checks a
+write takes (IP, user, route), and the whole RateLimitMiddleware in front of
+an app that does nothing, against calling that app directly. Limits are
+raised so nothing is refused: this is the cost every admitted request pays.
+With RATE_LIMIT_REDIS_URL set the Redis backend is timed too, which adds a
+round trip.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks import common
+from app import ratelimit
+
+UNLIMITED = ratelimit.Rate("1000000000/1")
+
+
+async def per_call(func, calls: int):
+    for _ in range(min(calls, 1000)):
+        await func()
+    start = time.perf_counter()
+    for _ in range(calls):
+        await func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+async def passthrough(scope, receive, send):
+    pass
+
+
+async def main(args):
+    ratelimit.RATE_LIMIT_ENABLED = True
+    ratelimit.PER_IP = ratelimit.PER_USER_WRITES = UNLIMITED
+    for route in ratelimit.ROUTES:
+        route.per_ip = route.per_ip and UNLIMITED
+        route.per_user = route.per_user and UNLIMITED
+        route.concurrency = None
+    headers = [(b"authorization", common.auth(42)["Authorization"].encode())]
+    scope = {"type": "http", "method": "POST", "path": "/events/7/register", "headers": headers,
+             "client": ("203.0.113.9", 50000)}
+    checks = [("ip:203.0.113.9", UNLIMITED), ("user:42", UNLIMITED), ("POST /events/{event_id}/register|user:42", UNLIMITED)]
+    backends = [("memory", ratelimit.MemoryBackend())]
+    if ratelimit.RATE_LIMIT_REDIS_URL:
+        backends.append(("redis", ratelimit.RedisBackend(ratelimit.RATE_LIMIT_REDIS_URL)))
+
+    async def verify():
+        ratelimit._token_users.clear()
+        ratelimit._user(scope)
+
+    async def remembered():
+        ratelimit._user(scope)
+    print(f"{'token to user, verified':<30} {await per_call(verify, args.calls // 10):7.2f}us")
+    print(f"{'token to user, remembered':<30} {await per_call(remembered, args.calls):7.2f}us")
+    bare = await per_call(lambda: passthrough(scope, None, None), args.calls)
+    print(f"{'app alone':<30} {bare:7.2f}us")
+    for name, backend in backends:
+        calls = args.calls if name == "memory" else args.calls // 100
+        take = await per_call(lambda: backend.take(checks), calls)
+        print(f"{name + ' take, 3 buckets':<30} {take:7.2f}us")
+        middleware = ratelimit.RateLimitMiddleware(passthrough, backend=backend)
+        limited = await per_call(lambda: middleware(scope, None, None), calls)
+        print(f"{name + ' middleware + app':<30} {limited:7.2f}us  (+{limited - bare:.2f}us)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100000, help="calls timed per measurement")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""A signup burst: --users students registering for one event at once.
+
+Every student calls POST /events/{event_id}/register with an Idempotency-Key,
+all of them in flight together (10k by default), against an event with
+--capacity seats and, with --waitlist, a waitlist. A share of them then
+retry with the same key, as clients do after a timeout, and --cancel of the
+registered students unregister. Checks that no seat is oversold, retries
+get their first answer back, and cancellations promote from the waitlist.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from benchmarks import common
+from app import db, models, registrations
+
+
+async def seed(users: int, capacity: int, waitlist: bool):
+    await common.reset_schema()
+    user_ids = await common.add_users(users)
+    async with db.SessionLocal() as session:
+        event = models.Event(title="Orientation", organizer_id=user_ids[0], status="approved",
+                             start_date=datetime(2030, 9, 1, 9), end_date=datetime(2030, 9, 1, 12),
+                             expected_attendance=capacity, waitlist_enabled=waitlist)
+        session.add(event)
+        await session.commit()
+    return event.id, user_ids
+
+
+async def counts(event_id: int):
+    async with db.SessionLocal() as session:
+        statuses = dict((await session.execute(
+            select(models.Registration.status, func.count()).filter(models.Registration.event_id == event_id)
+            .group_by(models.Registration.status))).all())
+        seats = await session.scalar(select(models.Event.registered_count).filter(models.Event.id == event_id))
+    return statuses, seats
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        raise SystemExit(message)
+
+
+async def main(args):
+    try:
+        event_id, user_ids = await seed(args.users, args.capacity, args.waitlist)
+        headers = [{**common.auth(user_id, role="student"), "Idempotency-Key": f"signup-{user_id}"} for user_id in user_ids]
+        path = f"/events/{event_id}/register"
+        async with common.client() as client:
+            first = {}
+
+            async def register(n):
+                response = await client.post(path, headers=headers[n])
+                first[n] = response.json().get("id") if response.status_code == 200 else None
+                return response.status_code
+            print((await common.run(args.users, args.concurrency, register)).row("signups"))
+            statuses, seats = await counts(event_id)
+            print(f"  {statuses}, registered_count {seats}")
+            registered = statuses.get(registrations.REGISTERED, 0)
+            check(registered == min(args.capacity, args.users) == seats, "seats were oversold or left unused")
+
+            retried = list(range(0, args.users, max(1, round(1 / args.retry_share)))) if args.retry_share else []
+
+            async def retry(n):
+                response = await client.post(path, headers=headers[retried[n]])
+                same = response.status_code == 200 and response.json()["id"] == first[retried[n]]
+                return response.status_code if same or first[retried[n]] is None else "changed"
+            print((await common.run(len(retried), args.concurrency, retry)).row("retries, same key"))
+
+            async with db.SessionLocal() as session:
+                holders = (await session.scalars(
+                    select(models.Registration.user_id).filter(models.Registration.event_id == event_id,
+                                                               models.Registration.status == registrations.REGISTERED)
+                    .limit(args.cancel))).all()
+            by_user = {user_id: n for n, user_id in enumerate(user_ids)}
+
+            async def cancel(n):
+                return (await client.delete(path, headers=headers[by_user[holders[n]]])).status_code
+            print((await common.run(len(holders), args.concurrency, cancel)).row("cancellations"))
+        statuses, seats = await counts(event_id)
+        print(f"  {statuses}, registered_count {seats}")
+        expected = min(args.capacity, args.users - len(holders)) if args.waitlist else registered - len(holders)
+        check(statuses.get(registrations.REGISTERED, 0) == expected == seats, "cancellations did not refill the seats")
+    finally:
+        await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000, help="students signing up")
+    parser.add_argument("--capacity", type=int, default=500, help="seats at the event")
+    parser.add_argument("--waitlist", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--concurrency", type=int, default=10000, help="requests in flight at once")
+    parser.add_argument("--retry-share", type=float, default=0.1, help="share of students who retry their signup")
+    parser.add_argument("--cancel", type=int, default=100, help="registered students who then unregister")
+    asyncio.run(main(parser.parse_args()))
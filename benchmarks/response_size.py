@@ -0,0 +1,112 @@
+"""Payload size, serialization time and database work of the /events/ and /users/ list shapes.
+
+Seeds --events events (with a paragraph of description each) organized by
+--users users, then builds a page of --limit rows the way each response shape
+does: the old full schemas.Event / schemas.User with every column loaded, the
+EventSummary / UserSummary the list routes now return, and some ?fields= and
+?expand= projections (fields.Projection, as the routers build them). Each shape
+runs --repeat times under a metrics.RequestStats, which the engine hooks fill
+with the statements and rows fetched. Reports the JSON bytes, the median
+serialization and database time, and the statements and rows per page (rows
+only on drivers that report them, i.e. Postgres; SQLite shows 0).
+"""
+import argparse
+import asyncio
+import statistics
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+
+from benchmarks import common
+from app import db, loaders, metrics, models, schemas
+from app.fields import Projection
+
+START = datetime(2030, 1, 1, 9)
+DESCRIPTION = "Talks, demos and a hands-on workshop; bring a laptop and questions for the panel. " * 6
+
+
+async def seed(events: int, users: int):
+    await common.reset_schema()
+    organizers = await common.add_users(users, role="admin")
+    async with db.SessionLocal() as session:
+        await session.execute(insert(models.Event), [
+            {"title": f"Event {n}", "description": DESCRIPTION, "organizer_id": organizers[n % users],
+             "status": "approved", "type": "talk", "logo": f"logos/event-{n}.png",
+             "start_date": START + timedelta(hours=n), "end_date": START + timedelta(hours=n + 2)}
+            for n in range(events)])
+        await session.commit()
+
+
+def full(model, schema, *options):
+    """The list as it was served before the summary schemas: every column, full nested models."""
+    return select(model).options(*options), schema
+
+
+def projected(model, schema, fields=None, expand=None, relations=None, required=()):
+    projection = Projection(model, schema, fields, expand, relations, required=required)
+    return select(model).options(*projection.options), projection.schema
+
+
+def ordered(shape, *keys):
+    query, schema = shape
+    return query.order_by(*keys), schema
+
+
+def shapes():
+    event, user = models.Event, models.User
+    summary = dict(relations=loaders.EVENT_SUMMARY_RELATIONS, required=[event.start_date])
+    events = [
+        ("full Event", full(event, schemas.Event, selectinload(event.organizer))),
+        ("EventSummary", projected(event, schemas.EventSummary, **summary)),
+        ("expand=organizer", projected(event, schemas.EventSummary, expand="organizer", **summary)),
+        ("fields=id,title,start_date", projected(event, schemas.EventSummary, fields="id,title,start_date", **summary)),
+    ]
+    users = [
+        ("full User", full(user, schemas.User)),
+        ("UserSummary", projected(user, schemas.UserSummary)),
+        ("fields=id,full_name", projected(user, schemas.UserSummary, fields="id,full_name")),
+    ]
+    return ([("/events/", label, ordered(shape, event.start_date, event.id)) for label, shape in events]
+            + [("/users/", label, ordered(shape, user.id)) for label, shape in users])
+
+
+async def page(query, schema, limit: int):
+    """One page of ``query`` serialized with ``schema``, and the RequestStats it ran under."""
+    stats = metrics.RequestStats()
+    token = metrics.current.set(stats)
+    try:
+        async with db.SessionLocal() as session:
+            rows = (await session.scalars(query.limit(limit))).all()
+            with metrics.serializing():
+                adapter = TypeAdapter(List[schema])
+                body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    finally:
+        metrics.current.reset(token)
+    return body, stats
+
+
+async def main(args):
+    try:
+        await seed(args.events, args.users)
+        print(f"{'route':<9} {'shape':<28} {'bytes':>9} {'ser ms':>8} {'db ms':>8} {'stmts':>6} {'rows':>6}")
+        for route, label, (query, schema) in shapes():
+            runs = [await page(query, schema, args.limit) for _ in range(args.repeat)]
+            body, stats = runs[-1]
+            serialize = statistics.median(stats.serialize for _, stats in runs)
+            database = statistics.median(stats.db for _, stats in runs)
+            print(f"{route:<9} {label:<28} {len(body):>9} {serialize * 1e3:>8.2f} {database * 1e3:>8.2f} "
+                  f"{stats.statements:>6} {stats.rows:>6}")
+    finally:
+        await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000, help="events to seed")
+    parser.add_argument("--users", type=int, default=500, help="users to seed, who organize the events")
+    parser.add_argument("--limit", type=int, default=100, help="rows per page, the list routes' default")
+    parser.add_argument("--repeat", type=int, default=50, help="pages built per shape")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,66 @@
+"""Cold start: time to import the app and to answer its first requests.
+
+Each run is a fresh interpreter that imports app.main, runs the lifespan
+startup, and requests /health/ready and then a route that queries the
+database. Reports the median of --runs. With --max-import-ms or
+--max-first-request-ms it exits non-zero when the median is over budget, so
+it can guard against something slow creeping back into the import path.
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+
+from benchmarks import common
+from app import db
+
+CHILD = r"""
+import time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    assert client.get("/health/ready").status_code == 200
+    ready = time.perf_counter()
+    client.get("/users/1")
+    first = time.perf_counter()
+print((imported - start) * 1e3, (ready - start) * 1e3, (first - start) * 1e3)
+"""
+
+
+def run_once():
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD], capture_output=True, text=True)
+    if result.returncode:
+        raise SystemExit(result.stderr)
+    return [float(value) for value in result.stdout.split()[-3:]]
+
+
+async def create_schema():
+    try:
+        await common.reset_schema()
+    finally:
+        await db.dispose()
+
+
+def main(args):
+    asyncio.run(create_schema())
+    runs = [run_once() for _ in range(args.runs)]
+    imported, ready, first = (statistics.median(column) for column in zip(*runs))
+    print(f"import {imported:.0f}ms  ready {ready:.0f}ms  first request {first:.0f}ms  (median of {args.runs})")
+    over = []
+    if args.max_import_ms is not None and imported > args.max_import_ms:
+        over.append(f"import {imported:.0f}ms > {args.max_import_ms:.0f}ms")
+    if args.max_first_request_ms is not None and first > args.max_first_request_ms:
+        over.append(f"first request {first:.0f}ms > {args.max_first_request_ms:.0f}ms")
+    if over:
+        raise SystemExit("over budget: " + ", ".join(over))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters to time")
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import takes longer")
+    parser.add_argument("--max-first-request-ms", type=float, help="fail if the median first request takes longer")
+    main(parser.parse_args())
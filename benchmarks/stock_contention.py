@@ -0,0 +1,65 @@
+"""Concurrent approvals of inventory requests against one hot item.
+
+Seeds one item with --stock units and --requests pending requests for one
+unit each, then approves them all at once through
+POST /items/{item_id}/{request_id}/approve. Reports throughput and latency,
+and checks the outcome: exactly min(stock, requests) approvals, no negative
+stock, and a balance that matches the ledger.
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import func, insert, select
+
+from benchmarks import common
+from app import db, inventory, models
+
+
+async def seed(stock: int, requests: int):
+    await common.reset_schema()
+    requester = (await common.add_users(1))[0]
+    async with db.SessionLocal() as session:
+        item = models.InventoryItem(name="Projector", unit="pieces", quantity_available=0)
+        session.add(item)
+        await session.flush()
+        await inventory.add_stock(session, item.id, stock, "opening balance")
+        request_ids = (await session.scalars(insert(models.InventoryRequest).returning(models.InventoryRequest.id), [
+            {"requester_id": requester, "item_id": item.id, "quantity_requested": 1, "status": "pending"}
+            for _ in range(requests)])).all()
+        await session.commit()
+    return item.id, list(request_ids)
+
+
+async def outcome(item_id: int):
+    async with db.SessionLocal() as session:
+        approved = await session.scalar(select(func.count()).filter(models.InventoryRequest.item_id == item_id,
+                                                                    models.InventoryRequest.status == "approved"))
+        stock = await session.scalar(select(models.InventoryItem.quantity_available)
+                                     .filter(models.InventoryItem.id == item_id))
+        ledger = await session.scalar(select(inventory.ledger_balance(item_id)))
+    return approved, stock, ledger
+
+
+async def main(args):
+    try:
+        item_id, request_ids = await seed(args.stock, args.requests)
+        async with common.client() as client:
+            async def approve(n):
+                return (await client.post(f"/items/{item_id}/{request_ids[n]}/approve")).status_code
+            result = await common.run(len(request_ids), args.concurrency, approve)
+        print(result.row(f"{args.requests} approvals, {args.concurrency} at a time"))
+        approved, stock, ledger = await outcome(item_id)
+    finally:
+        await db.dispose()
+    expected = min(args.stock, args.requests)
+    print(f"approved {approved} (expected {expected}), stock left {stock}, ledger balance {ledger}")
+    if approved != expected or stock != args.stock - approved or stock != ledger or stock < 0:
+        raise SystemExit("stock accounting is inconsistent")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stock", type=int, default=300, help="units of the hot item in stock")
+    parser.add_argument("--requests", type=int, default=500, help="pending one-unit requests to approve")
+    parser.add_argument("--concurrency", type=int, default=500, help="approvals in flight at once")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""Concurrent read throughput of the async session layer against blocking sessions.
+
+GET /events/ is served by the app, and by a copy of the handler written the
+old way: an ``async def`` running the same query on a synchronous Session,
+which blocks the event loop for every round trip. The gap between the two
+grows with concurrency and with the database's latency, so run it against
+Postgres (BENCH_DATABASE_URL) for the numbers that matter, or add a simulated
+network round trip to every statement with --rtt-ms.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, noload
+from sqlalchemy.util import await_only
+
+from benchmarks import common
+from app import db, models, schemas
+from app.config import settings
+
+SYNC_DRIVERS = {"sqlite+aiosqlite": "sqlite", "postgresql+asyncpg": "postgresql+psycopg2"}
+
+
+def blocking_app(pool_size: int):
+    url = make_url(settings.database_url)
+    engine = create_engine(url.set(drivername=SYNC_DRIVERS.get(url.drivername, url.drivername)),
+                           pool_size=pool_size, max_overflow=0)
+    blocking = FastAPI()
+
+    @blocking.get("/events/", response_model=List[schemas.EventSummary])
+    async def read_events(limit: int = 100):
+        with Session(engine) as session:
+            return session.scalars(select(models.Event).options(noload(models.Event.organizer))
+                                   .order_by(models.Event.start_date, models.Event.id).limit(limit)).all()
+    return blocking, engine
+
+
+def add_round_trip(blocking_engine, rtt: float):
+    """Delay every statement by ``rtt`` seconds: sleeping on the blocking engine, awaiting on the app's."""
+    event.listen(blocking_engine, "before_cursor_execute", lambda *args: time.sleep(rtt))
+    event.listen(db.get_engine().sync_engine, "before_cursor_execute", lambda *args: await_only(asyncio.sleep(rtt)))
+
+
+async def seed(events: int):
+    await common.reset_schema()
+    organizer = (await common.add_users(1, role="admin"))[0]
+    start = datetime(2030, 1, 1, 9)
+    async with db.SessionLocal() as session:
+        session.add_all(models.Event(title=f"Event {n}", organizer_id=organizer, status="approved",
+                                     start_date=start + timedelta(hours=n), end_date=start + timedelta(hours=n + 2))
+                        for n in range(events))
+        await session.commit()
+
+
+async def measure(asgi, calls: int, concurrency: int, limit: int):
+    async with common.client(asgi) as client:
+        async def call(n):
+            return (await client.get("/events/", params={"limit": limit})).status_code
+        await common.run(min(calls, 50), concurrency, call)  # warm up the pool
+        return await common.run(calls, concurrency, call)
+
+
+async def main(args):
+    blocking, engine = blocking_app(settings.db_pool_size)
+    try:
+        await seed(args.events)
+        if args.rtt_ms:
+            add_round_trip(engine, args.rtt_ms / 1000)
+        for concurrency in args.concurrency:
+            print(f"concurrency {concurrency}")
+            for label, asgi in (("blocking Session", blocking), ("AsyncSession", common.app)):
+                print("  " + (await measure(asgi, args.calls, concurrency, args.limit)).row(label))
+    finally:
+        engine.dispose()
+        await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000, help="events to seed")
+    parser.add_argument("--calls", type=int, default=1000, help="requests per run")
+    parser.add_argument("--limit", type=int, default=50, help="page size requested")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--rtt-ms", type=float, default=0, help="simulated round trip added to every statement")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""Venue availability searches and concurrent bookings against a long booking history.
+
+Seeds --venues venues holding --bookings two-hour bookings between them, then
+times GET /venues/available (availability.find_available_venues) for random
+windows inside that history, and POST /venues/{venue_id}/book with --attempts
+overlapping bookings for a few hot venues at once. Checks that no two live
+bookings of a venue overlap. On SQLite, writers that wait out the busy
+timeout come back as 500s ("database is locked") and are only counted.
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, insert, select
+from sqlalchemy.orm import aliased
+
+from benchmarks import common
+from app import db, models
+
+HISTORY_START = datetime(2029, 1, 1)
+HOT_START = datetime(2031, 1, 1, 8)
+
+
+async def seed(venues: int, bookings: int):
+    await common.reset_schema()
+    admin = (await common.add_users(1, role="admin"))[0]
+    async with db.SessionLocal() as session:
+        event = models.Event(title="Conference", organizer_id=admin, status="approved",
+                             start_date=HISTORY_START, end_date=HOT_START)
+        session.add(event)
+        await session.flush()
+        permission = models.Permission(event_id=event.id, user_id=admin, approver_id=admin,
+                                       permission_type="venue", status="approved")
+        session.add(permission)
+        await session.flush()
+        venue_ids = (await session.scalars(insert(models.Venue).returning(models.Venue.id), [
+            {"name": f"Room {n}", "venue_type": ("hall", "classroom", "lab")[n % 3], "capacity": 20 + n % 10 * 20,
+             "location": f"Building {n % 7}", "is_active": True}
+            for n in range(venues)])).all()
+        # A booking every three hours per venue, staggered so any window finds some venues free.
+        rows = [{"venue_id": venue_ids[n % venues], "event_id": event.id, "permission_id": permission.id,
+                 "booker_id": admin, "purpose": "history", "status": "approved", "rolled_up": True,
+                 "start_time": HISTORY_START + timedelta(hours=n // venues * 3 + n % 3),
+                 "end_time": HISTORY_START + timedelta(hours=n // venues * 3 + n % 3 + 2)}
+                for n in range(bookings)]
+        for first in range(0, len(rows), 10000):
+            await session.execute(insert(models.VenueBooking), rows[first:first + 10000])
+        await session.commit()
+    span = timedelta(hours=-(-bookings // venues) * 3)
+    return admin, event.id, permission.id, list(venue_ids), span
+
+
+async def overlapping_bookings(venue_ids):
+    """Pairs of live bookings of the same venue whose periods intersect."""
+    a, b = aliased(models.VenueBooking), aliased(models.VenueBooking)
+    async with db.SessionLocal() as session:
+        return await session.scalar(select(func.count()).select_from(a).join(b, and_(
+            a.venue_id == b.venue_id, a.id < b.id, a.start_time < b.end_time, b.start_time < a.end_time)).filter(
+            a.venue_id.in_(venue_ids), a.status != "cancelled", b.status != "cancelled"))
+
+
+async def main(args):
+    try:
+        admin, event_id, permission_id, venue_ids, span = await seed(args.venues, args.bookings)
+        hot = venue_ids[:args.hot_venues]
+        headers = common.auth(admin)
+        async with common.client() as client:
+            async def available(n):
+                start = HISTORY_START + timedelta(minutes=random.randrange(int(span.total_seconds() // 60)))
+                params = {"start": start.isoformat(), "end": (start + timedelta(hours=1)).isoformat()}
+                return (await client.get("/venues/available", params=params)).status_code
+            result = await common.run(args.searches, args.concurrency, available)
+            print(result.row(f"available, {args.bookings} bookings"))
+
+            async def book(n):
+                start = HOT_START + timedelta(minutes=30 * random.randrange(args.slots))
+                body = {"venue_id": 0, "event_id": event_id, "permission_id": permission_id, "purpose": f"attempt {n}",
+                        "start_time": start.isoformat(), "end_time": (start + timedelta(hours=2)).isoformat()}
+                return (await client.post(f"/venues/{random.choice(hot)}/book", json=body, headers=headers)).status_code
+            result = await common.run(args.attempts, args.concurrency, book)
+            print(result.row(f"book, {len(hot)} hot venues"))
+        overlaps = await overlapping_bookings(hot)
+    finally:
+        await db.dispose()
+    print(f"booked {result.statuses.get(200, 0)}, refused {result.statuses.get(409, 0)}, overlapping pairs {overlaps}")
+    if overlaps:
+        raise SystemExit("a venue was double booked")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--venues", type=int, default=500, help="venues to seed")
+    parser.add_argument("--bookings", type=int, default=100000, help="bookings to seed across the venues")
+    parser.add_argument("--searches", type=int, default=2000, help="availability searches to time")
+    parser.add_argument("--attempts", type=int, default=1000, help="concurrent booking attempts")
+    parser.add_argument("--hot-venues", type=int, default=5, help="venues the booking attempts compete for")
+    parser.add_argument("--slots", type=int, default=16, help="half-hour start times the attempts pick from")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at once")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,144 @@
+"""Initial schema, as previously created by create_all() at startup.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+EVENT_SEARCH_DOCUMENT = (
+    "to_tsvector('english', coalesce(title, '') || ' ' || "
+    "coalesce(description, '') || ' ' || coalesce(type, ''))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('email', sa.String(255), nullable=False, unique=True),
+        sa.Column('password', sa.String(255), nullable=False),
+        sa.Column('full_name', sa.String(100), nullable=False),
+        sa.Column('role', sa.String(50), nullable=False),
+        sa.Column('department', sa.String(100)),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('is_active', sa.Boolean()),
+        sa.Column('profile_pic', sa.String(255)),
+    )
+    op.create_table(
+        'venues',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('venue_type', sa.String(50), nullable=False),
+        sa.Column('capacity', sa.Integer()),
+        sa.Column('location', sa.String(100)),
+        sa.Column('is_active', sa.Boolean()),
+        sa.Column('picture', sa.String(255)),
+    )
+    op.create_table(
+        'inventory_items',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('description', sa.Text()),
+        sa.Column('category', sa.String(50)),
+        sa.Column('quantity_available', sa.Integer()),
+        sa.Column('unit', sa.String(20)),
+        sa.Column('minimum_stock', sa.Integer()),
+        sa.Column('last_restocked', sa.DateTime()),
+    )
+    op.create_table(
+        'events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(255), nullable=False),
+        sa.Column('description', sa.Text()),
+        sa.Column('organizer_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('start_date', sa.DateTime(), nullable=False),
+        sa.Column('end_date', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(50)),
+        sa.Column('expected_attendance', sa.Integer()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('type', sa.String(50)),
+        sa.Column('logo', sa.String(255)),
+    )
+    op.create_table(
+        'inventory_transactions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('item_id', sa.Integer(), sa.ForeignKey('inventory_items.id')),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('transaction_type', sa.String(20)),
+        sa.Column('reference', sa.String(100)),
+        sa.Column('transaction_date', sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_table(
+        'inventory_requests',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('requester_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('item_id', sa.Integer(), sa.ForeignKey('inventory_items.id')),
+        sa.Column('event_id', sa.Integer(), sa.ForeignKey('events.id')),
+        sa.Column('quantity_requested', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(50)),
+        sa.Column('request_date', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('return_date', sa.DateTime()),
+    )
+    op.create_table(
+        'permissions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('event_id', sa.Integer(), sa.ForeignKey('events.id')),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('approver_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('permission_type', sa.String(50)),
+        sa.Column('status', sa.String(50)),
+        sa.Column('description', sa.Text()),
+        sa.Column('requested_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_table(
+        'registrations',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('event_id', sa.Integer(), sa.ForeignKey('events.id')),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('registration_date', sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_table(
+        'venue_bookings',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('venue_id', sa.Integer(), sa.ForeignKey('venues.id')),
+        sa.Column('event_id', sa.Integer(), sa.ForeignKey('events.id')),
+        sa.Column('permission_id', sa.Integer(), sa.ForeignKey('permissions.id')),
+        sa.Column('booker_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('purpose', sa.Text()),
+        sa.Column('status', sa.String(50)),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(f"CREATE INDEX ix_events_search ON events USING gin ({EVENT_SEARCH_DOCUMENT})")
+        op.execute("CREATE INDEX ix_events_title_trgm ON events USING gin (lower(title) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('venue_bookings')
+    op.drop_table('registrations')
+    op.drop_table('permissions')
+    op.drop_table('inventory_requests')
+    op.drop_table('inventory_transactions')
+    op.drop_table('events')
+    op.drop_table('inventory_items')
+    op.drop_table('venues')
+    op.drop_table('users')
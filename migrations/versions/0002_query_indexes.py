@@ -0,0 +1,52 @@
+"""Index foreign keys and the status filters used by the routers.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    # read_events keyset pages and the approved-only search filter
+    ('ix_events_start_date_id', 'events', ['start_date', 'id']),
+    ('ix_events_status_start_date', 'events', ['status', 'start_date']),
+    ('ix_events_organizer_id', 'events', ['organizer_id']),
+    # read_requests and pending/approved stock checks per item
+    ('ix_inventory_requests_item_id_status', 'inventory_requests', ['item_id', 'status']),
+    ('ix_inventory_requests_requester_id', 'inventory_requests', ['requester_id']),
+    ('ix_inventory_requests_event_id', 'inventory_requests', ['event_id']),
+    ('ix_inventory_transactions_item_id_transaction_date', 'inventory_transactions', ['item_id', 'transaction_date']),
+    # approver queues
+    ('ix_permissions_approver_id_status', 'permissions', ['approver_id', 'status']),
+    ('ix_permissions_user_id', 'permissions', ['user_id']),
+    ('ix_permissions_event_id', 'permissions', ['event_id']),
+    ('ix_registrations_event_id', 'registrations', ['event_id']),
+    ('ix_registrations_user_id', 'registrations', ['user_id']),
+    # overlap checks for a venue's bookings
+    ('ix_venue_bookings_venue_id_start_time_end_time', 'venue_bookings', ['venue_id', 'start_time', 'end_time']),
+    ('ix_venue_bookings_event_id', 'venue_bookings', ['event_id']),
+    ('ix_venue_bookings_permission_id', 'venue_bookings', ['permission_id']),
+    ('ix_venue_bookings_booker_id', 'venue_bookings', ['booker_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
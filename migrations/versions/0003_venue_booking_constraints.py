@@ -0,0 +1,43 @@
+"""Reject inverted and overlapping venue bookings.
+
+Existing overlapping bookings must be resolved (or cancelled) before this
+runs on Postgres, otherwise adding the exclusion constraint fails.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('venue_bookings') as batch_op:
+        batch_op.create_check_constraint('ck_venue_bookings_time_order', 'start_time < end_time')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        op.execute(
+            "ALTER TABLE venue_bookings ADD CONSTRAINT venue_bookings_no_overlap "
+            "EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time, '[)') WITH &&) "
+            "WHERE (status <> 'cancelled')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER TABLE venue_bookings DROP CONSTRAINT venue_bookings_no_overlap")
+
+    with op.batch_alter_table('venue_bookings') as batch_op:
+        batch_op.drop_constraint('ck_venue_bookings_time_order', type_='check')
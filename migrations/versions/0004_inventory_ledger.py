@@ -0,0 +1,40 @@
+"""Seed the inventory ledger with opening balances and forbid negative stock.
+
+Stock changes are now always written to inventory_transactions, so existing
+quantities get an opening 'in' row for the ledger to reconcile against.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("UPDATE inventory_items SET quantity_available = 0 WHERE quantity_available IS NULL")
+    op.execute(
+        "INSERT INTO inventory_transactions (item_id, quantity, transaction_type, reference) "
+        "SELECT id, quantity_available, 'in', 'opening balance' FROM inventory_items "
+        "WHERE quantity_available > 0 "
+        "AND NOT EXISTS (SELECT 1 FROM inventory_transactions t WHERE t.item_id = inventory_items.id)"
+    )
+    with op.batch_alter_table('inventory_items') as batch_op:
+        batch_op.create_check_constraint('ck_inventory_items_quantity_available', 'quantity_available >= 0')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('inventory_items') as batch_op:
+        batch_op.drop_constraint('ck_inventory_items_quantity_available', type_='check')
+    op.execute("DELETE FROM inventory_transactions WHERE reference = 'opening balance'")
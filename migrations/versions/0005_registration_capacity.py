@@ -0,0 +1,61 @@
+"""Count event registrations against capacity and add a waitlist.
+
+Duplicate (event_id, user_id) registrations are collapsed to the oldest one
+before the unique constraint is added, and registered_count is backfilled
+from the surviving rows.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "DELETE FROM registrations WHERE id NOT IN "
+        "(SELECT min(id) FROM registrations GROUP BY event_id, user_id)"
+    )
+    with op.batch_alter_table('registrations') as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False, server_default='registered'))
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=255), nullable=True))
+        batch_op.create_unique_constraint('uq_registrations_event_id_user_id', ['event_id', 'user_id'])
+    op.create_index('ix_registrations_event_id_status_registration_date', 'registrations',
+                    ['event_id', 'status', 'registration_date'])
+
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.add_column(sa.Column('registered_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('waitlist_enabled', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute(
+        "UPDATE events SET registered_count = "
+        "(SELECT count(*) FROM registrations r WHERE r.event_id = events.id)"
+    )
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.create_check_constraint('ck_events_registered_count', 'registered_count >= 0')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_constraint('ck_events_registered_count', type_='check')
+        batch_op.drop_column('waitlist_enabled')
+        batch_op.drop_column('registered_count')
+
+    op.execute("DELETE FROM registrations WHERE status = 'cancelled'")
+    op.drop_index('ix_registrations_event_id_status_registration_date', table_name='registrations')
+    with op.batch_alter_table('registrations') as batch_op:
+        batch_op.drop_constraint('uq_registrations_event_id_user_id', type_='unique')
+        batch_op.drop_column('idempotency_key')
+        batch_op.drop_column('status')
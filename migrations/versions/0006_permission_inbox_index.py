@@ -0,0 +1,31 @@
+"""Index the approver inbox on (approver_id, status, requested_at, id).
+
+Replaces ix_permissions_approver_id_status, which is a prefix of the new index.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_permissions_inbox', 'permissions', ['approver_id', 'status', 'requested_at', 'id'])
+    op.drop_index('ix_permissions_approver_id_status', table_name='permissions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_permissions_approver_id_status', 'permissions', ['approver_id', 'status'])
+    op.drop_index('ix_permissions_inbox', table_name='permissions')
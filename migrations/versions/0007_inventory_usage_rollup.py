@@ -0,0 +1,59 @@
+"""Roll inventory_transactions up into per-item daily usage for the stock reports.
+
+The rollup is backfilled here so the first report does not have to scan the
+whole ledger; afterwards analytics.refresh_inventory_usage keeps it current.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_inventory_transactions_transaction_date', 'inventory_transactions', ['transaction_date'])
+    op.create_table(
+        'inventory_daily_usage',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('quantity_in', sa.Integer(), nullable=False),
+        sa.Column('quantity_out', sa.Integer(), nullable=False),
+        sa.Column('quantity_returned', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['inventory_items.id'], ),
+        sa.PrimaryKeyConstraint('day', 'item_id')
+    )
+    op.create_table(
+        'report_refreshes',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.execute(
+        "INSERT INTO inventory_daily_usage (day, item_id, quantity_in, quantity_out, quantity_returned) "
+        "SELECT date(transaction_date), item_id, "
+        "sum(CASE WHEN transaction_type = 'in' THEN quantity ELSE 0 END), "
+        "sum(CASE WHEN transaction_type = 'out' THEN quantity ELSE 0 END), "
+        "sum(CASE WHEN transaction_type = 'in' AND reference LIKE 'return:%' THEN quantity ELSE 0 END) "
+        "FROM inventory_transactions WHERE transaction_date IS NOT NULL "
+        "GROUP BY date(transaction_date), item_id"
+    )
+    op.execute("INSERT INTO report_refreshes (name, refreshed_at) VALUES ('inventory_daily_usage', NULL)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('report_refreshes')
+    op.drop_table('inventory_daily_usage')
+    op.drop_index('ix_inventory_transactions_transaction_date', table_name='inventory_transactions')
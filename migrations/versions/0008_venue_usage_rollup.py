@@ -0,0 +1,47 @@
+"""Roll venue bookings up into per-venue hourly usage for the utilization reports.
+
+Existing bookings start with rolled_up false and are folded in by
+utilization.backfill, in batches, the first time a venue report is read.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('venue_bookings') as batch_op:
+        batch_op.add_column(sa.Column('rolled_up', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index('ix_venue_bookings_not_rolled_up', 'venue_bookings', ['id'],
+                    postgresql_where=sa.text('NOT rolled_up'), sqlite_where=sa.text('NOT rolled_up'))
+    op.create_table(
+        'venue_hourly_usage',
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('booked_minutes', sa.Integer(), nullable=False),
+        sa.Column('seat_minutes', sa.Integer(), nullable=False),
+        sa.Column('bookings', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ),
+        sa.PrimaryKeyConstraint('venue_id', 'hour')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('venue_hourly_usage')
+    op.drop_index('ix_venue_bookings_not_rolled_up', table_name='venue_bookings')
+    with op.batch_alter_table('venue_bookings') as batch_op:
+        batch_op.drop_column('rolled_up')
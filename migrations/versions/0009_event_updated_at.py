@@ -0,0 +1,36 @@
+"""Keep events.updated_at always set and indexed for calendar sync tokens.
+
+Events that were never edited get their created_at as updated_at, so a
+since= query only has to look at one column.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("UPDATE events SET updated_at = coalesce(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL")
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), server_default=sa.func.now())
+    op.create_index('ix_events_updated_at', 'events', ['updated_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_events_updated_at', table_name='events')
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), server_default=None)
@@ -0,0 +1,31 @@
+"""Drop the registrations.event_id index.
+
+The leading event_id column of uq_registrations_event_id_user_id and of
+ix_registrations_event_id_status_registration_date already serves lookups by
+event, so the single-column index only cost writes.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_registrations_event_id', table_name='registrations')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_registrations_event_id', 'registrations', ['event_id'])
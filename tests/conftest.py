@@ -0,0 +1,134 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# The app reads its settings at import, so the test environment goes first: a
+# throwaway SQLite database, cheap bcrypt, and nothing running in the background.
+_tmp = tempfile.mkdtemp(prefix="inventory-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite+aiosqlite:///{_tmp}/test.db",
+    SECRET_KEY="test-secret-key-that-is-long-enough-for-hs256",
+    ALGORITHM="HS256",
+    ACCESS_TOKEN_EXPIRE_MINUTES="30",
+    BCRYPT_ROUNDS="4",
+    JOB_WORKER_IN_PROCESS="false",
+    RATE_LIMIT_ENABLED="false",
+)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import cache, dashboard, db, models, oauth2  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+class Database:
+    """Seeds and resets the app's database from tests, on the app's event loop."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def run(self, func, *args):
+        """Run ``func(session, *args)`` in a session and commit."""
+        async def call():
+            async with db.SessionLocal() as session:
+                result = await func(session, *args)
+                await session.commit()
+                return result
+        return self.client.portal.call(call)
+
+    def reset(self):
+        """Recreate an empty schema and empty the caches."""
+        async def recreate():
+            async with db.get_engine().begin() as conn:
+                await conn.run_sync(models.Base.metadata.drop_all)
+                await conn.run_sync(models.Base.metadata.create_all)
+        self.client.portal.call(recreate)
+        cache.response_cache.backend = cache.MemoryBackend()
+        oauth2.user_cache.clear()
+        oauth2.stale_claims.clear()
+        dashboard.dashboard_cache.clear()
+
+
+@pytest.fixture
+def database(client):
+    database = Database(client)
+    database.reset()
+    return database
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_statements():
+    """Record every statement the app's engine sends while the block runs."""
+    counter = StatementCounter()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    engine = db.get_engine().sync_engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def token_for(user_id: int, role: str = "admin"):
+    return {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': user_id, 'role': role, 'is_active': True})}"}
+
+
+async def seed_organizer(session, children: int):
+    """An organizer with ``children`` rows under every relationship the *Out schemas serialize.
+
+    Returns the ids of the organizer, their first event, the venue and the first permission.
+    """
+    start = datetime(2030, 1, 1, 9)
+    organizer = models.User(email="organizer@example.com", password="x", full_name="Organizer", role="admin",
+                            department="Events", profile_pic="organizer.png")
+    venue = models.Venue(name="Hall", venue_type="hall", capacity=500, location="North", picture="hall.png")
+    item = models.InventoryItem(name="Chairs", description="Folding chairs", category="furniture",
+                                quantity_available=1000, unit="pieces", minimum_stock=10, last_restocked=start)
+    session.add_all([organizer, venue, item])
+    await session.flush()
+    attendees, events, permissions = [], [], []
+    for n in range(children):
+        attendee = models.User(email=f"attendee{n}@example.com", password="x", full_name=f"Attendee {n}", role="student",
+                               department="Science", profile_pic="attendee.png")
+        event_ = models.Event(title=f"Event {n}", description="An event", organizer_id=organizer.id, status="approved",
+                              start_date=start + timedelta(days=n), end_date=start + timedelta(days=n, hours=2),
+                              type="talk", logo="event.png")
+        session.add_all([attendee, event_])
+        await session.flush()
+        permission = models.Permission(event_id=event_.id, user_id=organizer.id, approver_id=organizer.id,
+                                       permission_type="venue", status="pending", description="Need the hall")
+        session.add_all([
+            permission,
+            models.Registration(event_id=event_.id, user_id=attendee.id),
+            models.Registration(event_id=event_.id, user_id=organizer.id),
+            models.InventoryRequest(requester_id=organizer.id, item_id=item.id, event_id=event_.id, quantity_requested=1, return_date=event_.end_date),
+            models.VenueBooking(venue_id=venue.id, event_id=event_.id, booker_id=organizer.id,
+                                start_time=event_.start_date, end_time=event_.end_date, purpose="Talk"),
+        ])
+        attendees.append(attendee)
+        events.append(event_)
+        permissions.append(permission)
+    # Everyone also attends the first event, so its children grow with ``children`` too.
+    session.add_all(models.Registration(event_id=events[0].id, user_id=attendee.id) for attendee in attendees[1:])
+    await session.flush()
+    return organizer.id, events[0].id, venue.id, permissions[0].id
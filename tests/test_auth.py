@@ -0,0 +1,41 @@
+from sqlalchemy import select
+
+from app import models
+from conftest import token_for
+
+
+async def _add_admin(session):
+    user = models.User(email="admin@example.com", password="x", full_name="Admin", role="admin")
+    session.add(user)
+    await session.flush()
+    return user.id
+
+
+def _update_user(user_id, **values):
+    async def update(session):
+        user = await session.scalar(select(models.User).filter(models.User.id == user_id))
+        for name, value in values.items():
+            setattr(user, name, value)
+    return update
+
+
+def test_role_change_applies_to_existing_tokens(client, database):
+    user_id = database.run(_add_admin)
+    headers = token_for(user_id)
+    assert client.post("/items/reconcile", headers=headers).status_code == 200
+    database.run(_update_user(user_id, role="student"))
+    assert client.post("/items/reconcile", headers=headers).status_code == 401
+
+
+def test_deactivation_rejects_existing_tokens(client, database):
+    user_id = database.run(_add_admin)
+    headers = token_for(user_id)
+    assert client.post("/items/reconcile", headers=headers).status_code == 200
+    database.run(_update_user(user_id, is_active=False))
+    assert client.post("/items/reconcile", headers=headers).status_code == 401
+
+
+def test_tokens_issued_after_a_change_use_their_claims(client, database):
+    user_id = database.run(_add_admin)
+    database.run(_update_user(user_id, department="Finance"))
+    assert client.post("/items/reconcile", headers=token_for(user_id)).status_code == 200
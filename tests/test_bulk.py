@@ -0,0 +1,39 @@
+import json
+
+from sqlalchemy import select
+
+from app import models
+from conftest import token_for
+
+
+async def _add_admin(session):
+    user = models.User(email="admin@example.com", password="x", full_name="Admin", role="admin")
+    session.add(user)
+    await session.flush()
+    return user.id
+
+
+async def _opening_balances(session):
+    rows = await session.execute(select(models.InventoryItem.quantity_available, models.InventoryTransaction.quantity)
+                                 .join(models.InventoryTransaction,
+                                       models.InventoryTransaction.item_id == models.InventoryItem.id))
+    return rows.all()
+
+
+def test_import_records_each_items_opening_balance_against_it(client, database):
+    admin_id = database.run(_add_admin)
+    body = "\n".join(json.dumps({"name": f"Item {n}", "unit": "pieces", "quantity_available": n + 1}) for n in range(250))
+    response = client.post("/items/bulk", content=body, headers={**token_for(admin_id), "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    assert response.json()["inserted"] == 250
+    balances = database.run(_opening_balances)
+    assert len(balances) == 250
+    assert all(stock == opening for stock, opening in balances)
+
+
+def test_exports_require_an_admin(client, database):
+    admin_id = database.run(_add_admin)
+    for path in ("/users/export", "/items/export", "/venues/export"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=token_for(admin_id, role="student")).status_code == 401
+        assert client.get(path, headers=token_for(admin_id)).status_code == 200
@@ -0,0 +1,14 @@
+from app.cache import etag_matches
+
+ETAG = '"abc123"'
+
+
+def test_if_none_match_compares_whole_entity_tags():
+    assert etag_matches('"abc123"', ETAG)
+    assert etag_matches('W/"abc123"', ETAG)
+    assert etag_matches('"other", W/"abc123" ', ETAG)
+    assert etag_matches("*", ETAG)
+    assert not etag_matches('"abc1234"', ETAG)
+    assert not etag_matches('"xabc123", "abc"', ETAG)
+    assert not etag_matches("", ETAG)
+    assert not etag_matches(None, ETAG)
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app import ical, models
+
+START = datetime(2030, 1, 1, 9)
+
+
+def _add_event(title, updated_at=None):
+    async def add(session):
+        organizer = await session.scalar(select(models.User).limit(1))
+        if organizer is None:
+            organizer = models.User(email="organizer@example.com", password="x", full_name="Organizer", role="admin")
+            session.add(organizer)
+            await session.flush()
+        event = models.Event(title=title, organizer_id=organizer.id, status="approved",
+                             start_date=START, end_date=START + timedelta(hours=2))
+        session.add(event)
+        await session.flush()
+        if updated_at is not None:
+            await session.execute(update(models.Event).filter(models.Event.id == event.id).values(updated_at=updated_at))
+    return add
+
+
+def _poll(client, since=None):
+    response = client.get("/events/calendar.ics", params={"since": since} if since else None)
+    assert response.status_code == 200, response.text
+    return response.text, response.headers[ical.SYNC_TOKEN_HEADER]
+
+
+def test_sync_picks_up_changes_stamped_before_the_token(client, database):
+    database.run(_add_event("First"))
+    _, token = _poll(client)
+    # Written before the poll but committed after it.
+    stamped = ical.decode_since(token) - timedelta(seconds=1)
+    database.run(_add_event("Late commit", stamped))
+    body, next_token = _poll(client, token)
+    assert "SUMMARY:Late commit" in body
+    assert ical.decode_since(next_token) >= ical.decode_since(token)
+
+
+def test_sync_picks_up_changes_in_the_tokens_second(client, database):
+    database.run(_add_event("First"))
+    _, token = _poll(client)
+    # server_default=now() stores whole seconds on SQLite.
+    database.run(_add_event("Same second", ical.decode_since(token).replace(microsecond=0)))
+    body, _ = _poll(client, token)
+    assert "SUMMARY:Same second" in body
+
+
+def test_sync_token_does_not_move_back(client, database):
+    database.run(_add_event("First"))
+    _, token = _poll(client)
+    for _ in range(3):
+        _, next_token = _poll(client, token)
+        assert ical.decode_since(next_token) == ical.decode_since(token)
+        token = next_token
+
+
+def test_feed_revalidates_against_any_listed_etag(client, database):
+    database.run(_add_event("First"))
+    etag = client.get("/events/calendar.ics").headers["etag"]
+    assert client.get("/events/calendar.ics", headers={"If-None-Match": f'"stale", W/{etag}'}).status_code == 304
+    assert client.get("/events/calendar.ics", headers={"If-None-Match": etag[:-2] + '"'}).status_code == 200
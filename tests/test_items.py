@@ -0,0 +1,17 @@
+from app import models
+from conftest import token_for
+
+
+async def _add_admin(session):
+    user = models.User(email="admin@example.com", password="x", full_name="Admin", role="admin")
+    session.add(user)
+    await session.flush()
+    return user.id
+
+
+def test_batch_request_decisions_require_an_admin(client, database):
+    admin_id = database.run(_add_admin)
+    for path in ("/items/requests/approve", "/items/requests/reject"):
+        assert client.post(path, json={"ids": [1]}).status_code == 401
+        assert client.post(path, json={"ids": [1]}, headers=token_for(admin_id, role="student")).status_code == 401
+        assert client.post(path, json={"ids": [1]}, headers=token_for(admin_id)).status_code == 200
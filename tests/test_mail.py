@@ -0,0 +1,12 @@
+import asyncio
+import logging
+
+from app import mail
+
+
+def test_logged_mail_leaves_out_the_body(caplog):
+    with caplog.at_level(logging.INFO, logger="app.mail"):
+        asyncio.run(mail.send("someone@example.com", "Reset your password", "https://example.com/reset?token=secret"))
+    assert "someone@example.com" in caplog.text
+    assert "Reset your password" in caplog.text
+    assert "secret" not in caplog.text
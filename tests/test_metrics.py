@@ -0,0 +1,60 @@
+from app import metrics
+
+
+def test_large_values_render_every_digit():
+    counter = metrics.Counter("test_total", "Test.")
+    counter.inc(1234567)
+    histogram = metrics.Histogram("test_seconds", "Test.")
+    histogram.observe(1234567.25)
+    assert list(counter.render())[-1] == "test_total 1234567"
+    assert "test_seconds_sum 1234567.25" in list(histogram.render())
+
+
+def test_included_routes_wrap_their_endpoint_once():
+    from app.main import app
+
+    route = next(route for route in app.routes if getattr(route, "path", None) == "/events/{event_id}")
+    assert not getattr(route.endpoint.__wrapped__, "_timed", False)
+
+
+def test_failed_statements_leave_nothing_on_the_connection(client):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    from app import db
+
+    async def run():
+        async with db.get_engine().connect() as conn:
+            for _ in range(3):
+                try:
+                    await conn.execute(text("SELECT * FROM no_such_table"))
+                except OperationalError:
+                    pass
+            return dict(conn.sync_connection.info)
+    assert client.portal.call(run) == {}
+
+
+def test_event_streams_are_timed_as_connections(monkeypatch, caplog):
+    import asyncio
+
+    monkeypatch.setattr(metrics, "SLOW_REQUEST_MS", 0)
+    monkeypatch.setattr(metrics, "REQUESTS", metrics.RequestMetrics())
+    monkeypatch.setattr(metrics, "STREAM_SECONDS", metrics.Histogram("test_stream_seconds", "Test."))
+
+    def app(content_type):
+        async def respond(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+            await send({"type": "http.response.body", "body": b""})
+        return metrics.MetricsMiddleware(respond)
+
+    async def send(message):
+        pass
+    scope = {"type": "http", "method": "GET", "path": "/realtime/events"}
+    asyncio.run(app(b"text/event-stream; charset=utf-8")(scope, None, send))
+    assert metrics.STREAM_SECONDS.count == 1
+    assert not metrics.REQUESTS._rows and not caplog.records
+
+    asyncio.run(app(b"application/json")(scope, None, send))
+    assert metrics.STREAM_SECONDS.count == 1
+    assert len(metrics.REQUESTS._rows) == 1
+    assert "slow request" in caplog.text
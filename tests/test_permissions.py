@@ -0,0 +1,25 @@
+from app import models
+from conftest import token_for
+
+
+async def _add_eventless_permission(session):
+    approver = models.User(email="approver@example.com", password="x", full_name="Approver", role="admin")
+    session.add(approver)
+    await session.flush()
+    session.add(models.Permission(approver_id=approver.id, permission_type="budget", status="pending"))
+    return approver.id
+
+
+def test_inbox_lists_permissions_without_an_event(client, database):
+    approver_id = database.run(_add_eventless_permission)
+    response = client.get("/permissions/inbox", headers=token_for(approver_id))
+    assert response.status_code == 200, response.text
+    assert [item["event"] for item in response.json()["items"]] == [None]
+
+
+def test_inbox_rejects_bad_parameters(client, database):
+    approver_id = database.run(_add_eventless_permission)
+    headers = token_for(approver_id)
+    assert client.get("/permissions/inbox?status=bogus", headers=headers).status_code == 422
+    assert client.get("/permissions/inbox?limit=0", headers=headers).status_code == 422
+    assert client.get("/permissions/inbox?limit=-1", headers=headers).status_code == 422
@@ -0,0 +1,40 @@
+"""Statement counts per endpoint must not grow with the number of child rows.
+
+Each endpoint is requested against a database seeded with few and with many
+children under every relationship its response serializes; a lazy load or a
+per-row query shows up as a count that differs between the two.
+"""
+import pytest
+
+from conftest import count_statements, seed_organizer, token_for
+
+FEW, MANY = 2, 12
+
+
+def _statements(client, database, children, path):
+    database.reset()
+    organizer_id, event_id, venue_id, permission_id = database.run(seed_organizer, children)
+    url = path.format(user=organizer_id, event=event_id, venue=venue_id, permission=permission_id)
+    with count_statements() as statements:
+        response = client.get(url, headers=token_for(organizer_id))
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+@pytest.mark.parametrize("path", [
+    "/users/{user}",
+    "/events/{event}",
+    "/venues/{venue}",
+    "/permissions/{permission}",
+    "/users/",
+    "/events/",
+    "/items/",
+    "/venues/",
+    "/permissions/",
+    "/permissions/inbox",
+    "/users/me/dashboard",
+])
+def test_statement_count_does_not_grow_with_children(client, database, path):
+    few = _statements(client, database, FEW, path)
+    many = _statements(client, database, MANY, path)
+    assert many == few, f"{path}: {few} statements with {FEW} children, {many} with {MANY}"
@@ -0,0 +1,149 @@
+"""The hot queries must be served by the indexes added for them.
+
+Runs against Postgres only (SQLite's planner says little about production):
+set TEST_POSTGRES_URL to a database the tests may write to. Tables are created
+in a scratch schema, filled with enough skewed rows that a sequential scan
+loses, analyzed, and each query's EXPLAIN plan is checked for an index scan
+on the expected index.
+"""
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import and_, create_engine, or_, select, text, tuple_
+from sqlalchemy.engine import make_url
+
+from app import jobs, models, search
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+
+SCHEMA = "query_plans_test"
+ROWS = 20000
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+NOW = datetime(2030, 6, 1)
+
+_SEED = [
+    f"INSERT INTO users (id, email, password, full_name, role) "
+    f"SELECT n, 'user' || n || '@example.com', 'x', 'User ' || n, 'student' FROM generate_series(1, {ROWS}) n",
+    f"INSERT INTO events (id, title, description, organizer_id, start_date, end_date, status, updated_at) "
+    f"SELECT n, CASE WHEN n % 1000 = 0 THEN 'Robotics workshop ' ELSE 'Event ' END || n, "
+    f"CASE WHEN n % 500 = 0 THEN 'Build a robot arm' END, 1 + n % 500, TIMESTAMP '2030-01-01' + n * INTERVAL '1 hour', "
+    f"TIMESTAMP '2030-01-01' + n * INTERVAL '1 hour' + INTERVAL '2 hours', "
+    f"CASE WHEN n % 10 = 0 THEN 'approved' ELSE 'draft' END, "
+    f"TIMESTAMP '2030-01-01' + n * INTERVAL '1 minute' FROM generate_series(1, {ROWS}) n",
+    f"INSERT INTO venues (id, name, venue_type) SELECT n, 'Venue ' || n, 'hall' FROM generate_series(1, 200) n",
+    f"INSERT INTO venue_bookings (venue_id, event_id, booker_id, start_time, end_time, status) "
+    f"SELECT 1 + n % 200, n, 1 + n % 500, TIMESTAMP '2030-01-01' + n * INTERVAL '1 hour', "
+    f"TIMESTAMP '2030-01-01' + n * INTERVAL '1 hour' + INTERVAL '1 hour', 'approved' FROM generate_series(1, {ROWS}) n",
+    f"INSERT INTO inventory_items (id, name, quantity_available) SELECT n, 'Item ' || n, 100 FROM generate_series(1, 500) n",
+    f"INSERT INTO inventory_requests (requester_id, item_id, event_id, quantity_requested, status) "
+    f"SELECT 1 + n % {ROWS}, 1 + n % 500, 1 + n % {ROWS}, 1, "
+    f"CASE WHEN n % 20 = 0 THEN 'pending' ELSE 'returned' END FROM generate_series(1, {ROWS}) n",
+    f"INSERT INTO inventory_transactions (item_id, quantity, transaction_type, transaction_date) "
+    f"SELECT 1 + n % 500, 1, 'in', TIMESTAMP '2030-01-01' + n * INTERVAL '1 minute' FROM generate_series(1, {ROWS}) n",
+    f"INSERT INTO permissions (event_id, user_id, approver_id, permission_type, status, requested_at) "
+    f"SELECT n, 1 + n % {ROWS}, 1 + n % 200, 'venue', CASE WHEN n % 10 = 0 THEN 'pending' ELSE 'approved' END, "
+    f"TIMESTAMP '2030-01-01' + n * INTERVAL '1 minute' FROM generate_series(1, {ROWS}) n",
+    f"INSERT INTO registrations (event_id, user_id, status) "
+    f"SELECT 1 + n % 2000, n, 'registered' FROM generate_series(1, {ROWS}) n",
+    f"INSERT INTO jobs (name, payload, status, run_at, attempts, max_attempts) "
+    f"SELECT 'noop', '{{}}', CASE WHEN n % 100 = 0 THEN 'queued' ELSE 'done' END, "
+    f"TIMESTAMP '2030-01-01' + n * INTERVAL '1 minute', 0, 1 FROM generate_series(1, {ROWS}) n",
+]
+
+
+@pytest.fixture(scope="module")
+def connection():
+    # Synchronous psycopg2 keeps EXPLAIN out of the app's event loop.
+    engine = create_engine(make_url(TEST_POSTGRES_URL).set(drivername="postgresql+psycopg2"))
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        models.Base.metadata.create_all(conn)
+        for statement in _SEED:
+            conn.execute(text(statement))
+        conn.execute(text("ANALYZE"))
+        yield conn
+        conn.rollback()
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        conn.commit()
+    engine.dispose()
+
+
+def _index_scans(plan):
+    """(node type, index name) of every index scan in an EXPLAIN (FORMAT JSON) plan tree."""
+    scans = []
+    if plan["Node Type"] in INDEX_SCANS:
+        scans.append((plan["Node Type"], plan["Index Name"]))
+    for child in plan.get("Plans", ()):
+        scans.extend(_index_scans(child))
+    return scans
+
+
+def _plan(connection, query):
+    compiled = query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    return connection.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()[0]["Plan"]
+
+
+def _hot_queries():
+    event, permission, request, booking = models.Event, models.Permission, models.InventoryRequest, models.VenueBooking
+    registration, transaction, job = models.Registration, models.InventoryTransaction, models.Job
+    terms = search.search_terms("robot")
+    return [
+        ("permission inbox page",
+         select(permission).filter(permission.approver_id == 7, permission.status == "pending")
+         .order_by(permission.requested_at, permission.id).limit(51),
+         {"ix_permissions_inbox"}),
+        ("events keyset page",
+         select(event).filter(tuple_(event.start_date, event.id) > tuple_(datetime(2030, 6, 1), 1))
+         .order_by(event.start_date, event.id).limit(101),
+         {"ix_events_start_date_id"}),
+        ("approved events search filter",
+         select(event).filter(event.status == "approved", event.start_date >= datetime(2031, 1, 1))
+         .order_by(event.start_date).limit(20),
+         {"ix_events_status_start_date", "ix_events_start_date_id"}),
+        ("calendar changes since a sync token",
+         select(event).filter(event.updated_at >= datetime(2030, 1, 14, 12)),
+         {"ix_events_updated_at"}),
+        ("pending requests for an item",
+         select(request).filter(request.item_id == 42, request.status == "pending"),
+         {"ix_inventory_requests_item_id_status"}),
+        ("a user's inventory requests",
+         select(request).filter(request.requester_id == 42),
+         {"ix_inventory_requests_requester_id"}),
+        ("venue booking overlap check",
+         select(booking.id).filter(booking.venue_id == 3, booking.start_time < datetime(2030, 3, 2),
+                                   booking.end_time > datetime(2030, 3, 1)),
+         {"ix_venue_bookings_venue_id_start_time_end_time"}),
+        ("registrations for an event",
+         select(registration).filter(registration.event_id == 10, registration.status == "registered"),
+         {"ix_registrations_event_id_status_registration_date", "uq_registrations_event_id_user_id"}),
+        ("a user's registrations",
+         select(registration).filter(registration.user_id == 42),
+         {"ix_registrations_user_id"}),
+        ("an item's ledger",
+         select(transaction).filter(transaction.item_id == 42).order_by(transaction.transaction_date),
+         {"ix_inventory_transactions_item_id_transaction_date"}),
+        ("due jobs",
+         select(job.id).filter(or_(and_(job.status == jobs.QUEUED, job.run_at <= NOW),
+                                   and_(job.status == jobs.RUNNING, job.locked_until < NOW)))
+         .order_by(job.run_at).limit(10),
+         {"ix_jobs_status_run_at"}),
+        ("events organized by a user",
+         select(event).filter(event.organizer_id == 42),
+         {"ix_events_organizer_id"}),
+        ("event search",
+         select(event).filter(search.match_clause("postgresql", terms), event.status == "approved")
+         .order_by(search.rank("postgresql", terms).desc(), event.start_date, event.id).limit(20),
+         {"ix_events_search", "ix_events_title_trgm"}),
+    ]
+
+
+@pytest.mark.parametrize("name, query, indexes", _hot_queries(), ids=[case[0] for case in _hot_queries()])
+def test_hot_query_uses_index(connection, name, query, indexes):
+    scans = _index_scans(_plan(connection, query))
+    assert any(index in indexes for _, index in scans), f"{name}: expected a scan on {sorted(indexes)}, plan used {scans}"
+
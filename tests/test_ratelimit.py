@@ -0,0 +1,62 @@
+import asyncio
+
+from app import oauth2, ratelimit
+
+RATE = ratelimit.Rate("1/60:1")
+
+
+def _take(backend, key, now):
+    return asyncio.run(backend.take([(key, RATE)], now=now))
+
+
+def test_memory_backend_evicts_the_least_recently_used_bucket():
+    backend = ratelimit.MemoryBackend(maxsize=2)
+    assert _take(backend, "a", 0) == 0
+    assert _take(backend, "b", 1) == 0
+    assert _take(backend, "a", 120) == 0  # refilled; "a" is now the most recently used
+    assert _take(backend, "c", 121) == 0  # drops "b"
+    assert _take(backend, "a", 122) > 0
+    assert _take(backend, "b", 122) == 0
+
+
+def _scope(token):
+    return {"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]}
+
+
+def test_user_bucket_is_keyed_by_the_token_user_id():
+    first = oauth2.create_access_token({"user_id": 7, "role": "student"})
+    second = oauth2.create_access_token({"user_id": 7, "role": "admin"})
+    assert ratelimit._user(_scope(first)) == ratelimit._user(_scope(second)) == "7"
+    assert ratelimit._user(_scope("not-a-token")) is None
+    assert ratelimit._user({"type": "http", "headers": []}) is None
+
+
+class _Recorder:
+    def __init__(self):
+        self.checks = []
+
+    async def take(self, checks, now=None):
+        self.checks.extend(key for key, _ in checks)
+        return 0.0
+
+
+def _call(middleware, method, path):
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "client": ("203.0.113.9", 50000)}
+    asyncio.run(middleware(scope, None, None))
+
+
+def test_probes_are_exempt_and_the_global_ip_bucket_is_opt_in(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    backend = _Recorder()
+    middleware = ratelimit.RateLimitMiddleware(lambda scope, receive, send: asyncio.sleep(0), backend=backend)
+    for path in ("/health/live", "/health/ready", "/metrics"):
+        _call(middleware, "GET", path)
+    _call(middleware, "GET", "/events/")
+    assert backend.checks == []
+    _call(middleware, "POST", "/login")
+    assert backend.checks == ["POST /login|ip:203.0.113.9"]
+
+    monkeypatch.setattr(ratelimit, "PER_IP", ratelimit.Rate("50/1:200"))
+    _call(middleware, "GET", "/events/")
+    _call(middleware, "GET", "/metrics")
+    assert backend.checks[1:] == ["ip:203.0.113.9"]
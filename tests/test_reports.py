@@ -0,0 +1,30 @@
+import pytest
+
+from app import analytics, models
+from conftest import count_statements
+
+
+@pytest.mark.parametrize("path", [
+    "/reports/inventory/low-stock",
+    "/reports/inventory/consumption",
+    "/reports/inventory/consumption/categories",
+    "/reports/inventory/stockout",
+    "/reports/venues/utilization",
+    "/reports/venues/peak-hours",
+    "/reports/venues/occupancy",
+])
+def test_reports_only_read(client, database, path):
+    with count_statements() as statements:
+        assert client.get(path).status_code == 200
+    assert all(statement.lstrip().upper().startswith("SELECT") for statement in statements.statements)
+
+
+async def _refresh_twice(session):
+    await analytics.refresh_inventory_usage(session, force=True)
+    await analytics.refresh_inventory_usage(session, force=True)
+    return await session.get(models.ReportRefresh, analytics.INVENTORY_USAGE)
+
+
+def test_refresh_creates_a_missing_refresh_row(client, database):
+    # The test schema comes from create_all, so migration 0007's seed row is missing.
+    assert database.run(_refresh_twice).refreshed_at is not None
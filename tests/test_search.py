@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from app import models
+
+START = datetime(2030, 1, 1, 9)
+
+
+async def _add_events(session):
+    organizer = models.User(email="organizer@example.com", password="x", full_name="Organizer", role="admin")
+    session.add(organizer)
+    await session.flush()
+    for n, (title, description, status) in enumerate([
+        ("Robotics workshop", "Build a robot arm", "approved"),
+        ("Chess club", "Weekly games; robots welcome", "approved"),
+        ("Robotics planning", None, "draft"),
+        ("Poetry night", None, "approved"),
+    ]):
+        session.add(models.Event(title=title, description=description, status=status, organizer_id=organizer.id,
+                                 start_date=START + timedelta(days=n), end_date=START + timedelta(days=n, hours=2)))
+
+
+def _titles(client, q):
+    response = client.get("/events/search", params={"q": q})
+    assert response.status_code == 200, response.text
+    return [event["title"] for event in response.json()]
+
+
+def test_search_matches_prefixes_of_approved_events(client, database):
+    database.run(_add_events)
+    # Title matches rank first; the draft event never shows up.
+    assert _titles(client, "robo") == ["Robotics workshop", "Chess club"]
+    assert _titles(client, "ROBOTICS work") == ["Robotics workshop"]
+    assert _titles(client, "planning") == []
+    assert _titles(client, "!!") == []
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+IMPORT_ONLY = """
+import sys
+import app.main
+from app import db
+print(db._engine is None, "aiosqlite" in sys.modules or "asyncpg" in sys.modules)
+"""
+
+
+def test_importing_the_app_does_not_touch_the_database():
+    # A fresh interpreter: this one imported the app with the test client.
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", IMPORT_ONLY], capture_output=True, text=True,
+                            env=os.environ, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["True", "False"]
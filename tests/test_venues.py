@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import models
+from conftest import seed_organizer, token_for
+
+
+async def _seed(session):
+    ids = await seed_organizer(session, 1)
+    await session.execute(update(models.Permission).values(status="approved"))
+    return ids
+
+
+def test_booking_rejects_overlaps_and_unknown_venues(client, database):
+    organizer_id, event_id, venue_id, permission_id = database.run(_seed)
+    headers = token_for(organizer_id)
+
+    def book(venue, start, end):
+        body = {"venue_id": venue, "event_id": event_id, "permission_id": permission_id, "purpose": "Talk",
+                "start_time": start.isoformat(), "end_time": end.isoformat()}
+        return client.post(f"/venues/{venue}/book", json=body, headers=headers).status_code
+
+    # The seeded booking holds [09:00, 11:00).
+    assert book(venue_id, datetime(2030, 1, 1, 10), datetime(2030, 1, 1, 12)) == 409
+    assert book(venue_id, datetime(2030, 1, 1, 11), datetime(2030, 1, 1, 12)) == 200
+    assert book(venue_id + 1, datetime(2030, 1, 1, 13), datetime(2030, 1, 1, 14)) == 404